@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+
+from google import genai
+from google.genai import types
+
+from call_function import AsyncFunctionCallDispatcher
+from config import (
+    HISTORY_TOKEN_BUDGET,
+    MAX_FUNCTION_CALL_WORKERS,
+    MODEL_NAME,
+    WORKSPACE_SNAPSHOT_IN_PROMPT,
+)
+from functions.registry import tool_registry
+from functions.result_cache import tool_result_cache
+from functions.sandbox import script_slots
+from functions.session_state import session_scope
+from functions.workspace_manifest import workspace_manifest
+from history import ConversationHistory
+from main import MAX_ITERS, system_prompt
+from model_backend import create_client
+from rate_limiter import RateLimiter
+from tracing import tracer
+
+
+async def main_async(
+    prompt: str,
+    verbose_flag: bool,
+    max_workers: int = MAX_FUNCTION_CALL_WORKERS,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+) -> None:
+    client = create_client()
+    await run_session(
+        client,
+        prompt,
+        verbose_flag,
+        max_workers=max_workers,
+        token_budget=token_budget,
+    )
+
+
+async def run_session(
+    client: genai.Client,
+    prompt: str,
+    verbose_flag: bool,
+    max_workers: int = MAX_FUNCTION_CALL_WORKERS,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    rate_limiter: RateLimiter | None = None,
+    workspace_snapshot: bool = WORKSPACE_SNAPSHOT_IN_PROMPT,
+) -> ConversationHistory:
+    """Streaming agent loop, `client` and `rate_limiter` may be shared by sessions."""
+    context = (
+        await asyncio.to_thread(workspace_manifest.session_context)
+        if workspace_snapshot
+        else None
+    )
+    history = ConversationHistory(prompt, token_budget=token_budget, context=context)
+    semaphore = asyncio.Semaphore(max_workers)
+
+    if verbose_flag:
+        print(f"User prompt: {prompt}")
+
+    with tracer.span("session") as session_span, session_scope():
+        for turn in range(MAX_ITERS):
+            with tracer.span("turn", turn=turn):
+                if not await _run_turn(
+                    client, history, semaphore, verbose_flag, rate_limiter
+                ):
+                    break
+
+        session_span.update(
+            turns=history.turns,
+            prompt_tokens=history.prompt_tokens,
+            response_tokens=history.response_tokens,
+            tool_response_bytes_saved=history.response_encoder.bytes_saved,
+        )
+
+    if verbose_flag:
+        print(f"Tool result cache: {tool_result_cache.stats()}")
+        print(f"Script slots: {script_slots.stats()}")
+        print(f"Tool responses: {history.response_encoder.stats()}")
+
+    return history
+
+
+async def _run_turn(
+    client: genai.Client,
+    history: ConversationHistory,
+    semaphore: asyncio.Semaphore,
+    verbose_flag: bool,
+    rate_limiter: RateLimiter | None,
+) -> bool:
+    """A streamed request and its function calls, False once the model is done."""
+    dispatcher = AsyncFunctionCallDispatcher(semaphore=semaphore)
+    model_parts: list[types.Part] = []
+    usage_metadata: types.GenerateContentResponseUsageMetadata | None = None
+    text_line_open = False
+
+    reservation = None
+    if rate_limiter is not None:
+        reservation = await rate_limiter.acquire(
+            estimated_tokens=history.last_prompt_token_count
+        )
+
+    with tracer.span("model_call", model=MODEL_NAME) as model_span:
+        # sent once, without RequestPolicyBackend: a retried stream would repeat
+        # text that was already printed
+        stream = await client.aio.models.generate_content_stream(
+            model=MODEL_NAME,
+            contents=history.messages,
+            config=types.GenerateContentConfig(
+                tools=[tool_registry.tool()],
+                system_instruction=system_prompt,
+            ),
+        )
+        async for chunk in stream:
+            if chunk.usage_metadata is not None:
+                usage_metadata = chunk.usage_metadata
+
+            if not chunk.candidates or not chunk.candidates[0].content:
+                continue
+
+            for part in chunk.candidates[0].content.parts or []:
+                if part.text:
+                    if not text_line_open:
+                        print("AI: ", end="")
+                        text_line_open = True
+                    print(part.text, end="", flush=True)
+                elif part.function_call:
+                    if text_line_open:
+                        print("\n")
+                        text_line_open = False
+                    print(
+                        "Calling function: "
+                        f"{part.function_call.name}({part.function_call.args})\n"
+                    )
+                    dispatcher.submit(part.function_call)
+
+                _append_part(model_parts, part)
+
+        if usage_metadata is not None:
+            model_span.update(
+                prompt_tokens=usage_metadata.prompt_token_count,
+                response_tokens=usage_metadata.candidates_token_count,
+            )
+
+    if text_line_open:
+        print("\n")
+
+    if usage_metadata is None:
+        error_message = "response is malformed, not able to view usage metadata"
+        raise Exception(error_message)
+
+    if rate_limiter is not None and reservation is not None:
+        rate_limiter.settle(reservation, usage_metadata.total_token_count or 0)
+
+    if verbose_flag:
+        print(f"Prompt token: {usage_metadata.prompt_token_count}")
+        print(f"Response token: {usage_metadata.candidates_token_count}")
+
+    history.record_usage(usage_metadata)
+    saved_tokens = history.compact(usage_metadata.prompt_token_count)
+    if verbose_flag and saved_tokens:
+        print(
+            f"History compacted: ~{saved_tokens} tokens saved (session total "
+            f"~{history.tokens_saved})"
+        )
+
+    if model_parts:
+        history.append(types.Content(role="model", parts=model_parts))
+
+    if not dispatcher.tasks:
+        return False
+
+    for function_call_part, function_response in zip(
+        dispatcher.function_call_parts, await dispatcher.results(), strict=True
+    ):
+        print(f"Tool: {function_response}\n")
+        history.append_tool_response(function_response, function_call_part)
+
+    return True
+
+
+def _append_part(parts: list[types.Part], part: types.Part) -> None:
+    """Merges streamed text chunks so the history keeps one part per text run."""
+    if part.text and parts and parts[-1].text and not parts[-1].thought:
+        parts[-1] = types.Part(text=parts[-1].text + part.text)
+        return
+
+    parts.append(part)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI coding agent (streaming)")
+    parser.add_argument("prompt", help="prompt for the agent")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=MAX_FUNCTION_CALL_WORKERS,
+        help="max function calls of one session to run concurrently",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=HISTORY_TOKEN_BUDGET,
+        help="prompt tokens above which old tool results are compacted",
+    )
+    parser.add_argument("--trace", metavar="TRACE_FILE", help="append JSONL spans")
+    cli_args = parser.parse_args()
+
+    tracer.configure(cli_args.trace)
+
+    asyncio.run(
+        main_async(
+            cli_args.prompt,
+            cli_args.verbose,
+            max_workers=cli_args.max_workers,
+            token_budget=cli_args.token_budget,
+        )
+    )
@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import TextIO
+
+from google import genai
+
+from async_main import run_session
+from config import (
+    BATCH_CONCURRENCY,
+    BATCH_REQUESTS_PER_MINUTE,
+    BATCH_TOKENS_PER_MINUTE,
+    HISTORY_TOKEN_BUDGET,
+    WORKSPACE_SNAPSHOT_IN_PROMPT,
+)
+from model_backend import create_client
+from rate_limiter import RateLimiter
+from tracing import tracer
+
+
+async def run_batch(
+    client: genai.Client,
+    prompts: list[str],
+    results_file: TextIO,
+    concurrency: int = BATCH_CONCURRENCY,
+    requests_per_minute: int | None = BATCH_REQUESTS_PER_MINUTE,
+    tokens_per_minute: int | None = BATCH_TOKENS_PER_MINUTE,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    workspace_snapshot: bool = WORKSPACE_SNAPSHOT_IN_PROMPT,
+) -> None:
+    """Runs every prompt as its own session on one shared client.
+
+    One JSON line is written to `results_file` per prompt as soon as its
+    session ends, so lines come out in completion order and carry `index`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limiter = RateLimiter(
+        requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute
+    )
+
+    async def run_prompt(index: int, prompt: str) -> None:
+        async with semaphore:
+            started_at = time.perf_counter()
+            result: dict = {"index": index, "prompt": prompt}
+            try:
+                history = await run_session(
+                    client,
+                    prompt,
+                    False,
+                    token_budget=token_budget,
+                    rate_limiter=rate_limiter,
+                    workspace_snapshot=workspace_snapshot,
+                )
+                result.update(
+                    status="ok",
+                    response=history.final_text(),
+                    turns=history.turns,
+                    prompt_tokens=history.prompt_tokens,
+                    response_tokens=history.response_tokens,
+                    tool_response_bytes_saved=history.response_encoder.bytes_saved,
+                )
+            except Exception as e:
+                result.update(status="error", error=str(e))
+
+            result["latency_s"] = round(time.perf_counter() - started_at, 3)
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+
+    await asyncio.gather(
+        *(run_prompt(index, prompt) for index, prompt in enumerate(prompts))
+    )
+
+
+def read_prompts(prompts_file: TextIO) -> list[str]:
+    return [line.strip() for line in prompts_file if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run many prompts as concurrent agent sessions"
+    )
+    parser.add_argument(
+        "prompts", help="file with one prompt per line, '-' reads stdin"
+    )
+    parser.add_argument(
+        "--output", default="-", help="JSONL results file, '-' writes stdout"
+    )
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=BATCH_REQUESTS_PER_MINUTE)
+    parser.add_argument("--tpm", type=int, default=BATCH_TOKENS_PER_MINUTE)
+    parser.add_argument("--token-budget", type=int, default=HISTORY_TOKEN_BUDGET)
+    parser.add_argument("--trace", metavar="TRACE_FILE", help="append JSONL spans")
+    cli_args = parser.parse_args()
+
+    tracer.configure(cli_args.trace)
+
+    if cli_args.prompts == "-":
+        prompts = read_prompts(sys.stdin)
+    else:
+        with open(cli_args.prompts) as f:
+            prompts = read_prompts(f)
+
+    client = create_client()
+
+    with contextlib.ExitStack() as stack:
+        results_file = (
+            sys.stdout
+            if cli_args.output == "-"
+            else stack.enter_context(open(cli_args.output, "w"))
+        )
+        # session transcripts are not part of the results, keep them off stdout
+        devnull = stack.enter_context(open(os.devnull, "w"))
+        stack.enter_context(contextlib.redirect_stdout(devnull))
+        asyncio.run(
+            run_batch(
+                client,
+                prompts,
+                results_file,
+                concurrency=cli_args.concurrency,
+                requests_per_minute=cli_args.rpm,
+                tokens_per_minute=cli_args.tpm,
+                token_budget=cli_args.token_budget,
+            )
+        )
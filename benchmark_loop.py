@@ -0,0 +1,97 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from config import WORKSPACE_DIR
+from main import main
+from model_backend import ReplayBackend
+from utils import percentile
+
+
+def benchmark_loop(
+    session_paths: list[str],
+    sessions: int,
+    latency: float = 0.0,
+    max_workers: int = 1,
+) -> dict[str, float]:
+    """Replays recorded sessions through `main.main` and measures the loop itself.
+
+    Sessions run against a scratch copy of the workspace so recorded writes
+    and script runs don't touch the real one.
+    """
+    backends = [
+        ReplayBackend(os.path.abspath(session_path), latency=latency)
+        for session_path in session_paths
+    ]
+    workspace_dir = os.path.abspath(WORKSPACE_DIR)
+    initial_cwd = os.getcwd()
+
+    session_durations: list[float] = []
+    turns = 0
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        shutil.copytree(workspace_dir, os.path.join(scratch_dir, WORKSPACE_DIR))
+        os.chdir(scratch_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                for session in range(sessions):
+                    backend = backends[session % len(backends)]
+                    backend.reset()
+
+                    started_at = time.perf_counter()
+                    main(
+                        backend.prompt, False, max_workers=max_workers, backend=backend
+                    )
+                    session_durations.append(time.perf_counter() - started_at)
+
+                    turns += backend.next_response
+                    output.seek(0)
+                    output.truncate()
+        finally:
+            os.chdir(initial_cwd)
+
+    agent_latencies = [
+        agent_latency
+        for backend in backends
+        for agent_latency in backend.agent_latencies
+    ]
+    total_duration = sum(session_durations)
+    return {
+        "sessions": sessions,
+        "turns": turns,
+        "duration_s": total_duration,
+        "sessions_per_s": sessions / total_duration if total_duration else 0.0,
+        "turns_per_s": turns / total_duration if total_duration else 0.0,
+        "loop_overhead_s": total_duration - turns * latency,
+        "dispatch_p50_ms": percentile(agent_latencies, 0.50) * 1000,
+        "dispatch_p99_ms": percentile(agent_latencies, 0.99) * 1000,
+        "session_p50_ms": percentile(session_durations, 0.50) * 1000,
+        "session_p99_ms": percentile(session_durations, 0.99) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Replay recorded sessions (main.py --record) through the agent loop offline"
+        )
+    )
+    parser.add_argument("session_files", nargs="+")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per model response"
+    )
+    parser.add_argument("--max-workers", type=int, default=1)
+    cli_args = parser.parse_args()
+
+    results = benchmark_loop(
+        cli_args.session_files,
+        sessions=cli_args.sessions,
+        latency=cli_args.latency,
+        max_workers=cli_args.max_workers,
+    )
+    for key, value in results.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,374 @@
+import argparse
+from collections.abc import Callable
+import importlib.util
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from types import ModuleType
+
+from google.genai import types
+
+from call_function import call_function, call_functions
+from config import (
+    BENCHMARK_BASELINE_PATH,
+    BENCHMARK_REGRESSION_THRESHOLD,
+    RUN_PYTHON_MAX_STDERR_BYTES,
+    RUN_PYTHON_MAX_STDOUT_BYTES,
+    RUN_PYTHON_TIMEOUT_SECONDS,
+    WORKSPACE_DIR,
+)
+from functions.edit_file import EditFileFunction
+from functions.get_file_content import GetFileContentFunction
+from functions.get_files_info import GetFilesInfoFunction
+from functions.get_workspace_changes import GetWorkspaceChangesFunction
+from functions.python_worker_pool import PythonWorkerPool
+from functions.result_cache import tool_result_cache
+from functions.run_python_file import RunPythonFunction
+from functions.run_tests import RunTestsFunction
+from functions.search_code import SearchCodeFunction
+from functions.workspace_manifest import WorkspaceManifest
+from functions.write_file import WriteFileFunction
+
+DEFAULT_WORKSPACE_SIZES = (10, 1_000, 10_000)
+FILES_PER_DIRECTORY = 100
+MIN_SAMPLE_SECONDS = 0.02
+
+
+def run_suite(
+    workspace_sizes: tuple[int, ...] = DEFAULT_WORKSPACE_SIZES, samples: int = 5
+) -> dict[str, float]:
+    """Milliseconds per operation of every benchmark, by benchmark name."""
+    results: dict[str, float] = {}
+    results.update(bench_dispatch(samples))
+    for size in workspace_sizes:
+        results.update(bench_tools(size, samples))
+    results.update(bench_run_python_startup(samples))
+    results.update(bench_calculator(samples))
+    return results
+
+
+def compare_to_baseline(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+    """Benchmarks slower than their baseline by more than `threshold` (0.25 is 25%)."""
+    regressions = []
+    for name, value in results.items():
+        baseline_value = baseline.get(name)
+        if baseline_value and value > baseline_value * (1 + threshold):
+            regressions.append(
+                f"{name}: {value:.4f} ms vs baseline {baseline_value:.4f} ms "
+                f"(+{(value / baseline_value - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def bench_dispatch(samples: int) -> dict[str, float]:
+    unknown_call = types.FunctionCall(name="no_such_tool", args={})
+    read_call = types.FunctionCall(
+        name=GetFileContentFunction.name(),
+        args={GetFileContentFunction.file_path_key: "README.md"},
+    )
+    call_function(read_call)
+
+    return {
+        "dispatch.unknown_tool": _time(lambda: call_function(unknown_call), samples),
+        "dispatch.cached_read": _time(lambda: call_function(read_call), samples),
+        "dispatch.call_functions_8_reads": _time(
+            lambda: call_functions([read_call] * 8), samples
+        ),
+    }
+
+
+def bench_tools(size: int, samples: int) -> dict[str, float]:
+    """Every built-in tool on a synthetic workspace of `size` Python files."""
+    prefix = f"tools.{size}"
+    results: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        workspace_dir = os.path.join(scratch_dir, "workspace")
+        _make_workspace(workspace_dir, size)
+        state_dir = os.path.join(scratch_dir, ".aiagent")
+
+        get_files_info = GetFilesInfoFunction(working_directory=workspace_dir)
+        results[f"{prefix}.get_files_info"] = _time(
+            lambda: _uncached(get_files_info, {}), samples
+        )
+        results[f"{prefix}.get_files_info_recursive"] = _time(
+            lambda: _uncached(
+                get_files_info, {GetFilesInfoFunction.recursive_key: True}
+            ),
+            samples,
+        )
+
+        get_file_content = GetFileContentFunction(working_directory=workspace_dir)
+        read_args = {GetFileContentFunction.file_path_key: "d0/module_0.py"}
+        results[f"{prefix}.get_file_content"] = _time(
+            lambda: _uncached(get_file_content, read_args), samples
+        )
+
+        write_file = WriteFileFunction(working_directory=workspace_dir)
+        results[f"{prefix}.write_file"] = _time(
+            lambda: write_file.handle_function_call(
+                {
+                    WriteFileFunction.file_path_key: "d0/written.py",
+                    WriteFileFunction.content_key: "VALUE = 1\n",
+                }
+            ),
+            samples,
+        )
+
+        edit_file = EditFileFunction(working_directory=workspace_dir)
+        edits = iter(range(10**9))
+        results[f"{prefix}.edit_file"] = _time(
+            lambda: edit_file.handle_function_call(
+                {
+                    EditFileFunction.file_path_key: "d0/written.py",
+                    EditFileFunction.search_key: "VALUE = ",
+                    EditFileFunction.replace_key: f"VALUE = {next(edits)} + ",
+                }
+            ),
+            samples,
+        )
+
+        search_code = SearchCodeFunction(working_directory=workspace_dir)
+        search_args = {SearchCodeFunction.query_key: "def function_7("}
+        results[f"{prefix}.search_code_index_build"] = _time(
+            lambda: search_code.handle_function_call(search_args), 1, inner=1
+        )
+        results[f"{prefix}.search_code"] = _time(
+            lambda: search_code.handle_function_call(search_args), samples
+        )
+
+        workspace_changes = GetWorkspaceChangesFunction(working_directory=workspace_dir)
+        workspace_changes.session_manifest = WorkspaceManifest(
+            workspace_dir, os.path.join(state_dir, "manifest.json")
+        )
+        results[f"{prefix}.get_workspace_changes_first"] = _time(
+            lambda: workspace_changes.handle_function_call({}), 1, inner=1
+        )
+        results[f"{prefix}.get_workspace_changes"] = _time(
+            lambda: workspace_changes.handle_function_call({}), samples
+        )
+
+        run_tests = RunTestsFunction(working_directory=workspace_dir)
+        run_tests.session_manifest = WorkspaceManifest(
+            workspace_dir, os.path.join(state_dir, "manifest.json")
+        )
+        results[f"{prefix}.run_tests"] = _time(
+            lambda: run_tests.handle_function_call({}), samples
+        )
+
+        run_python = RunPythonFunction(working_directory=workspace_dir)
+        results[f"{prefix}.run_python_file"] = _time(
+            lambda: run_python.handle_function_call(
+                {RunPythonFunction.python_file_path_key: "test_smoke.py"}
+            ),
+            samples,
+        )
+
+    return results
+
+
+def bench_run_python_startup(samples: int) -> dict[str, float]:
+    """Cost of starting a script that does nothing, cold and from a warm worker."""
+    with tempfile.TemporaryDirectory() as workspace_dir:
+        with open(os.path.join(workspace_dir, "noop.py"), "w") as f:
+            f.write("")
+
+        run_python = RunPythonFunction(working_directory=workspace_dir)
+        cold = _time(
+            lambda: run_python.handle_function_call(
+                {RunPythonFunction.python_file_path_key: "noop.py"}
+            ),
+            samples,
+        )
+
+        worker_pool = PythonWorkerPool(
+            working_directory=workspace_dir, size=1, preload_modules=()
+        )
+        durations = []
+        try:
+            for _ in range(max(samples, 1)):
+                # let the replacement worker finish starting outside the timed run
+                time.sleep(0.2)
+                started_at = time.perf_counter()
+                worker_pool.run(
+                    "noop.py",
+                    [],
+                    RUN_PYTHON_TIMEOUT_SECONDS,
+                    stdout_limit=RUN_PYTHON_MAX_STDOUT_BYTES,
+                    stderr_limit=RUN_PYTHON_MAX_STDERR_BYTES,
+                )
+                durations.append(time.perf_counter() - started_at)
+        finally:
+            worker_pool.close()
+        warm = min(durations) * 1000
+
+    return {"run_python.startup": cold, "run_python.startup_warm_pool": warm}
+
+
+def bench_calculator(samples: int) -> dict[str, float]:
+    """Milliseconds per 1000 `Calculator.evaluate` calls."""
+    Calculator = _load_module(
+        "benchmark_calculator", os.path.join(WORKSPACE_DIR, "pkg", "calculator.py")
+    ).Calculator
+
+    expressions = [
+        f"{index % 97} * ({index % 13} + 4) - {index % 7} / 3" for index in range(1000)
+    ]
+
+    def evaluate_uncached() -> None:
+        calculator = Calculator(cache_size=0)
+        for expression in expressions:
+            calculator.evaluate(expression)
+
+    cached = Calculator()
+    for expression in expressions:
+        cached.evaluate(expression)
+
+    def evaluate_cached() -> None:
+        for expression in expressions:
+            cached.evaluate(expression)
+
+    return {
+        "calculator.evaluate_1000": _time(evaluate_uncached, samples),
+        "calculator.evaluate_1000_cached": _time(evaluate_cached, samples),
+    }
+
+
+def _load_module(name: str, file_path: str) -> ModuleType:
+    """Imports the module at `file_path` as `name`, without touching `sys.path`."""
+    spec = importlib.util.spec_from_file_location(name, file_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"can't load {file_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _time(
+    function: Callable[[], object], samples: int, inner: int | None = None
+) -> float:
+    """Fastest milliseconds per call of `function` over `samples` runs of `inner` calls.
+
+    Without `inner`, enough calls to take about `MIN_SAMPLE_SECONDS` are
+    grouped into each run, so fast operations are not lost in timer noise.
+    The minimum is the least noisy estimate on a busy machine.
+    """
+    if inner is None:
+        started_at = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started_at
+        inner = max(1, min(10_000, math.ceil(MIN_SAMPLE_SECONDS / max(elapsed, 1e-9))))
+
+    durations = []
+    for _ in range(max(samples, 1)):
+        started_at = time.perf_counter()
+        for _ in range(inner):
+            function()
+        durations.append((time.perf_counter() - started_at) / inner)
+    return min(durations) * 1000
+
+
+def _uncached(function, args: dict) -> types.Content:
+    tool_result_cache.clear()
+    return function.handle_function_call(args)
+
+
+def _make_workspace(workspace_dir: str, size: int) -> None:
+    """`size` small modules, `FILES_PER_DIRECTORY` per directory, and a test module."""
+    for index in range(size):
+        directory = os.path.join(workspace_dir, f"d{index // FILES_PER_DIRECTORY}")
+        if index % FILES_PER_DIRECTORY == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"module_{index}.py"), "w") as f:
+            f.write(
+                f"def function_{index}(value):\n    return value * {index}\n\n\nNAME = "
+                f"'module_{index}'\n"
+            )
+
+    with open(os.path.join(workspace_dir, "test_smoke.py"), "w") as f:
+        f.write(
+            "import unittest\n\n\nclass TestSmoke(unittest.TestCase):\n"
+            "    def test_smoke(self):\n        self.assertTrue(True)\n\n\n"
+            "if __name__ == '__main__':\n    unittest.main()\n"
+        )
+
+
+def _load_baseline(baseline_path: str) -> dict[str, float]:
+    try:
+        with open(baseline_path) as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        return {}
+
+
+def _save_baseline(baseline_path: str, results: dict[str, float]) -> None:
+    parent_dir = os.path.dirname(baseline_path)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+    with open(baseline_path, "w") as f:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": {name: round(value, 6) for name, value in results.items()},
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Offline benchmarks of dispatch, tools, run_python_file startup and the "
+            "calculator"
+        )
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_WORKSPACE_SIZES),
+        help="files in each synthetic workspace, e.g. 10 1000 100000",
+    )
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE_PATH)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=BENCHMARK_REGRESSION_THRESHOLD,
+        help="allowed slowdown against the baseline, 0.5 is 50%%",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store these results as the new baseline instead of comparing",
+    )
+    cli_args = parser.parse_args()
+
+    results = run_suite(tuple(cli_args.sizes), samples=cli_args.samples)
+    baseline = _load_baseline(cli_args.baseline)
+    for name, value in results.items():
+        baseline_value = baseline.get(name)
+        change = (
+            f" ({(value / baseline_value - 1) * 100:+.0f}%)" if baseline_value else ""
+        )
+        print(f"{name:<48} {value:>12.4f} ms{change}")
+
+    if cli_args.update_baseline:
+        _save_baseline(cli_args.baseline, results)
+        print(f"Baseline written to {cli_args.baseline}")
+        sys.exit(0)
+
+    regressions = compare_to_baseline(results, baseline, cli_args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {cli_args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
@@ -0,0 +1,190 @@
+# calculator/benchmark.py
+
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+from pkg.calculator import Calculator
+from pkg.render import ResultWriter, format_json_output
+
+
+def generate_expressions(count, terms, seed=0):
+    rng = random.Random(seed)
+    expressions = []
+    for _ in range(count):
+        tokens = [str(rng.randint(1, 99))]
+        for _ in range(terms - 1):
+            tokens.append(rng.choice("+-*/"))
+            tokens.append(str(rng.randint(1, 99)))
+        expressions.append(" ".join(tokens))
+    return expressions
+
+
+def measure(label, function, evaluations):
+    started_at = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - started_at
+    print(f"{label:<28} {evaluations / elapsed:>14,.0f} expressions/s")
+
+
+def bench_evaluate(unique, repeats, terms):
+    expressions = generate_expressions(unique, terms) * repeats
+    evaluations = len(expressions)
+    print(
+        f"{unique} unique expressions of {terms} terms, each evaluated {repeats} times"
+    )
+
+    calculator = Calculator()
+    measure(
+        "uncompiled (scan + infix)",
+        lambda: [calculator._evaluate_infix(calculator.scan(e)) for e in expressions],
+        evaluations,
+    )
+
+    calculator = Calculator()
+    measure(
+        "evaluate (compiled, cached)",
+        lambda: [calculator.evaluate(e) for e in expressions],
+        evaluations,
+    )
+
+    calculator = Calculator()
+    measure(
+        "evaluate_many",
+        lambda: calculator.evaluate_many(expressions),
+        evaluations,
+    )
+
+    rows = unique * repeats
+    rng = random.Random(1)
+    columns = {
+        "x": [rng.uniform(1, 99) for _ in range(rows)],
+        "y": [rng.uniform(1, 99) for _ in range(rows)],
+    }
+    calculator = Calculator()
+    measure(
+        "evaluate_many over columns",
+        lambda: calculator.evaluate_many("x * 2 + y / 3 - x * y", columns),
+        rows,
+    )
+    measure(
+        "evaluate per row",
+        lambda: [
+            calculator.evaluate(f"{x} * 2 + {y} / 3 - {x} * {y}")
+            for x, y in zip(columns["x"], columns["y"], strict=True)
+        ],
+        rows,
+    )
+
+
+def bench_scanner(terms):
+    expression = generate_expressions(1, terms)[0]
+    unspaced = expression.replace(" ", "")
+    print(f"one expression of {terms} terms ({len(expression)} chars)")
+
+    calculator = Calculator()
+    measure_memory(
+        "split + token list",
+        lambda: calculator._evaluate_infix(
+            [(token, 0) for token in _split_tokens(expression)]
+        ),
+        terms,
+    )
+    measure_memory(
+        "scanner generator",
+        lambda: calculator._evaluate_infix(calculator.scan(expression)),
+        terms,
+    )
+    measure_memory(
+        "scanner generator, unspaced",
+        lambda: calculator._evaluate_infix(calculator.scan(unspaced)),
+        terms,
+    )
+
+
+def bench_render(rows):
+    rng = random.Random(2)
+    results = [
+        (f"{a} * {b} / 4", a * b / 4)
+        for a, b in ((rng.randint(1, 99), rng.randint(1, 99)) for _ in range(rows))
+    ]
+    print(f"rendering {rows} results")
+
+    with open(os.devnull, "w") as sink:
+        measure_memory(
+            "format_json_output + print",
+            lambda: _print_json(sink, results),
+            rows,
+            unit="rows",
+        )
+        for output_format in ("ndjson", "csv"):
+            measure_memory(
+                f"ResultWriter {output_format}",
+                lambda output_format=output_format: _render(
+                    ResultWriter(sink, output_format), results
+                ),
+                rows,
+                unit="rows",
+            )
+
+
+def _print_json(sink, results):
+    for expression, result in results:
+        print(format_json_output(expression, result), file=sink)
+
+
+def _render(writer, results):
+    for expression, result in results:
+        writer.write(expression, result)
+    writer.flush()
+
+
+def measure_memory(label, function, terms, unit="terms"):
+    started_at = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - started_at
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<28} {terms / elapsed:>14,.0f} {unit}/s  "
+        f"peak {peak / 1_000_000:>8.1f} MB"
+    )
+
+
+def _split_tokens(expression):
+    """The tokenizer before the scanner: a whitespace split, numbers parsed."""
+    tokens = []
+    for token in expression.strip().split():
+        tokens.append(token if token in "+-*/" else float(token))
+    return tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculator throughput benchmark")
+    parser.add_argument("--unique", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--terms", type=int, default=8)
+    parser.add_argument(
+        "--scanner-terms",
+        type=int,
+        default=200_000,
+        help="terms of the long expression for the scanner benchmark",
+    )
+    parser.add_argument(
+        "--render-rows",
+        type=int,
+        default=200_000,
+        help="results rendered by the renderer benchmark",
+    )
+    args = parser.parse_args()
+
+    bench_evaluate(args.unique, args.repeats, args.terms)
+    print()
+    bench_scanner(args.scanner_terms)
+    print()
+    bench_render(args.render_rows)
@@ -1,8 +1,10 @@
 # calculator/main.py
 
 import sys
+
 from pkg.calculator import Calculator
 from pkg.render import format_json_output
+from pkg.stream import run_stream
 
 
 def main():
@@ -10,9 +12,14 @@ def main():
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print("       python main.py --ndjson|--csv [FILE] [--workers N]")
         print('Example: python main.py "3 + 5"')
         return
 
+    if sys.argv[1] in ("--ndjson", "--csv"):
+        run_stream(sys.argv[2:], output_format=sys.argv[1][2:])
+        return
+
     expression = " ".join(sys.argv[1:])
     try:
         result = calculator.evaluate(expression)
@@ -1,62 +1,248 @@
 # calculator/pkg/calculator.py
 
+from functools import lru_cache
+from itertools import repeat
+import operator
+import re
+from typing import NamedTuple
+
+COMPILE_CACHE_SIZE = 1024
+
+# leading whitespace, then a number (with optional fraction and exponent), a
+# name, or any other single character
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(\S))"
+)
+UNARY_MINUS = "neg"
+
+
+class Variable(NamedTuple):
+    name: str
+
+
+class Program(NamedTuple):
+    """An expression compiled to reverse Polish notation.
+
+    `instructions` holds float operands, `Variable` operands and the binary
+    operator functions to apply to the two values on top of the stack.
+    """
+
+    instructions: tuple
+    variables: tuple
+
 
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=COMPILE_CACHE_SIZE):
         self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
+            "+": operator.add,
+            "-": operator.sub,
+            "*": operator.mul,
+            "/": operator.truediv,
         }
         self.precedence = {
             "+": 1,
             "-": 1,
             "*": 2,
             "/": 2,
+            UNARY_MINUS: 3,
         }
+        # compiled programs by expression text, least recently used evicted first
+        self.compile = lru_cache(maxsize=cache_size)(self._compile)
 
     def evaluate(self, expression):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        return self._run(self.compile(expression))
+
+    def evaluate_many(self, expressions, variables=None):
+        """Evaluates a batch of expressions, or one expression over columns of values.
+
+        Without `variables` every item of `expressions` is evaluated like
+        `evaluate`. With `variables`, `expressions` is a single expression
+        whose names are bound to the equal-length sequences in `variables`,
+        it is run once with every operator applied column-wise and one result
+        per row is returned.
+        """
+        if variables is not None:
+            return self._run_columns(self.compile(expressions), variables)
+
+        compile_expression = self.compile
+        run = self._run
+        return [
+            None
+            if not expression or expression.isspace()
+            else run(compile_expression(expression))
+            for expression in expressions
+        ]
+
+    def _compile(self, expression):
+        return self._to_program(self.scan(expression))
+
+    def scan(self, expression):
+        """Yields (token, position) pairs, numbers as floats and names as `Variable`s.
+
+        Works in one pass over character offsets, whitespace between tokens
+        is optional.
+        """
+        symbols = "+-*/()"
+        for match in TOKEN_PATTERN.finditer(expression):
+            number, name, symbol = match.groups()
+            if number is not None:
+                yield float(number), match.start(1)
+            elif name is not None:
+                yield Variable(name), match.start(2)
+            elif symbol in symbols:
+                yield symbol, match.start(3)
+            else:
+                raise ValueError(
+                    f"invalid token '{symbol}' at position {match.start(3)}"
+                )
 
     def _evaluate_infix(self, tokens):
-        values = []
+        return self._run(self._to_program(tokens))
+
+    def _to_program(self, tokens):
+        """Shunting-yard from (token, position) pairs to a `Program`.
+
+        Tokens are consumed one at a time, so a generator such as `scan` is
+        never turned into a list. A `-` where an operand is expected is a
+        unary minus, which binds tighter than every binary operator.
+        """
+        instructions = []
         operators = []
+        variables = []
+        depth = 0
+        expect_operand = True
 
-        for token in tokens:
-            if token in self.operators:
+        for token, position in tokens:
+            token_class = token.__class__
+            if token_class is float or token_class is Variable:
+                if not expect_operand:
+                    raise ValueError(f"missing operator before position {position}")
+                instructions.append(token)
+                if token_class is Variable and token.name not in variables:
+                    variables.append(token.name)
+                depth += 1
+                expect_operand = False
+            elif token == "(":
+                if not expect_operand:
+                    raise ValueError(f"missing operator before position {position}")
+                operators.append((token, position))
+            elif token == ")":
+                if expect_operand:
+                    raise ValueError(f"missing operand before position {position}")
+                while operators and operators[-1][0] != "(":
+                    depth = self._emit_operator(operators.pop(), instructions, depth)
+                if not operators:
+                    raise ValueError(f"unmatched ')' at position {position}")
+                operators.pop()
+            elif expect_operand:
+                if token != "-":
+                    raise ValueError(
+                        f"not enough operands for operator {token} at position "
+                        f"{position}"
+                    )
+                operators.append((UNARY_MINUS, position))
+            else:
+                precedence = self.precedence[token]
                 while (
                     operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
+                    and operators[-1][0] != "("
+                    and self.precedence[operators[-1][0]] >= precedence
                 ):
-                    self._apply_operator(operators, values)
-                operators.append(token)
-            else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                    depth = self._emit_operator(operators.pop(), instructions, depth)
+                operators.append((token, position))
+                expect_operand = True
+
+        if expect_operand and operators:
+            operator_token, position = operators[-1]
+            if operator_token != "(":
+                operator_token = (
+                    "-" if operator_token == UNARY_MINUS else operator_token
+                )
+                raise ValueError(
+                    f"not enough operands for operator {operator_token} at position "
+                    f"{position}"
+                )
 
         while operators:
-            self._apply_operator(operators, values)
+            if operators[-1][0] == "(":
+                raise ValueError(f"unmatched '(' at position {operators[-1][1]}")
+            depth = self._emit_operator(operators.pop(), instructions, depth)
 
-        if len(values) != 1:
+        if depth != 1:
             raise ValueError("invalid expression")
 
-        return values[0]
+        return Program(tuple(instructions), tuple(variables))
+
+    def _emit_operator(self, operator_entry, instructions, depth):
+        operator_token, position = operator_entry
+        if operator_token == UNARY_MINUS:
+            if instructions[-1].__class__ is float:
+                # the operand is a single number: fold the sign into it
+                instructions[-1] = -instructions[-1]
+            else:
+                # keeps the program binary-only for both runners
+                instructions.append(-1.0)
+                instructions.append(operator.mul)
+            return depth
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+        if depth < 2:
+            raise ValueError(
+                f"not enough operands for operator {operator_token} at position "
+                f"{position}"
+            )
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+        instructions.append(self.operators[operator_token])
+        return depth - 1
+
+    def _run(self, program):
+        if program.variables:
+            raise ValueError(f"invalid token: {program.variables[0]}")
+
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for instruction in program.instructions:
+            if instruction.__class__ is float:
+                push(instruction)
+            else:
+                b = pop()
+                push(instruction(pop(), b))
+        return stack[0]
+
+    def _run_columns(self, program, variables):
+        # rows come from every column passed in, not only the ones the
+        # expression uses, so a constant expression still gets one per row
+        lengths = {len(values) for values in variables.values()}
+        if len(lengths) > 1:
+            raise ValueError("variables must have the same number of values")
+        rows = lengths.pop() if lengths else 1
+
+        columns = {}
+        for name in program.variables:
+            if name not in variables:
+                raise ValueError(f"no values for variable {name}")
+            columns[name] = [float(value) for value in variables[name]]
+
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for instruction in program.instructions:
+            if instruction.__class__ is float:
+                push(instruction)
+            elif instruction.__class__ is Variable:
+                push(columns[instruction.name])
+            else:
+                b = pop()
+                a = pop()
+                if a.__class__ is list:
+                    b = b if b.__class__ is list else repeat(b)
+                    push(list(map(instruction, a, b)))
+                elif b.__class__ is list:
+                    push(list(map(instruction, repeat(a), b)))
+                else:
+                    push(instruction(a, b))
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
+        result = stack[0]
+        return result if result.__class__ is list else [result] * rows
@@ -1,16 +1,96 @@
 # calculator/pkg/render.py
 
+import csv
 import json
+import math
 
+# rows buffered by ResultWriter before they are written to the stream
+WRITE_BUFFER_ROWS = 1024
+FORMATS = ("ndjson", "csv")
 
-def format_json_output(expression: str, result: float, indent: int = 2) -> str:
-    if isinstance(result, float) and result.is_integer():
-        result_to_dump = int(result)
-    else:
-        result_to_dump = result
 
+def format_json_output(expression: str, result: float, indent: int = 2) -> str:
     output_data = {
         "expression": expression,
-        "result": result_to_dump,
+        "result": normalize_result(result),
     }
     return json.dumps(output_data, indent=indent)
+
+
+def normalize_result(result: float) -> float | int:
+    if isinstance(result, float) and result.is_integer():
+        return int(result)
+    return result
+
+
+class ResultWriter:
+    """Writes expression results to a text stream as NDJSON or CSV, one row per result.
+
+    Rows are rendered with one reused encoder (no dict per row) and written
+    in batches of `WRITE_BUFFER_ROWS`, call `flush` when done. NDJSON rows
+    are `{"expression":...,"result":...}` or `{"expression":...,"error":...}`,
+    CSV has an `expression,result,error` header and leaves the unused column
+    empty. A missing result is `null` in NDJSON and an empty cell in CSV.
+    Results that are whole floats are written as ints, as in
+    `format_json_output`.
+    """
+
+    def __init__(self, stream, format: str = "ndjson", header: bool = True):
+        if format not in FORMATS:
+            raise ValueError(f"unknown format {format}, expected one of {FORMATS}")
+
+        self.stream = stream
+        self.format = format
+        self.pending: list[str] = []
+        self.encoder = json.JSONEncoder(separators=(",", ":"))
+        self.csv_writer = csv.writer(_LineSink(self.write_line), lineterminator="\n")
+        if format == "csv" and header:
+            self.csv_writer.writerow(("expression", "result", "error"))
+
+    def write(
+        self, expression: str, result: float | None = None, error: str | None = None
+    ) -> None:
+        if self.format == "csv":
+            self.csv_writer.writerow(
+                (
+                    expression,
+                    "" if error is not None or result is None else self._number(result),
+                    error or "",
+                )
+            )
+            return
+
+        if error is not None:
+            self.write_line(
+                f'{{"expression":{self.encoder.encode(expression)},"error":{self.encoder.encode(error)}}}\n'
+            )
+        else:
+            number = "null" if result is None else self._number(result)
+            self.write_line(
+                f'{{"expression":{self.encoder.encode(expression)},"result":{number}}}\n'
+            )
+
+    def write_line(self, line: str) -> None:
+        self.pending.append(line)
+        if len(self.pending) >= WRITE_BUFFER_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.stream.write("".join(self.pending))
+            self.pending.clear()
+
+    def _number(self, result: float) -> str:
+        if result.__class__ is float:
+            if result.is_integer():
+                return str(int(result))
+            if not math.isfinite(result):
+                return self.encoder.encode(result)
+        return repr(result)
+
+
+class _LineSink:
+    """File-like target for csv.writer, forwarding each row to a callback."""
+
+    def __init__(self, write):
+        self.write = write
@@ -0,0 +1,101 @@
+# calculator/pkg/stream.py
+
+import argparse
+from collections import deque
+import io
+from multiprocessing import Pool
+import sys
+
+from pkg.calculator import Calculator
+from pkg.render import ResultWriter
+
+# lines handed to a worker process at a time in --ndjson/--csv mode
+STREAM_CHUNK_LINES = 2048
+
+_calculator = None
+
+
+def run_stream(args, output_format):
+    """`--ndjson|--csv [FILE] [--workers N]` of main.py.
+
+    One expression per line of FILE (or stdin) in, one record per line out.
+    """
+    parser = argparse.ArgumentParser(prog=f"main.py --{output_format}")
+    parser.add_argument(
+        "file", nargs="?", default="-", help="one expression per line, '-' reads stdin"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes to evaluate with"
+    )
+    options = parser.parse_args(args)
+    path, workers = options.file, options.workers
+
+    if path == "-":
+        stream_expressions(sys.stdin, sys.stdout, workers, output_format)
+    else:
+        with open(path) as f:
+            stream_expressions(f, sys.stdout, workers, output_format)
+    sys.stdout.flush()
+
+
+def stream_expressions(lines, output, workers=1, output_format="ndjson"):
+    """Writes one record per input line to `output`, in input order.
+
+    A line that fails to evaluate gets an `error` record instead of a
+    `result` and the stream goes on. With more than one worker, chunks of
+    lines are evaluated and rendered in worker processes while at most two
+    chunks per worker are in flight, so memory stays bounded on large inputs.
+    """
+    writer = ResultWriter(output, output_format)
+    if workers <= 1:
+        calculator = Calculator()
+        for line in lines:
+            writer.write(*_evaluate_line(calculator, line))
+        writer.flush()
+        return
+
+    writer.flush()
+    with Pool(workers) as pool:
+        pending = deque()
+        for chunk in _chunks(lines, STREAM_CHUNK_LINES):
+            pending.append(pool.apply_async(_evaluate_chunk, (chunk, output_format)))
+            if len(pending) >= workers * 2:
+                output.write(pending.popleft().get())
+        while pending:
+            output.write(pending.popleft().get())
+
+
+def _evaluate_chunk(lines, output_format):
+    global _calculator
+    if _calculator is None:
+        _calculator = Calculator()
+
+    rendered = io.StringIO()
+    writer = ResultWriter(rendered, output_format, header=False)
+    for line in lines:
+        writer.write(*_evaluate_line(_calculator, line))
+    writer.flush()
+    return rendered.getvalue()
+
+
+def _evaluate_line(calculator, line):
+    """(expression, result, error) for one input line."""
+    expression = line.rstrip("\r\n")
+    try:
+        result = calculator.evaluate(expression)
+    except Exception as e:
+        return expression, None, str(e)
+    if result is None:
+        return expression, None, "empty expression"
+    return expression, result, None
+
+
+def _chunks(lines, size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -1,8 +1,14 @@
 # calculator/tests.py
 
+import contextlib
+import io
+import json
 from typing import override
 import unittest
+
 from pkg.calculator import Calculator
+from pkg.render import ResultWriter, format_json_output
+from pkg.stream import run_stream, stream_expressions
 
 
 class TestCalculator(unittest.TestCase):
@@ -46,6 +52,135 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_unspaced_expression(self):
+        self.assertEqual(self.calculator.evaluate("3+5*2"), 13)
+
+    def test_parentheses(self):
+        self.assertEqual(self.calculator.evaluate("(2 + 3) * (10 - 6) / 2"), 10)
+
+    def test_unary_minus(self):
+        self.assertEqual(self.calculator.evaluate("-3 * -(2 - 4)"), -6)
+        self.assertEqual(self.calculator.evaluate("2 - -2"), 4)
+
+    def test_scientific_notation(self):
+        self.assertEqual(self.calculator.evaluate("1.5e3 + 2E-1 + .5"), 1500.7)
+
+    def test_errors_report_position(self):
+        for expression, message in (
+            ("3 + $", "position 4"),
+            ("(3 + 4", "position 0"),
+            ("3 + 4)", "position 5"),
+            ("3 4", "position 2"),
+            ("3 *", "position 2"),
+        ):
+            with (
+                self.subTest(expression=expression),
+                self.assertRaisesRegex(ValueError, message),
+            ):
+                self.calculator.evaluate(expression)
+
+    def test_compiled_programs_are_cached(self):
+        first = self.calculator.compile("2 * 3 - 8 / 2 + 5")
+        second = self.calculator.compile("2 * 3 - 8 / 2 + 5")
+        self.assertIs(first, second)
+        self.assertEqual(self.calculator.compile.cache_info().hits, 1)
+        self.assertEqual(self.calculator.evaluate("2 * 3 - 8 / 2 + 5"), 7)
+
+    def test_evaluate_many(self):
+        results = self.calculator.evaluate_many(["3 + 5", "", "10 / 4"])
+        self.assertEqual(results, [8, None, 2.5])
+
+    def test_evaluate_many_over_columns(self):
+        results = self.calculator.evaluate_many(
+            "x * 2 + y / 4 - 1", {"x": [1, 2, 3], "y": [4, 8, 12]}
+        )
+        self.assertEqual(results, [2, 5, 8])
+
+    def test_evaluate_many_rows_come_from_every_column(self):
+        self.assertEqual(self.calculator.evaluate_many("3", {"x": [1, 2]}), [3, 3])
+        self.assertEqual(self.calculator.evaluate_many("x", {"x": [1, 2]}), [1, 2])
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_many("x", {"x": [1, 2], "y": [1]})
+
+    def test_unbound_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_many("x + y", {"x": [1]})
+
+
+class TestNdjsonStream(unittest.TestCase):
+    def test_errors_do_not_stop_the_stream(self):
+        output = io.StringIO()
+        stream_expressions(["3 + 5\n", "1 / 0\n", "\n", "10 / 4"], output)
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            [
+                '{"expression":"3 + 5","result":8}',
+                '{"expression":"1 / 0","error":"float division by zero"}',
+                '{"expression":"","error":"empty expression"}',
+                '{"expression":"10 / 4","result":2.5}',
+            ],
+        )
+
+    def test_csv_output(self):
+        output = io.StringIO()
+        stream_expressions(
+            ["3 + 5\n", "1 / 0\n", "2.5 * 3"], output, output_format="csv"
+        )
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            [
+                "expression,result,error",
+                "3 + 5,8,",
+                "1 / 0,,float division by zero",
+                "2.5 * 3,7.5,",
+            ],
+        )
+
+    def test_result_writer_missing_result(self):
+        for output_format, expected in (
+            ("ndjson", ['{"expression":"x","result":null}']),
+            ("csv", ["expression,result,error", "x,,"]),
+        ):
+            output = io.StringIO()
+            writer = ResultWriter(output, format=output_format)
+            writer.write("x", None)
+            writer.flush()
+            self.assertEqual(output.getvalue().splitlines(), expected)
+
+    def test_result_writer_matches_format_json_output(self):
+        output = io.StringIO()
+        writer = ResultWriter(output)
+        results = (("a", 8.0), ("b", 2.5), ("c", 3), ('"q"', -0.1))
+        for expression, result in results:
+            writer.write(expression, result)
+        writer.flush()
+        expected = [
+            json.dumps(
+                json.loads(format_json_output(expression, result)),
+                separators=(",", ":"),
+            )
+            for expression, result in results
+        ]
+        self.assertEqual(output.getvalue().splitlines(), expected)
+
+    def test_bad_workers_value_is_a_usage_error(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as exit:
+            run_stream(["--workers", "many"], output_format="ndjson")
+        self.assertEqual(exit.exception.code, 2)
+        self.assertIn("invalid int value: 'many'", stderr.getvalue())
+
+    def test_workers_keep_input_order(self):
+        lines = [f"{index} * 2\n" for index in range(5000)]
+        sequential = io.StringIO()
+        parallel = io.StringIO()
+        stream_expressions(lines, sequential)
+        stream_expressions(lines, parallel, workers=2)
+        self.assertEqual(parallel.getvalue(), sequential.getvalue())
+        self.assertEqual(len(parallel.getvalue().splitlines()), 5000)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,39 +1,164 @@
-from typing import Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+import os
+
 from google.genai import types
 
-from config import WORKSPACE_DIR
-from functions.function_interface import CodingToolFunctionInterface
-from functions.get_file_content import GetFileContentFunction
-from functions.get_files_info import GetFilesInfoFunction
+from config import MAX_FUNCTION_CALL_WORKERS
+from functions.registry import tool_registry
+from tracing import tracer
 from utils import generate_fault_message
-from functions.run_python_file import RunPythonFunction
-from functions.write_file import WriteFileFunction
 
 
 def call_function(function_call_part: types.FunctionCall) -> types.Content:
-    working_directory = WORKSPACE_DIR
+    with tracer.span("tool_call", tool=function_call_part.name) as tool_span:
+        function_response = _call_function(function_call_part)
 
-    coding_tool_function: Optional[CodingToolFunctionInterface] = None
+        if tracer.enabled:
+            tool_span.update(
+                args_bytes=len(json.dumps(function_call_part.args or {})),
+                response_bytes=sum(
+                    len(json.dumps(part.function_response.response))
+                    for part in function_response.parts or []
+                    if part.function_response
+                ),
+            )
 
-    if function_call_part.name == GetFileContentFunction.name():
-        coding_tool_function = GetFileContentFunction(
-            working_directory=working_directory
-        )
-        return coding_tool_function.handle_function_call(args=function_call_part.args)
+        return function_response
 
-    if function_call_part.name == GetFilesInfoFunction.name():
-        coding_tool_function = GetFilesInfoFunction(working_directory=working_directory)
-        return coding_tool_function.handle_function_call(args=function_call_part.args)
-
-    if function_call_part.name == WriteFileFunction.name():
-        coding_tool_function = WriteFileFunction(working_directory=working_directory)
-        return coding_tool_function.handle_function_call(args=function_call_part.args)
 
-    if function_call_part.name == RunPythonFunction.name():
-        coding_tool_function = RunPythonFunction(working_directory=working_directory)
+def _call_function(function_call_part: types.FunctionCall) -> types.Content:
+    coding_tool_function = tool_registry.get(function_call_part.name)
+    if coding_tool_function is not None:
         return coding_tool_function.handle_function_call(args=function_call_part.args)
 
     return generate_fault_message(
         function_call_part.name or "undefined function name",
         message="Hey! this function is not avaiable in the provided coding agent tool. Please check again and retry",
     )
+
+
+def call_functions(
+    function_call_parts: list[types.FunctionCall],
+    max_workers: int = MAX_FUNCTION_CALL_WORKERS,
+) -> list[types.Content]:
+    """Runs the function calls of one model turn, concurrently where it is safe.
+
+    Calls that touch overlapping paths (and at least one of them writes) keep
+    their relative order, everything else runs at the same time on at most
+    `max_workers` threads. Results are returned in the original call order.
+    """
+    if max_workers <= 1 or len(function_call_parts) <= 1:
+        return [call_function(part) for part in function_call_parts]
+
+    results: list[types.Content | None] = [None] * len(function_call_parts)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for wave in schedule_function_calls(function_call_parts):
+            # copy the context so tool spans stay children of the current turn
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    call_function,
+                    function_call_parts[index],
+                )
+                for index in wave
+            ]
+            for index, future in zip(wave, futures, strict=True):
+                results[index] = future.result()
+
+    return [result for result in results if result is not None]
+
+
+def schedule_function_calls(
+    function_call_parts: list[types.FunctionCall],
+) -> list[list[int]]:
+    """Groups call indexes into waves, a call runs after the calls it conflicts with."""
+    waves: list[list[int]] = []
+    call_waves: list[int] = []
+
+    for index, part in enumerate(function_call_parts):
+        wave = 0
+        for previous_index in range(index):
+            if function_calls_conflict(function_call_parts[previous_index], part):
+                wave = max(wave, call_waves[previous_index] + 1)
+
+        call_waves.append(wave)
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(index)
+
+    return waves
+
+
+def function_calls_conflict(
+    first: types.FunctionCall, second: types.FunctionCall
+) -> bool:
+    first_function = tool_registry.get(first.name)
+    second_function = tool_registry.get(second.name)
+    if first_function is None or second_function is None:
+        return False
+
+    if not first_function.is_mutating() and not second_function.is_mutating():
+        return False
+
+    return any(
+        _paths_overlap(first_path, second_path)
+        for first_path in first_function.accessed_paths(first.args)
+        for second_path in second_function.accessed_paths(second.args)
+    )
+
+
+def _paths_overlap(first: str, second: str) -> bool:
+    first = os.path.normpath(first)
+    second = os.path.normpath(second)
+    if first == "." or second == ".":
+        return True
+
+    return (
+        first == second
+        or first.startswith(second + os.sep)
+        or second.startswith(first + os.sep)
+    )
+
+
+class AsyncFunctionCallDispatcher:
+    """Starts function calls as soon as they arrive from a streamed model turn.
+
+    Each call is run on a worker thread once every earlier call it conflicts
+    with (see `function_calls_conflict`) has finished, `semaphore` caps how
+    many calls run at the same time.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore) -> None:
+        self.semaphore = semaphore
+        self.function_call_parts: list[types.FunctionCall] = []
+        self.tasks: list[asyncio.Task[types.Content]] = []
+
+    def submit(self, function_call_part: types.FunctionCall) -> None:
+        dependencies = [
+            task
+            for previous_part, task in zip(
+                self.function_call_parts, self.tasks, strict=True
+            )
+            if function_calls_conflict(previous_part, function_call_part)
+        ]
+        task = asyncio.create_task(self._run(function_call_part, dependencies))
+
+        self.function_call_parts.append(function_call_part)
+        self.tasks.append(task)
+
+    async def results(self) -> list[types.Content]:
+        return list(await asyncio.gather(*self.tasks))
+
+    async def _run(
+        self,
+        function_call_part: types.FunctionCall,
+        dependencies: list[asyncio.Task[types.Content]],
+    ) -> types.Content:
+        if dependencies:
+            await asyncio.wait(dependencies)
+
+        async with self.semaphore:
+            return await asyncio.to_thread(call_function, function_call_part)
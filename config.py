@@ -1,2 +1,59 @@
 MAX_CHARS_TO_READ_FROM_FILE = 1800
-WORKSPACE_DIR = "calculator"
\ No newline at end of file
+WORKSPACE_DIR = "calculator"
+MAX_FUNCTION_CALL_WORKERS = 4
+MODEL_NAME = "gemini-2.0-flash"
+# request policy around generate_content (model_backend.RequestPolicyBackend)
+MODEL_CALL_TIMEOUT_SECONDS = 120
+MODEL_MAX_RETRIES = 4
+MODEL_BACKOFF_BASE_SECONDS = 1.0
+MODEL_BACKOFF_MAX_SECONDS = 30.0
+# send a second request when the first is slower than this latency percentile
+MODEL_HEDGE_REQUESTS = False
+MODEL_HEDGE_PERCENTILE = 0.95
+MODEL_HEDGE_MIN_SAMPLES = 20
+HISTORY_TOKEN_BUDGET = 32_000
+HISTORY_KEEP_RECENT_TURNS = 2
+HISTORY_COMPACTED_RESULT_CHARS = 200
+# byte caps of tool results sent to the model (head and tail are kept)
+TOOL_RESPONSE_MAX_BYTES = 24_000
+TOOL_RESPONSE_MAX_BYTES_PER_TOOL = {"run_tests": 12_000, "search_code": 12_000}
+# shorter repeated results are sent again instead of a reference
+TOOL_RESPONSE_DEDUPE_MIN_BYTES = 256
+TOOL_RESULT_CACHE_MAX_ENTRIES = 256
+BATCH_CONCURRENCY = 4
+BATCH_REQUESTS_PER_MINUTE = 15
+BATCH_TOKENS_PER_MINUTE = 1_000_000
+RUN_PYTHON_TIMEOUT_SECONDS = 30
+# per-run resource limits of run_python_file scripts, None leaves one unset
+RUN_PYTHON_CPU_SECONDS = 30
+RUN_PYTHON_MAX_MEMORY_BYTES = 1024 * 1024 * 1024
+RUN_PYTHON_MAX_OPEN_FILES = 256
+# scripts running at once across every session of the process
+RUN_PYTHON_MAX_CONCURRENT = 4
+# 0 keeps the default of one fresh `python3` per run
+PYTHON_WORKER_POOL_SIZE = 0
+PYTHON_WORKER_MAX_RUNS = 1
+# stdlib only, a workspace adds its own modules in PYTHON_WORKER_PRELOAD_FILE
+PYTHON_WORKER_PRELOAD_MODULES = ("unittest", "json")
+# in the working directory, one module name per line, `#` starts a comment
+PYTHON_WORKER_PRELOAD_FILE = ".python_worker_preload"
+RUN_PYTHON_MAX_STDOUT_BYTES = 8000
+RUN_PYTHON_MAX_STDERR_BYTES = 8000
+# echo script output to the console while it runs (direct subprocess runs only)
+RUN_PYTHON_ECHO_OUTPUT = False
+MAX_FILE_READ_LENGTH = 20_000
+GET_FILES_INFO_MAX_DEPTH = 5
+GET_FILES_INFO_PAGE_SIZE = 200
+GET_FILES_INFO_MAX_CHARS = 10_000
+SEARCH_CODE_MAX_RESULTS = 50
+SEARCH_INDEX_MAX_FILE_BYTES = 1_000_000
+EDIT_FILE_MAX_DIFF_CHARS = 2000
+WORKSPACE_MANIFEST_PATH = ".aiagent/manifest.json"
+WORKSPACE_MAP_MAX_ENTRIES = 200
+WORKSPACE_SNAPSHOT_IN_PROMPT = True
+RUN_TESTS_PATTERN = "test*.py"
+RUN_TESTS_MAX_SHARDS = 4
+RUN_TESTS_MIN_TESTS_PER_SHARD = 20
+RUN_TESTS_MAX_TRACEBACK_LINES = 8
+BENCHMARK_BASELINE_PATH = "benchmarks/baseline.json"
+BENCHMARK_REGRESSION_THRESHOLD = 0.5
@@ -0,0 +1,176 @@
+import argparse
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from typing import override
+
+from google import genai
+from google.genai import types
+
+# `status` of the error body per HTTP status, as the Gemini API reports it
+ERROR_STATUSES = {
+    400: "INVALID_ARGUMENT",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+@dataclass(frozen=True)
+class Fault:
+    """What the server does with one request: wait `latency` s, answer with `status`."""
+
+    latency: float = 0.0
+    status: int = 200
+
+
+class FakeModelServer:
+    """Local stand-in for the Gemini `generateContent` endpoint, with injected faults.
+
+    Requests take the next entry of `faults` while there is one, then fail
+    with status 503 at `error_rate` and otherwise wait `latency` seconds
+    (plus up to `latency_jitter`) before answering with `text`. Served
+    from a background thread on 127.0.0.1, use `client()` to talk to it.
+    """
+
+    def __init__(
+        self,
+        text: str = "Done.",
+        faults: tuple[Fault, ...] = (),
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        port: int = 0,
+        seed: int = 0,
+    ) -> None:
+        self.text = text
+        self.faults = list(faults)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self.server.daemon_threads = True
+        self.thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def client(self) -> genai.Client:
+        return genai.Client(
+            api_key="fake-key", http_options=types.HttpOptions(base_url=self.base_url)
+        )
+
+    def start(self) -> "FakeModelServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeModelServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def next_fault(self) -> Fault:
+        with self.lock:
+            self.requests += 1
+            if self.faults:
+                return self.faults.pop(0)
+            if self.random.random() < self.error_rate:
+                return Fault(status=503)
+            return Fault(
+                latency=self.latency + self.random.uniform(0, self.latency_jitter)
+            )
+
+    def response_body(self, fault: Fault) -> dict:
+        if fault.status != 200:
+            return {
+                "error": {
+                    "code": fault.status,
+                    "message": "injected by FakeModelServer",
+                    "status": ERROR_STATUSES.get(fault.status, "UNKNOWN"),
+                }
+            }
+        return {
+            "candidates": [
+                {
+                    "content": {"role": "model", "parts": [{"text": self.text}]},
+                    "finishReason": "STOP",
+                }
+            ],
+            "usageMetadata": {
+                "promptTokenCount": 10,
+                "candidatesTokenCount": 2,
+                "totalTokenCount": 12,
+            },
+        }
+
+
+def _handler(fake_server: FakeModelServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.endswith(":generateContent"):
+                self.send_error(404)
+                return
+
+            fault = fake_server.next_fault()
+            if fault.latency > 0:
+                time.sleep(fault.latency)
+
+            body = json.dumps(fake_server.response_body(fault)).encode()
+            try:
+                self.send_response(fault.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # the client gave up on this request
+                pass
+
+        @override
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Serve a fake generateContent endpoint with injected latency and errors"
+        )
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--text", default="Done.")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    cli_args = parser.parse_args()
+
+    fake_server = FakeModelServer(
+        text=cli_args.text,
+        latency=cli_args.latency,
+        latency_jitter=cli_args.latency_jitter,
+        error_rate=cli_args.error_rate,
+        port=cli_args.port,
+    )
+    print(f"Serving on {fake_server.base_url}, Ctrl+C to stop")
+    try:
+        fake_server.server.serve_forever()
+    except KeyboardInterrupt:
+        fake_server.server.server_close()
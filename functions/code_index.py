@@ -0,0 +1,229 @@
+from collections import defaultdict
+from collections.abc import Iterator
+import os
+import re
+import threading
+
+from config import SEARCH_INDEX_MAX_FILE_BYTES
+from functions.gitignore import GitignoreRules
+
+SKIPPED_DIRECTORIES = {".git", "__pycache__", ".venv", "venv", "node_modules"}
+
+
+class CodeIndex:
+    """Trigram index of the text files under a directory.
+
+    `refresh` re-stats the tree and only re-reads files whose mtime or size
+    changed, so it is cheap to call before every search. Searches use the
+    index to pick candidate files and then confirm matches line by line.
+    Trigrams are stored lower-cased so one index serves case sensitive and
+    insensitive queries.
+    """
+
+    def __init__(self, root_directory: str) -> None:
+        self.abs_root_directory = os.path.abspath(root_directory)
+        self.signatures: dict[str, tuple[int, int]] = {}
+        self.file_trigrams: dict[str, set[str]] = {}
+        self.postings: dict[str, set[str]] = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def refresh(self) -> None:
+        with self.lock:
+            seen: set[str] = set()
+            for rel_path, signature in self._walk():
+                seen.add(rel_path)
+                if self.signatures.get(rel_path) != signature:
+                    self._index_file(rel_path, signature)
+
+            for rel_path in list(self.signatures):
+                if rel_path not in seen:
+                    self._remove_file(rel_path)
+
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = True,
+        max_results: int = 50,
+    ) -> tuple[list[tuple[str, int, str]], bool]:
+        """(path, line number, line) matches in path order, and whether they were cut.
+
+        Results stop after `max_results` matches.
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(query if regex else re.escape(query), flags)
+        literals = _required_literals(query) if regex else [query]
+
+        self.refresh()
+        with self.lock:
+            candidates = self._candidates(literals)
+
+        matches: list[tuple[str, int, str]] = []
+        for rel_path in sorted(candidates):
+            try:
+                with open(
+                    os.path.join(self.abs_root_directory, rel_path),
+                    encoding="utf-8",
+                    errors="replace",
+                ) as f:
+                    for line_number, line in enumerate(f, start=1):
+                        if pattern.search(line):
+                            if len(matches) >= max_results:
+                                return matches, True
+                            matches.append((rel_path, line_number, line.rstrip("\n")))
+            except OSError:
+                continue
+
+        return matches, False
+
+    def _candidates(self, literals: list[str]) -> set[str]:
+        candidates: set[str] | None = None
+        for literal in literals:
+            for trigram in _trigrams(literal.lower()):
+                paths = self.postings.get(trigram, set())
+                candidates = set(paths) if candidates is None else candidates & paths
+                if not candidates:
+                    return set()
+
+        # no usable trigram (short or complex query): every indexed file
+        return set(self.signatures) if candidates is None else candidates
+
+    def _index_file(self, rel_path: str, signature: tuple[int, int]) -> None:
+        self._remove_file(rel_path)
+        try:
+            with open(os.path.join(self.abs_root_directory, rel_path), "rb") as f:
+                raw = f.read()
+        except OSError:
+            return
+        if b"\0" in raw:
+            return
+
+        trigrams = _trigrams(raw.decode("utf-8", errors="replace").lower())
+        for trigram in trigrams:
+            self.postings[trigram].add(rel_path)
+        self.file_trigrams[rel_path] = trigrams
+        self.signatures[rel_path] = signature
+
+    def _remove_file(self, rel_path: str) -> None:
+        for trigram in self.file_trigrams.pop(rel_path, set()):
+            paths = self.postings.get(trigram)
+            if paths is not None:
+                paths.discard(rel_path)
+                if not paths:
+                    del self.postings[trigram]
+        self.signatures.pop(rel_path, None)
+
+    def _walk(self):
+        for rel_path, stat_result in walk_files(self.abs_root_directory):
+            if stat_result.st_size > SEARCH_INDEX_MAX_FILE_BYTES:
+                continue
+            yield rel_path, (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def walk_files(abs_root_directory: str) -> Iterator[tuple[str, os.stat_result]]:
+    """(relative path, stat) of every regular file under `abs_root_directory`.
+
+    Skips `SKIPPED_DIRECTORIES` and anything ignored by the `.gitignore`
+    files found on the way down.
+    """
+    stack: list[tuple[str, str, GitignoreRules]] = [
+        (abs_root_directory, "", GitignoreRules())
+    ]
+    while stack:
+        current_directory, rel_directory, rules = stack.pop()
+        rules = rules.with_file(
+            os.path.join(current_directory, ".gitignore"), rel_directory
+        )
+        try:
+            with os.scandir(current_directory) as iterator:
+                dir_entries = list(iterator)
+        except OSError:
+            continue
+
+        for entry in dir_entries:
+            rel_path = f"{rel_directory}/{entry.name}" if rel_directory else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIPPED_DIRECTORIES and not rules.is_ignored(
+                    rel_path, True
+                ):
+                    stack.append((entry.path, rel_path, rules))
+                continue
+
+            if not entry.is_file() or rules.is_ignored(rel_path, False):
+                continue
+            try:
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            yield rel_path, stat_result
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[index : index + 3] for index in range(len(text) - 2)}
+
+
+def _required_literals(pattern: str) -> list[str]:
+    """Literal runs every match of `pattern` must contain, [] when unsure.
+
+    Conservative on purpose: alternations give up, groups and character
+    classes end a run, and a run loses its last character before `?`,
+    `*` or `{`.
+    """
+    if "|" in pattern:
+        return []
+
+    literals: list[str] = []
+    current = ""
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            escaped = pattern[index + 1 : index + 2]
+            index += 2
+            if escaped and not escaped.isalnum():
+                current += escaped
+                continue
+            literals.append(current)
+            current = ""
+            continue
+
+        if char in "*?{":
+            current = current[:-1]
+        if char in ".^$*+?{}[]()":
+            literals.append(current)
+            current = ""
+            if char in "[(":
+                index = _skip_group(pattern, index)
+                continue
+            if char == "{":
+                closing = pattern.find("}", index)
+                index = len(pattern) if closing == -1 else closing + 1
+                continue
+            index += 1
+            continue
+
+        current += char
+        index += 1
+
+    literals.append(current)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def _skip_group(pattern: str, index: int) -> int:
+    """Index just past the `]` or `)` closing the class or group opened at `index`."""
+    opening = pattern[index]
+    closing = "]" if opening == "[" else ")"
+    depth = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == opening and (opening == "(" or depth == 0):
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+    return index
@@ -0,0 +1,362 @@
+import difflib
+import os
+import re
+from typing import override
+
+from google.genai import types
+
+from config import EDIT_FILE_MAX_DIFF_CHARS
+from functions.function_interface import CodingToolFunctionInterface
+from functions.result_cache import tool_result_cache
+from utils import generate_fault_message, generate_success_message, write_atomically
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchConflictError(Exception):
+    pass
+
+
+class EditFileFunction(CodingToolFunctionInterface):
+    file_path_key: str = "file_path"
+    search_key: str = "search"
+    replace_key: str = "replace"
+    replace_all_key: str = "replace_all"
+    diff_key: str = "diff"
+
+    @override
+    @classmethod
+    def name(cls) -> str:
+        return "edit_file"
+
+    @override
+    @classmethod
+    def schema(cls) -> types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=cls.name(),
+            description=(
+                "Edits an existing file in place without resending all of it, "
+                "constrained to the working directory. Either replace an exact "
+                "`search` text with `replace`, or apply a unified `diff`. Nothing is "
+                "written when the edit does not apply cleanly. Prefer this over "
+                "write_file for changes to existing files."
+            ),
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    cls.file_path_key: types.Schema(
+                        type=types.Type.STRING,
+                        description="The path to the file to edit.",
+                    ),
+                    cls.search_key: types.Schema(
+                        type=types.Type.STRING,
+                        description=(
+                            "Exact text to replace, including indentation. Must occur "
+                            "exactly once unless replace_all is true; include "
+                            "surrounding lines to make it unique."
+                        ),
+                    ),
+                    cls.replace_key: types.Schema(
+                        type=types.Type.STRING,
+                        description="The text to put in place of `search`.",
+                    ),
+                    cls.replace_all_key: types.Schema(
+                        type=types.Type.BOOLEAN,
+                        description=(
+                            "Optional, replace every occurrence of `search`. Defaults "
+                            "to false."
+                        ),
+                    ),
+                    cls.diff_key: types.Schema(
+                        type=types.Type.STRING,
+                        description=(
+                            "A unified diff (@@ -start,count +start,count @@ hunks, "
+                            "file headers optional) to apply instead of "
+                            "search/replace."
+                        ),
+                    ),
+                },
+            ),
+        )
+
+    @override
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        if not args or not args.get(cls.file_path_key):
+            return []
+        return [args[cls.file_path_key]]
+
+    @override
+    @classmethod
+    def is_mutating(cls) -> bool:
+        return True
+
+    @override
+    def handle_function_call(self, args: dict | None) -> types.Content:
+        if not args:
+            return generate_fault_message(
+                function_name=self.name(),
+                message=(
+                    "args are empty for the functional call, but this function "
+                    "requires arguments"
+                ),
+            )
+
+        if self.file_path_key not in args:
+            return generate_fault_message(
+                function_name=self.name(),
+                message=(
+                    f"{self.file_path_key} is a required arguemnt for this function "
+                    "call"
+                ),
+            )
+
+        has_diff = bool(args.get(self.diff_key))
+        has_search = self.search_key in args and self.replace_key in args
+        if has_diff == has_search:
+            return generate_fault_message(
+                function_name=self.name(),
+                message=(
+                    f"provide either {self.diff_key} or both {self.search_key} and "
+                    f"{self.replace_key}"
+                ),
+            )
+
+        response = self._handle(
+            working_directory=self.working_directory,
+            file_path=args[self.file_path_key],
+            search=args.get(self.search_key),
+            replace=args.get(self.replace_key),
+            replace_all=bool(args.get(self.replace_all_key, False)),
+            diff=args.get(self.diff_key),
+        )
+
+        return generate_success_message(function_name=self.name(), message=response)
+
+    def _handle(
+        self,
+        working_directory: str,
+        file_path: str,
+        search: str | None = None,
+        replace: str | None = None,
+        replace_all: bool = False,
+        diff: str | None = None,
+    ) -> str:
+        abs_working_directory = os.path.abspath(working_directory)
+        abs_file_path = os.path.abspath(os.path.join(working_directory, file_path))
+
+        if not abs_file_path.startswith(abs_working_directory):
+            return (
+                "Error: Oops, requested file is not inside the working directory and "
+                "you can't access files outside working directory."
+            )
+
+        if not os.path.isfile(abs_file_path):
+            return (
+                f"Error: can't find file '{file_path}' in working directory, use "
+                "write_file to create it"
+            )
+
+        try:
+            with open(abs_file_path, newline="") as f:
+                old_content = f.read()
+        except Exception as e:
+            return f"Error: failed to read the file '{file_path}' ==> {e}"
+
+        try:
+            if diff:
+                new_content = apply_unified_diff(old_content, diff)
+            else:
+                new_content = replace_text(
+                    old_content, search or "", replace or "", replace_all
+                )
+        except PatchConflictError as e:
+            return (
+                f"Error: edit does not apply to '{file_path}', "
+                f"the file was not changed ==> {e}"
+            )
+
+        if new_content == old_content:
+            return f"No changes: the edit leaves '{file_path}' as it is"
+
+        try:
+            write_atomically(abs_file_path, new_content)
+        except Exception as e:
+            return (
+                f"Error: failed to write the content to the file '{file_path}' ==> {e}"
+            )
+        finally:
+            tool_result_cache.invalidate(abs_file_path)
+
+        return summarize_edit(file_path, old_content, new_content)
+
+
+def replace_text(content: str, search: str, replace: str, replace_all: bool) -> str:
+    if not search:
+        raise PatchConflictError("search text is empty")
+
+    occurrences = content.count(search)
+    if occurrences == 0:
+        raise PatchConflictError(
+            "search text not found, check whitespace and indentation or read the file "
+            "again"
+        )
+    if occurrences > 1 and not replace_all:
+        raise PatchConflictError(
+            f"search text occurs {occurrences} times, add surrounding lines to make it "
+            "unique or set replace_all"
+        )
+
+    return content.replace(search, replace)
+
+
+def apply_unified_diff(content: str, diff: str) -> str:
+    """Applies the hunks of `diff` in order, each where its old lines match exactly.
+
+    A hunk whose old lines are not at the stated position is looked for in
+    the rest of the file (nearest match first), line endings are ignored
+    when comparing.
+    """
+    lines = content.splitlines(keepends=True)
+    hunks = _parse_hunks(diff)
+    if not hunks:
+        raise PatchConflictError("diff has no @@ hunks")
+
+    result: list[str] = []
+    position = 0
+    for hunk_number, (old_start, old_lines, new_lines) in enumerate(hunks, start=1):
+        expected_index = max(old_start - 1, 0)
+        index = _find_block(lines, old_lines, expected_index, position)
+        if index is None:
+            preview = "".join(old_lines[:3]).rstrip("\n")
+            raise PatchConflictError(
+                f"hunk {hunk_number} (line {old_start}) does not match the file, "
+                f"expected:\n{preview}"
+            )
+
+        result.extend(lines[position:index])
+        result.extend(new_lines)
+        position = index + len(old_lines)
+
+    result.extend(lines[position:])
+    return "".join(result)
+
+
+def summarize_edit(file_path: str, old_content: str, new_content: str) -> str:
+    diff_lines = list(
+        difflib.unified_diff(
+            old_content.splitlines(),
+            new_content.splitlines(),
+            fromfile=file_path,
+            tofile=file_path,
+            n=1,
+            lineterm="",
+        )
+    )
+    added = sum(
+        1 for line in diff_lines if line.startswith("+") and not line.startswith("+++")
+    )
+    removed = sum(
+        1 for line in diff_lines if line.startswith("-") and not line.startswith("---")
+    )
+    hunks = sum(1 for line in diff_lines if line.startswith("@@"))
+
+    diff_text = "\n".join(diff_lines[2:])
+    if len(diff_text) > EDIT_FILE_MAX_DIFF_CHARS:
+        diff_text = diff_text[:EDIT_FILE_MAX_DIFF_CHARS] + "\n[... diff truncated ...]"
+
+    return (
+        f"Successfully edited '{file_path}': {hunks} hunk(s), "
+        f"+{added} -{removed} lines\n{diff_text}"
+    )
+
+
+def _parse_hunks(diff: str) -> list[tuple[int, list[str], list[str]]]:
+    hunks: list[tuple[int, list[str], list[str]]] = []
+    old_lines: list[str] = []
+    new_lines: list[str] = []
+    old_start: int | None = None
+    previous_marker = ""
+    # lines the current hunk header still announces on each side
+    old_remaining = new_remaining = 0
+
+    for line in diff.splitlines(keepends=True):
+        header = HUNK_HEADER_PATTERN.match(line)
+        if header:
+            if old_start is not None:
+                hunks.append((old_start, old_lines, new_lines))
+            old_start = int(header.group(1))
+            old_remaining = int(header.group(2) or 1)
+            new_remaining = int(header.group(4) or 1)
+            old_lines, new_lines = [], []
+            previous_marker = ""
+            continue
+
+        if old_start is None:
+            continue
+        if (
+            old_remaining <= 0
+            and new_remaining <= 0
+            and line.startswith(("---", "+++"))
+        ):
+            # the file headers of the next file, inside a hunk "--- x" is the
+            # removed line "-- x"
+            continue
+
+        if line.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line only,
+            # which is on the old side, the new side or (context) both
+            blocks = {
+                " ": (old_lines, new_lines),
+                "-": (old_lines,),
+                "+": (new_lines,),
+            }.get(previous_marker, ())
+            for block in blocks:
+                if block and block[-1].endswith("\n"):
+                    block[-1] = block[-1][:-1]
+            continue
+
+        marker, text = line[:1], line[1:]
+        if marker == "\n" or marker == "":
+            # an empty context line that lost its leading space
+            marker, text = " ", "\n"
+        if not text.endswith("\n"):
+            text += "\n"
+
+        if marker == " ":
+            old_lines.append(text)
+            new_lines.append(text)
+            old_remaining -= 1
+            new_remaining -= 1
+        elif marker == "-":
+            old_lines.append(text)
+            old_remaining -= 1
+        elif marker == "+":
+            new_lines.append(text)
+            new_remaining -= 1
+        previous_marker = marker
+
+    if old_start is not None:
+        hunks.append((old_start, old_lines, new_lines))
+    return hunks
+
+
+def _find_block(
+    lines: list[str], block: list[str], expected_index: int, minimum_index: int
+) -> int | None:
+    def matches_at(index: int) -> bool:
+        if index < minimum_index or index + len(block) > len(lines):
+            return False
+        return all(
+            lines[index + offset].rstrip("\r\n") == block_line.rstrip("\r\n")
+            for offset, block_line in enumerate(block)
+        )
+
+    if not block:
+        return min(max(expected_index, minimum_index), len(lines))
+
+    for distance in range(len(lines) + 1):
+        for index in (expected_index - distance, expected_index + distance):
+            if matches_at(index):
+                return index
+    return None
@@ -1,5 +1,4 @@
 from abc import ABC, abstractmethod
-from typing import Optional
 
 from google.genai import types
 
@@ -19,6 +18,20 @@ class CodingToolFunctionInterface(ABC):
     def schema(cls) -> types.FunctionDeclaration:
         raise NotImplementedError()
 
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        """Paths (relative to the working directory) this call reads or writes.
+
+        Used to decide which calls of one turn may run concurrently, "." means
+        the whole working directory.
+        """
+        return []
+
+    @classmethod
+    def is_mutating(cls) -> bool:
+        """Whether this call changes the paths returned by `accessed_paths`."""
+        return False
+
     @abstractmethod
-    def handle_function_call(self, args: Optional[dict]) -> types.Content:
+    def handle_function_call(self, args: dict | None) -> types.Content:
         raise NotImplementedError()
@@ -1,15 +1,21 @@
+import mmap
 import os
-from typing import Optional, override
+from typing import override
 
 from google.genai import types
 
-from config import MAX_CHARS_TO_READ_FROM_FILE
+from config import MAX_CHARS_TO_READ_FROM_FILE, MAX_FILE_READ_LENGTH
 from functions.function_interface import CodingToolFunctionInterface
+from functions.result_cache import tool_result_cache
 from utils import generate_fault_message, generate_success_message
 
 
 class GetFileContentFunction(CodingToolFunctionInterface):
     file_path_key: str = "file_path"
+    offset_key: str = "offset"
+    length_key: str = "length"
+    start_line_key: str = "start_line"
+    end_line_key: str = "end_line"
 
     @classmethod
     @override
@@ -21,20 +27,61 @@ class GetFileContentFunction(CodingToolFunctionInterface):
     def schema(cls) -> types.FunctionDeclaration:
         return types.FunctionDeclaration(
             name=cls.name(),
-            description="Gets the contents of the given file as a string, constrained to the working directory.",
+            description=(
+                "Gets the contents of the given file as a string, constrained to the "
+                f"working directory. Returns at most {MAX_CHARS_TO_READ_FROM_FILE} "
+                "bytes by default; when more content is available the result ends with "
+                "the file size and the offset (and line) to continue from."
+            ),
             parameters=types.Schema(
                 type=types.Type.OBJECT,
                 properties={
                     cls.file_path_key: types.Schema(
                         type=types.Type.STRING,
                         description="The path to the file, from the working directory.",
-                    )
+                    ),
+                    cls.offset_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional byte offset to start reading from, e.g. the next "
+                            "offset reported by a previous call. Defaults to 0."
+                        ),
+                    ),
+                    cls.length_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional number of bytes to read, defaults to "
+                            f"{MAX_CHARS_TO_READ_FROM_FILE} and is capped at "
+                            f"{MAX_FILE_READ_LENGTH}."
+                        ),
+                    ),
+                    cls.start_line_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional first line to read (1-based). Use instead of "
+                            "offset to read a line range."
+                        ),
+                    ),
+                    cls.end_line_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional last line to read (inclusive), used together "
+                            "with start_line."
+                        ),
+                    ),
                 },
             ),
         )
 
+    @classmethod
+    @override
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        if not args or not args.get(cls.file_path_key):
+            return []
+        return [args[cls.file_path_key]]
+
     @override
-    def handle_function_call(self, args: Optional[dict]) -> types.Content:
+    def handle_function_call(self, args: dict | None) -> types.Content:
         if not args:
             return generate_fault_message(
                 function_name=self.name(),
@@ -47,15 +94,53 @@ class GetFileContentFunction(CodingToolFunctionInterface):
                 message=f"{self.file_path_key} is a required arguemnt for this function call",
             )
 
+        range_args: dict[str, int | None] = {}
+        for key in (
+            self.offset_key,
+            self.length_key,
+            self.start_line_key,
+            self.end_line_key,
+        ):
+            try:
+                range_args[key] = None if args.get(key) is None else int(args[key])
+            except (TypeError, ValueError):
+                return generate_fault_message(
+                    function_name=self.name(),
+                    message=f"{key} must be an integer",
+                )
+
+        start_line = range_args[self.start_line_key]
+        end_line = range_args[self.end_line_key]
+        if start_line is not None and end_line is not None and start_line > end_line:
+            return generate_fault_message(
+                function_name=self.name(),
+                message=(
+                    f"{self.start_line_key} ({start_line}) is after "
+                    f"{self.end_line_key} ({end_line})"
+                ),
+            )
+
         response = self._handle(
             working_directory=self.working_directory,
             file_path=args[self.file_path_key],
+            offset=range_args[self.offset_key],
+            length=range_args[self.length_key],
+            start_line=range_args[self.start_line_key],
+            end_line=range_args[self.end_line_key],
         )
 
         message = generate_success_message(function_name=self.name(), message=response)
         return message
 
-    def _handle(self, working_directory: str, file_path: str) -> str:
+    def _handle(
+        self,
+        working_directory: str,
+        file_path: str,
+        offset: int | None = None,
+        length: int | None = None,
+        start_line: int | None = None,
+        end_line: int | None = None,
+    ) -> str:
         abs_working_directory = os.path.abspath(working_directory)
         abs_file_path = os.path.abspath(os.path.join(working_directory, file_path))
 
@@ -65,10 +150,131 @@ class GetFileContentFunction(CodingToolFunctionInterface):
         if not os.path.isfile(abs_file_path):
             return f"Error: can't find file '{file_path}' in working directory"
 
+        length = min(
+            max(length or MAX_CHARS_TO_READ_FROM_FILE, 1), MAX_FILE_READ_LENGTH
+        )
+        range_key = (offset, length, start_line, end_line)
+
+        cached_content = tool_result_cache.get(self.name(), abs_file_path, *range_key)
+        if cached_content is not None:
+            return cached_content
+
         try:
-            with open(abs_file_path, "r") as file:
-                file_content = file.read(MAX_CHARS_TO_READ_FROM_FILE)
+            if start_line is not None or end_line is not None:
+                file_content = self._read_lines(
+                    abs_file_path, max(start_line or 1, 1), end_line, length
+                )
+            else:
+                offset = max(offset or 0, 0)
+                size = os.path.getsize(abs_file_path)
+                if offset and offset >= size:
+                    return (
+                        f"Error: offset {offset} is at or past the end of "
+                        f"'{file_path}' ({size} bytes)"
+                    )
+                file_content = self._read_range(abs_file_path, offset, length)
         except Exception as e:
             return f"Exception raised while reading the file: {e}"
 
+        tool_result_cache.put(self.name(), abs_file_path, file_content, *range_key)
         return file_content
+
+    def _read_range(self, abs_file_path: str, offset: int, length: int) -> str:
+        size = os.path.getsize(abs_file_path)
+        with open(abs_file_path, "rb") as file:
+            file.seek(offset)
+            raw = file.read(length + 3)
+
+        # start and end on UTF-8 character boundaries
+        skipped = _leading_continuation_bytes(raw)
+        raw = raw[skipped : skipped + length]
+        start = offset + skipped
+        if start + len(raw) < size:
+            raw = raw[: _utf8_boundary(raw)]
+        end = start + len(raw)
+
+        content = raw.decode("utf-8", errors="replace")
+        if start == 0 and end >= size:
+            return content
+
+        footer = f"[bytes {start}-{end} of {size}"
+        if end < size:
+            footer += f"; continue with offset={end}"
+        return f"{content}\n{footer}]"
+
+    def _read_lines(
+        self,
+        abs_file_path: str,
+        start_line: int,
+        end_line: int | None,
+        length: int,
+    ) -> str:
+        size = os.path.getsize(abs_file_path)
+        if size == 0:
+            return f"[file is empty, no line {start_line}]"
+
+        with (
+            open(abs_file_path, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+        ):
+            start = 0
+            for _ in range(start_line - 1):
+                newline = mapped.find(b"\n", start)
+                if newline == -1 or newline + 1 >= size:
+                    return (
+                        f"[file has fewer than {start_line} lines, size {size} bytes]"
+                    )
+                start = newline + 1
+
+            end = start
+            line = start_line - 1
+            while end < size and (end_line is None or line < end_line):
+                newline = mapped.find(b"\n", end)
+                end = size if newline == -1 else newline + 1
+                line += 1
+                if end - start >= length:
+                    break
+
+            cut_mid_line = end - start > length
+            if cut_mid_line:
+                end = start + _utf8_boundary(mapped[start : start + length])
+            raw = mapped[start:end]
+
+        content = raw.decode("utf-8", errors="replace")
+        last_full_line = line - 1 if cut_mid_line else line
+        if last_full_line >= start_line:
+            footer = (
+                f"[lines {start_line}-{last_full_line}, bytes {start}-{end} of {size}"
+            )
+        else:
+            footer = f"[part of line {start_line}, bytes {start}-{end} of {size}"
+        if end < size:
+            footer += f"; continue with offset={end}"
+            if not cut_mid_line:
+                footer += f" or start_line={line + 1}"
+        return f"{content}\n{footer}]"
+
+
+def _leading_continuation_bytes(raw: bytes) -> int:
+    skipped = 0
+    while skipped < min(3, len(raw)) and raw[skipped] & 0xC0 == 0x80:
+        skipped += 1
+    return skipped
+
+
+def _utf8_boundary(raw: bytes) -> int:
+    """Length of `raw` without a trailing, incomplete UTF-8 character."""
+    for back in range(1, min(4, len(raw)) + 1):
+        byte = raw[-back]
+        if byte & 0xC0 == 0x80:
+            continue
+        if byte < 0x80:
+            needed = 1
+        elif byte >> 5 == 0b110:
+            needed = 2
+        elif byte >> 4 == 0b1110:
+            needed = 3
+        else:
+            needed = 4
+        return len(raw) if needed <= back else len(raw) - back
+    return len(raw)
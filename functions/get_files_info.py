@@ -1,14 +1,27 @@
+import fnmatch
 import os
-from typing import Optional, override
+from typing import override
 
 from google.genai import types
 
+from config import (
+    GET_FILES_INFO_MAX_CHARS,
+    GET_FILES_INFO_MAX_DEPTH,
+    GET_FILES_INFO_PAGE_SIZE,
+)
 from functions.function_interface import CodingToolFunctionInterface
+from functions.gitignore import GitignoreRules
 from utils import generate_fault_message, generate_success_message
 
 
 class GetFilesInfoFunction(CodingToolFunctionInterface):
     directory_key: str = "directory"
+    recursive_key: str = "recursive"
+    max_depth_key: str = "max_depth"
+    include_key: str = "include"
+    exclude_key: str = "exclude"
+    respect_gitignore_key: str = "respect_gitignore"
+    cursor_key: str = "cursor"
 
     @override
     @classmethod
@@ -20,34 +33,110 @@ class GetFilesInfoFunction(CodingToolFunctionInterface):
     def schema(cls) -> types.FunctionDeclaration:
         return types.FunctionDeclaration(
             name=cls.name(),
-            description="List files in the specified directory along with their sizes, constrained to the working directory.",
+            description=(
+                "List files in the specified directory along with their sizes, "
+                "constrained to the working directory. Can list a whole tree at once; "
+                f"output is paginated ({GET_FILES_INFO_PAGE_SIZE} entries per page) "
+                "and ends with the cursor of the next page when there is one."
+            ),
             parameters=types.Schema(
                 type=types.Type.OBJECT,
                 properties={
                     cls.directory_key: types.Schema(
                         type=types.Type.STRING,
                         description="The directory to list files from, relative to the working directory. If not provided, list files in the working directory itself.",
-                    )
+                    ),
+                    cls.recursive_key: types.Schema(
+                        type=types.Type.BOOLEAN,
+                        description=(
+                            "Optional, list sub-directories too (paths are then "
+                            "relative to `directory`). Defaults to false."
+                        ),
+                    ),
+                    cls.max_depth_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional, how many directory levels a recursive listing "
+                            f"goes down, defaults to {GET_FILES_INFO_MAX_DEPTH}."
+                        ),
+                    ),
+                    cls.include_key: types.Schema(
+                        type=types.Type.ARRAY,
+                        items=types.Schema(type=types.Type.STRING),
+                        description=(
+                            "Optional glob patterns (e.g. '*.py'), only matching "
+                            "entries are listed."
+                        ),
+                    ),
+                    cls.exclude_key: types.Schema(
+                        type=types.Type.ARRAY,
+                        items=types.Schema(type=types.Type.STRING),
+                        description=(
+                            "Optional glob patterns of entries to skip, matching "
+                            "directories are not descended into."
+                        ),
+                    ),
+                    cls.respect_gitignore_key: types.Schema(
+                        type=types.Type.BOOLEAN,
+                        description=(
+                            "Optional, skip entries ignored by .gitignore files (and "
+                            ".git). Defaults to true."
+                        ),
+                    ),
+                    cls.cursor_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional, the cursor reported at the end of a previous "
+                            "page."
+                        ),
+                    ),
                 },
             ),
         )
 
     @override
-    def handle_function_call(self, args: Optional[dict]) -> types.Content:
-        directory = ""
-        if not args or self.directory_key not in args:
-            directory = "."
-        else:
-            directory = args[self.directory_key]
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        if not args or not args.get(cls.directory_key):
+            return ["."]
+        return [args[cls.directory_key]]
+
+    @override
+    def handle_function_call(self, args: dict | None) -> types.Content:
+        args = args or {}
+        directory = args.get(self.directory_key) or "."
+
+        try:
+            max_depth = int(args.get(self.max_depth_key) or GET_FILES_INFO_MAX_DEPTH)
+            cursor = int(args.get(self.cursor_key) or 0)
+        except (TypeError, ValueError):
+            return generate_fault_message(
+                function_name=self.name(),
+                message=f"{self.max_depth_key} and {self.cursor_key} must be integers",
+            )
 
         response = self._handle(
             working_directory=self.working_directory,
             directory=directory,
+            max_depth=max_depth if args.get(self.recursive_key) else 1,
+            include=tuple(args.get(self.include_key) or ()),
+            exclude=tuple(args.get(self.exclude_key) or ()),
+            respect_gitignore=args.get(self.respect_gitignore_key, True) is not False,
+            cursor=max(cursor, 0),
         )
 
         return generate_success_message(function_name=self.name(), message=response)
 
-    def _handle(self, working_directory: str, directory: str):
+    def _handle(
+        self,
+        working_directory: str,
+        directory: str,
+        max_depth: int = 1,
+        include: tuple[str, ...] = (),
+        exclude: tuple[str, ...] = (),
+        respect_gitignore: bool = True,
+        cursor: int = 0,
+    ):
         abs_working_directory = os.path.abspath(working_directory)
         abs_directory = os.path.abspath(os.path.join(working_directory, directory))
 
@@ -57,13 +146,129 @@ class GetFilesInfoFunction(CodingToolFunctionInterface):
         if not os.path.isdir(abs_directory):
             return f"Error: can't find directory '{directory}' in working directory"
 
-        final_response: str = ""
-        for content in os.listdir(abs_directory):
-            content_path = os.path.join(abs_directory, content)
-            is_dir = os.path.isdir(content_path)
-            size = os.path.getsize(content_path)
+        # listings are not cached: a directory's mtime doesn't change when a
+        # file in it changes size or something is added further down
+        gitignore_rules = GitignoreRules()
+        if respect_gitignore:
+            gitignore_rules = self._parent_gitignore_rules(
+                abs_working_directory, abs_directory
+            )
+
+        lines: list[str] = []
+        output_chars = 0
+        next_cursor: int | None = None
+        entries = self._walk(
+            abs_directory,
+            max_depth,
+            include,
+            exclude,
+            respect_gitignore,
+            gitignore_rules,
+        )
+        for index, line in enumerate(entries):
+            if index < cursor:
+                continue
+            if not lines and len(line) > GET_FILES_INFO_MAX_CHARS:
+                # an entry over the whole budget still gets a page of its
+                # own, cut short, so that the cursor always moves on
+                line = line[: GET_FILES_INFO_MAX_CHARS - 15] + "...[truncated]\n"
+            elif (
+                len(lines) >= GET_FILES_INFO_PAGE_SIZE
+                or output_chars + len(line) > GET_FILES_INFO_MAX_CHARS
+            ):
+                next_cursor = index
+                break
+            lines.append(line)
+            output_chars += len(line)
+
+        if next_cursor is not None:
+            lines.append(
+                f"[more entries available, continue with cursor={next_cursor}]\n"
+            )
+
+        return "".join(lines)
+
+    def _walk(
+        self,
+        abs_directory: str,
+        max_depth: int,
+        include: tuple[str, ...],
+        exclude: tuple[str, ...],
+        respect_gitignore: bool,
+        gitignore_rules: GitignoreRules,
+    ):
+        """Yields one listing line per entry.
+
+        A directory's entries come in name order, then its sub-directories.
+        """
+        stack: list[tuple[str, str, int, GitignoreRules]] = [
+            (abs_directory, "", 1, gitignore_rules)
+        ]
+        while stack:
+            current_directory, rel_directory, depth, rules = stack.pop()
+            if respect_gitignore:
+                rules = rules.with_file(
+                    os.path.join(current_directory, ".gitignore"), rel_directory
+                )
+
+            try:
+                with os.scandir(current_directory) as iterator:
+                    dir_entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError:
+                continue
+
+            sub_directories: list[tuple[str, str, int, GitignoreRules]] = []
+            for entry in dir_entries:
+                rel_path = (
+                    f"{rel_directory}/{entry.name}" if rel_directory else entry.name
+                )
+                is_dir = entry.is_dir()
+
+                if respect_gitignore and (
+                    entry.name == ".git" or rules.is_ignored(rel_path, is_dir)
+                ):
+                    continue
+                if _matches_any(rel_path, exclude):
+                    continue
+
+                if not include or _matches_any(rel_path, include):
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        size = 0
+                    yield f" - {rel_path}: file_size={size} bytes, is_dir={is_dir}\n"
+
+                if depth < max_depth and entry.is_dir(follow_symlinks=False):
+                    sub_directories.append((entry.path, rel_path, depth + 1, rules))
+
+            stack.extend(reversed(sub_directories))
+
+    def _parent_gitignore_rules(
+        self, abs_working_directory: str, abs_directory: str
+    ) -> GitignoreRules:
+        """.gitignore rules from the working directory to `abs_directory`."""
+        rules = GitignoreRules()
+        rel_directory = os.path.relpath(abs_directory, abs_working_directory)
+        if rel_directory == ".":
+            return rules
+
+        current_directory = abs_working_directory
+        for part in rel_directory.split(os.sep):
+            # paths are matched relative to the listed directory, so rules of
+            # parent .gitignore files only keep their unanchored patterns
+            parent_rules = GitignoreRules().with_file(
+                os.path.join(current_directory, ".gitignore"), ""
+            )
+            rules = GitignoreRules(
+                rules.rules + [rule for rule in parent_rules.rules if not rule[4]]
+            )
+            current_directory = os.path.join(current_directory, part)
+        return rules
 
-            response = f" - {content}: file_size={size} bytes, is_dir={is_dir}\n"
-            final_response += response
 
-        return final_response
+def _matches_any(rel_path: str, patterns: tuple[str, ...]) -> bool:
+    name = os.path.basename(rel_path)
+    return any(
+        fnmatch.fnmatchcase(rel_path, pattern) or fnmatch.fnmatchcase(name, pattern)
+        for pattern in patterns
+    )
@@ -0,0 +1,70 @@
+from typing import override
+
+from google.genai import types
+
+from functions.function_interface import CodingToolFunctionInterface
+from functions.session_state import current_session
+from functions.workspace_manifest import WorkspaceManifest, session_manifest_for
+from utils import generate_success_message
+
+
+class GetWorkspaceChangesFunction(CodingToolFunctionInterface):
+    include_map_key: str = "include_map"
+
+    def __init__(self, working_directory: str) -> None:
+        super().__init__(working_directory=working_directory)
+        self.session_manifest = session_manifest_for(working_directory)
+
+    @override
+    @classmethod
+    def name(cls) -> str:
+        return "get_workspace_changes"
+
+    @override
+    @classmethod
+    def schema(cls) -> types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=cls.name(),
+            description=(
+                "Lists the files added, modified or removed in the working directory "
+                "since the session started or since this function was last called, "
+                "e.g. files created by a script you ran. Cheaper than listing and "
+                "re-reading files to find out what changed."
+            ),
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    cls.include_map_key: types.Schema(
+                        type=types.Type.BOOLEAN,
+                        description=(
+                            "Optional, also list every file with its size. Defaults to "
+                            "false."
+                        ),
+                    ),
+                },
+            ),
+        )
+
+    @override
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        return ["."]
+
+    @override
+    def handle_function_call(self, args: dict | None) -> types.Content:
+        response = self._handle(
+            include_map=bool((args or {}).get(self.include_map_key, False))
+        )
+        return generate_success_message(function_name=self.name(), message=response)
+
+    def _handle(self, include_map: bool) -> str:
+        # copied from the session manifest on the first call of each session
+        # and refreshed in memory, so calls don't move the baseline the next
+        # session compares to
+        manifest: WorkspaceManifest = current_session().get(
+            (self, "manifest"), self.session_manifest.detached_copy
+        )
+        response = manifest.refresh().describe()
+        if include_map:
+            response += f"\n\nWorkspace files:\n{manifest.project_map()}"
+        return response
@@ -0,0 +1,60 @@
+import fnmatch
+import os
+
+
+class GitignoreRules:
+    """The subset of .gitignore semantics needed to filter directory listings.
+
+    Supports comments, `!` negation, trailing `/` (directories only), and
+    patterns anchored by a leading or inner `/`. Patterns without a `/`
+    match the entry name at any depth. `**` is treated like `*`.
+    """
+
+    def __init__(
+        self, rules: list[tuple[str, str, bool, bool, bool]] | None = None
+    ) -> None:
+        # (base_dir, pattern, negated, directory_only, anchored)
+        self.rules = rules or []
+
+    def with_file(self, gitignore_path: str, base_dir: str) -> "GitignoreRules":
+        """These rules and the .gitignore at `gitignore_path`, rooted at `base_dir`."""
+        try:
+            with open(gitignore_path) as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return self
+
+        rules = list(self.rules)
+        for line in lines:
+            pattern = line.strip()
+            if not pattern or pattern.startswith("#"):
+                continue
+
+            negated = pattern.startswith("!")
+            if negated:
+                pattern = pattern[1:]
+            directory_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if pattern.startswith("**/"):
+                pattern = pattern[3:]
+            anchored = "/" in pattern
+            pattern = pattern.lstrip("/").replace("**", "*")
+            if pattern:
+                rules.append((base_dir, pattern, negated, directory_only, anchored))
+
+        return GitignoreRules(rules)
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for base_dir, pattern, negated, directory_only, anchored in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if base_dir and not rel_path.startswith(base_dir + "/"):
+                continue
+
+            path_in_base = rel_path[len(base_dir) + 1 :] if base_dir else rel_path
+            candidate = path_in_base if anchored else os.path.basename(rel_path)
+            if fnmatch.fnmatchcase(candidate, pattern):
+                ignored = not negated
+
+        return ignored
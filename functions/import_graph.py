@@ -0,0 +1,82 @@
+import ast
+from collections import defaultdict
+import os
+
+from functions.code_index import walk_files
+
+
+def module_name(rel_path: str) -> str:
+    """Dotted module name of a workspace `.py` file, `pkg/__init__.py` is `pkg`."""
+    parts = rel_path[: -len(".py")].split("/")
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def affected_modules(root_directory: str, changed_paths: list[str]) -> set[str]:
+    """Modules of the changed `.py` files and every workspace module importing them.
+
+    Modules importing them indirectly count too.
+
+    Imports are read statically with `ast`, so imports built at runtime
+    (importlib, `__import__`) are not followed. Other changed files are
+    ignored.
+    """
+    changed = {module_name(path) for path in changed_paths if path.endswith(".py")}
+    if not changed:
+        return set()
+
+    importers: dict[str, set[str]] = defaultdict(set)
+    abs_root_directory = os.path.abspath(root_directory)
+    for rel_path, _ in walk_files(abs_root_directory):
+        if not rel_path.endswith(".py"):
+            continue
+        importer = module_name(rel_path)
+        for imported in _imported_modules(
+            os.path.join(abs_root_directory, rel_path), importer, rel_path
+        ):
+            importers[imported].add(importer)
+
+    affected = set(changed)
+    pending = list(changed)
+    while pending:
+        for importer in importers.get(pending.pop(), set()):
+            if importer not in affected:
+                affected.add(importer)
+                pending.append(importer)
+    return affected
+
+
+def _imported_modules(abs_file_path: str, importer: str, rel_path: str) -> set[str]:
+    try:
+        with open(abs_file_path, "rb") as f:
+            tree = ast.parse(f.read(), filename=rel_path)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+
+    # package a relative import is resolved against
+    package = (
+        importer if rel_path.endswith("__init__.py") else importer.rpartition(".")[0]
+    )
+    imported: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported.update(_with_parents(alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                package_parts = package.split(".") if package else []
+                package_parts = package_parts[: len(package_parts) - (node.level - 1)]
+                base = ".".join(part for part in (*package_parts, base) if part)
+            if not base:
+                continue
+            imported.update(_with_parents(base))
+            # `from pkg import module` imports a submodule
+            imported.update(f"{base}.{alias.name}" for alias in node.names)
+    return imported
+
+
+def _with_parents(module: str) -> list[str]:
+    parts = module.split(".")
+    return [".".join(parts[:index]) for index in range(1, len(parts) + 1)]
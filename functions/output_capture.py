@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import IO
+
+from functions.sandbox import ResourceLimits
+
+READ_CHUNK_BYTES = 64 * 1024
+# longest sleep between two polls for the exit (and peak RSS) of a process
+WAIT_POLL_MAX_SECONDS = 0.02
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+RSS_UNIT_BYTES = 1 if sys.platform == "darwin" else 1024
+
+
+class BoundedOutput:
+    """Keeps the first and last bytes of a stream, counting what is dropped between."""
+
+    def __init__(self, limit: int) -> None:
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    def write(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+
+        head_room = self.head_limit - len(self.head)
+        if head_room > 0:
+            self.head += chunk[:head_room]
+            chunk = chunk[head_room:]
+
+        if not chunk or self.tail_limit <= 0:
+            return
+
+        self.tail += chunk[-self.tail_limit :]
+        if len(self.tail) > self.tail_limit:
+            del self.tail[: len(self.tail) - self.tail_limit]
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped_bytes:
+            return f"{head}\n[... {self.dropped_bytes} bytes dropped ...]\n{tail}"
+        return head + tail
+
+    def read_from(self, file: IO[bytes]) -> "BoundedOutput":
+        while chunk := file.read(READ_CHUNK_BYTES):
+            self.write(chunk)
+        return self
+
+
+@dataclass(frozen=True)
+class ResourceUsage:
+    wall_seconds: float
+    cpu_seconds: float
+    max_rss_bytes: int
+
+    @classmethod
+    def from_rusage(
+        cls, rusage, wall_seconds: float, max_rss_bytes: int | None = None
+    ) -> "ResourceUsage":
+        return cls(
+            wall_seconds=wall_seconds,
+            cpu_seconds=rusage.ru_utime + rusage.ru_stime,
+            max_rss_bytes=(
+                rusage.ru_maxrss * RSS_UNIT_BYTES
+                if max_rss_bytes is None
+                else max_rss_bytes
+            ),
+        )
+
+    def describe(self) -> str:
+        return (
+            f"wall {self.wall_seconds:.2f}s, cpu {self.cpu_seconds:.2f}s, "
+            f"peak RSS {self.max_rss_bytes / (1024 * 1024):.1f} MB"
+        )
+
+
+class CapturedProcess:
+    def __init__(
+        self,
+        returncode: int,
+        stdout: BoundedOutput,
+        stderr: BoundedOutput,
+        usage: ResourceUsage | None = None,
+    ) -> None:
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.usage = usage
+
+
+def run_captured(
+    args: list[str],
+    cwd: str,
+    timeout: float,
+    stdout_limit: int,
+    stderr_limit: int,
+    echo: bool = False,
+    limits: ResourceLimits | None = None,
+) -> CapturedProcess:
+    """`subprocess.run` with incremental, bounded capture of stdout and stderr.
+
+    With `echo` the output is also copied to this process's stdout/stderr as
+    it arrives. `limits` are set on the process as soon as it is spawned.
+    The result carries the wall time, CPU time and peak RSS
+    of the process. Raises `subprocess.TimeoutExpired` after killing the
+    process.
+    """
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        args,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    assert process.stdout is not None and process.stderr is not None
+    if limits is not None:
+        try:
+            limits.apply_to(process.pid)
+        except OSError:
+            process.kill()
+            process.wait()
+            raise
+
+    stdout = BoundedOutput(stdout_limit)
+    stderr = BoundedOutput(stderr_limit)
+    readers = [
+        threading.Thread(
+            target=_pump,
+            args=(process.stdout, stdout, 1 if echo else None),
+            daemon=True,
+        ),
+        threading.Thread(
+            target=_pump,
+            args=(process.stderr, stderr, 2 if echo else None),
+            daemon=True,
+        ),
+    ]
+    for reader in readers:
+        reader.start()
+
+    try:
+        usage = wait_with_usage(process, started_at, timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        wait_with_usage(process, started_at)
+        raise
+    finally:
+        for reader in readers:
+            reader.join()
+
+    return CapturedProcess(
+        returncode=process.returncode, stdout=stdout, stderr=stderr, usage=usage
+    )
+
+
+def wait_with_usage(
+    process: subprocess.Popen,
+    started_at: float,
+    timeout: float | None = None,
+) -> ResourceUsage:
+    """`process.wait`, but reaps the child with `os.wait4` to get its resource usage.
+
+    Sets `process.returncode`. Raises `subprocess.TimeoutExpired` (leaving
+    the process running) when it hasn't exited within `timeout` seconds.
+
+    The `ru_maxrss` of a forked child also counts the parent's memory at the
+    time of the fork, so while polling the peak RSS is read from the child's
+    own `VmHWM` instead. Without a timeout, or where /proc is missing,
+    `ru_maxrss` is reported.
+    """
+    max_rss_bytes = None
+    if timeout is None:
+        _, status, rusage = os.wait4(process.pid, 0)
+    else:
+        deadline = time.perf_counter() + timeout
+        delay = 0.0005
+        while True:
+            max_rss_bytes = peak_rss_bytes(process.pid) or max_rss_bytes
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(process.args, timeout)
+            time.sleep(min(delay, remaining, WAIT_POLL_MAX_SECONDS))
+            delay *= 2
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return ResourceUsage.from_rusage(
+        rusage, time.perf_counter() - started_at, max_rss_bytes
+    )
+
+
+def peak_rss_bytes(pid: int | str = "self") -> int | None:
+    """`VmHWM` of a live process, None when /proc can't tell (exited, not Linux)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _pump(pipe: IO[bytes], output: BoundedOutput, echo_fd: int | None) -> None:
+    with pipe:
+        while chunk := os.read(pipe.fileno(), READ_CHUNK_BYTES):
+            output.write(chunk)
+            if echo_fd is not None:
+                os.write(echo_fd, chunk)
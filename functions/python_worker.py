@@ -0,0 +1,160 @@
+"""Warm interpreter used by `PythonWorkerPool`, not meant to be imported.
+
+Usage: python3 python_worker.py <result_fd> [module ...]
+
+Imports the given modules, then reads one JSON job per line from stdin and
+runs the job's script as `__main__` with its stdout/stderr redirected at the
+fd level to the job's files and its stdin reading from /dev/null, as the job
+pipe is not the script's to read. The exit code, CPU seconds and peak RSS in
+bytes of each job are written as a JSON line to `result_fd`. A job's
+`cpu_seconds` becomes the soft CPU limit on top of what the worker already
+used. Exits on EOF.
+"""
+
+import contextlib
+import json
+import math
+import os
+import resource
+import runpy
+import sys
+import traceback
+
+
+def main() -> None:
+    result_file = os.fdopen(int(sys.argv[1]), "w")
+    workspace_dir = os.getcwd()
+
+    sys.path[0] = workspace_dir
+    for module_name in sys.argv[2:]:
+        # the script will hit the same error itself if it needs the module
+        with contextlib.suppress(Exception):
+            __import__(module_name)
+    preloaded_modules = _workspace_modules(workspace_dir)
+
+    # jobs come in on a private copy of fd 0, scripts (and the processes
+    # they start) see /dev/null there instead of the job pipe
+    jobs = os.fdopen(os.dup(0), "r")
+    devnull_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull_fd, 0)
+    os.close(devnull_fd)
+
+    for line in jobs:
+        job = json.loads(line)
+        _evict_stale_modules(workspace_dir, preloaded_modules)
+        cpu_seconds_before = _cpu_seconds()
+        if job.get("cpu_seconds") is not None:
+            _limit_cpu(math.ceil(cpu_seconds_before) + job["cpu_seconds"])
+        _reset_peak_rss()
+        # a fresh stream each job, an earlier one may have closed or replaced it
+        with open(os.devnull) as sys.stdin:
+            exit_code = _run_job(job)
+        result = {
+            "returncode": exit_code,
+            "cpu_seconds": _cpu_seconds() - cpu_seconds_before,
+            "max_rss_bytes": _peak_rss_bytes(),
+        }
+        result_file.write(json.dumps(result) + "\n")
+        result_file.flush()
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_bytes() -> int:
+    """VmHWM since the last reset, ru_maxrss (includes the preload) without /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+
+
+def _limit_cpu(seconds: int) -> None:
+    # soft limit only: the hard limit could not be raised again for the next job
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        seconds = min(seconds, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (seconds, hard))
+
+
+def _run_job(job: dict) -> int:
+    stdout_fd = os.open(job["stdout_path"], os.O_WRONLY | os.O_TRUNC)
+    stderr_fd = os.open(job["stderr_path"], os.O_WRONLY | os.O_TRUNC)
+    saved_stdout_fd = os.dup(1)
+    saved_stderr_fd = os.dup(2)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    os.close(stdout_fd)
+    os.close(stderr_fd)
+
+    script_path = os.path.abspath(job["script"])
+    sys.argv = [job["script"]] + job["args"]
+    sys.path[0] = os.path.dirname(script_path)
+
+    exit_code = 0
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_stdout_fd, 1)
+        os.dup2(saved_stderr_fd, 2)
+        os.close(saved_stdout_fd)
+        os.close(saved_stderr_fd)
+
+    return exit_code
+
+
+def _workspace_modules(workspace_dir: str) -> dict[str, float]:
+    """mtime of the source file of every loaded module that lives in the workspace."""
+    modules: dict[str, float] = {}
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.abspath(module_file).startswith(
+            workspace_dir + os.sep
+        ):
+            try:
+                modules[name] = os.path.getmtime(module_file)
+            except OSError:
+                modules[name] = -1.0
+    return modules
+
+
+def _evict_stale_modules(
+    workspace_dir: str, preloaded_modules: dict[str, float]
+) -> None:
+    """Forgets workspace modules imported by earlier jobs or changed since preload."""
+    for name, mtime in _workspace_modules(workspace_dir).items():
+        if preloaded_modules.get(name) != mtime:
+            del sys.modules[name]
+            preloaded_modules.pop(name, None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import json
+import os
+import select
+import subprocess
+import tempfile
+import threading
+import time
+from typing import IO
+
+from config import (
+    PYTHON_WORKER_MAX_RUNS,
+    PYTHON_WORKER_POOL_SIZE,
+    PYTHON_WORKER_PRELOAD_FILE,
+    PYTHON_WORKER_PRELOAD_MODULES,
+    RUN_PYTHON_MAX_STDERR_BYTES,
+    RUN_PYTHON_MAX_STDOUT_BYTES,
+)
+from functions.output_capture import (
+    BoundedOutput,
+    CapturedProcess,
+    ResourceUsage,
+    wait_with_usage,
+)
+from functions.sandbox import ResourceLimits
+
+WORKER_SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "python_worker.py")
+
+
+class _PythonWorker:
+    def __init__(
+        self,
+        abs_working_directory: str,
+        preload_modules: tuple[str, ...],
+        limits: ResourceLimits | None = None,
+    ):
+        self.limits = limits
+        read_fd, write_fd = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                ["python3", WORKER_SCRIPT_PATH, str(write_fd), *preload_modules],
+                cwd=abs_working_directory,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(write_fd,),
+                text=True,
+            )
+        finally:
+            os.close(write_fd)
+        if limits is not None:
+            try:
+                # the CPU limit is set per job by the worker itself
+                limits.apply_to(self.process.pid, cpu=False)
+            except OSError:
+                self.process.kill()
+                self.process.wait()
+                os.close(read_fd)
+                raise
+        self.result_file: IO[str] = os.fdopen(read_fd, "r")
+        self.runs = 0
+
+    def run(
+        self,
+        python_file_path: str,
+        args: list[str],
+        timeout: float,
+        stdout_limit: int,
+        stderr_limit: int,
+    ) -> CapturedProcess:
+        with (
+            tempfile.NamedTemporaryFile(prefix="stdout-") as stdout_file,
+            tempfile.NamedTemporaryFile(prefix="stderr-") as stderr_file,
+        ):
+            job = {
+                "script": python_file_path,
+                "args": args,
+                "stdout_path": stdout_file.name,
+                "stderr_path": stderr_file.name,
+                "cpu_seconds": self.limits.cpu_seconds if self.limits else None,
+            }
+            started_at = time.perf_counter()
+            assert self.process.stdin is not None
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            self.runs += 1
+
+            ready, _, _ = select.select([self.result_file], [], [], timeout)
+            if not ready:
+                self.kill()
+                raise subprocess.TimeoutExpired(
+                    ["python3", python_file_path, *args], timeout
+                )
+
+            line = self.result_file.readline()
+            if line:
+                result = json.loads(line)
+                returncode = result["returncode"]
+                usage = ResourceUsage(
+                    wall_seconds=time.perf_counter() - started_at,
+                    cpu_seconds=result["cpu_seconds"],
+                    max_rss_bytes=result["max_rss_bytes"],
+                )
+            else:
+                # the worker died during the job, e.g. on its CPU limit
+                usage = wait_with_usage(self.process, started_at)
+                returncode = self.process.returncode
+                self.close()
+
+            return CapturedProcess(
+                returncode=returncode,
+                stdout=BoundedOutput(stdout_limit).read_from(stdout_file),
+                stderr=BoundedOutput(stderr_limit).read_from(stderr_file),
+                usage=usage,
+            )
+
+    def close(self) -> None:
+        # an idle worker exits on its own once stdin is closed, its interpreter
+        # shutdown is not waited for (subprocess reaps it later)
+        if self.process.stdin is not None:
+            self.process.stdin.close()
+        self.result_file.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.wait()
+        self.close()
+
+
+class PythonWorkerPool:
+    """Pre-started `python3` workers with `preload_modules` already imported.
+
+    By default that is `PYTHON_WORKER_PRELOAD_MODULES` plus the modules the
+    working directory lists in its `PYTHON_WORKER_PRELOAD_FILE`.
+
+    Each run takes an idle worker and a replacement is started right away so
+    it warms up in the background. A worker is retired after
+    `max_runs_per_worker` runs (1 by default, so no state is shared between
+    runs) or when a run times out. Runs keep the `python3 <script>` contract:
+    separate process, cwd set to the working directory, separate (bounded)
+    stdout, stderr and exit code. With `limits`, each worker process gets
+    the memory and open-file limits and each job the CPU limit.
+    """
+
+    def __init__(
+        self,
+        working_directory: str,
+        size: int = PYTHON_WORKER_POOL_SIZE,
+        max_runs_per_worker: int = PYTHON_WORKER_MAX_RUNS,
+        preload_modules: tuple[str, ...] | None = None,
+        limits: ResourceLimits | None = None,
+    ) -> None:
+        self.abs_working_directory = os.path.abspath(working_directory)
+        self.size = max(size, 1)
+        self.max_runs_per_worker = max(max_runs_per_worker, 1)
+        self.preload_modules = (
+            PYTHON_WORKER_PRELOAD_MODULES
+            + _workspace_preload_modules(self.abs_working_directory)
+            if preload_modules is None
+            else preload_modules
+        )
+        self.limits = limits
+        self.lock = threading.Lock()
+        self.idle_workers: list[_PythonWorker] = [
+            self._start_worker() for _ in range(self.size)
+        ]
+
+    def run(
+        self,
+        python_file_path: str,
+        args: list[str],
+        timeout: float,
+        stdout_limit: int = RUN_PYTHON_MAX_STDOUT_BYTES,
+        stderr_limit: int = RUN_PYTHON_MAX_STDERR_BYTES,
+    ) -> CapturedProcess:
+        worker = self._take_worker()
+        try:
+            result = worker.run(
+                python_file_path, args, timeout, stdout_limit, stderr_limit
+            )
+        except Exception:
+            worker.kill()
+            raise
+
+        if (
+            worker.runs >= self.max_runs_per_worker
+            or worker.process.returncode is not None
+        ):
+            worker.close()
+        else:
+            self._return_worker(worker)
+
+        return result
+
+    def close(self) -> None:
+        with self.lock:
+            idle_workers, self.idle_workers = self.idle_workers, []
+        for worker in idle_workers:
+            worker.close()
+
+    def _take_worker(self) -> _PythonWorker:
+        worker: _PythonWorker | None = None
+        with self.lock:
+            while self.idle_workers and worker is None:
+                candidate = self.idle_workers.pop(0)
+                if candidate.process.poll() is None:
+                    worker = candidate
+                else:
+                    candidate.close()
+
+        replacement = self._start_worker()
+        if worker is None:
+            return replacement
+
+        self._return_worker(replacement)
+        return worker
+
+    def _return_worker(self, worker: _PythonWorker) -> None:
+        with self.lock:
+            if len(self.idle_workers) < self.size:
+                self.idle_workers.append(worker)
+                return
+        worker.close()
+
+    def _start_worker(self) -> _PythonWorker:
+        return _PythonWorker(
+            self.abs_working_directory, self.preload_modules, self.limits
+        )
+
+
+def _workspace_preload_modules(abs_working_directory: str) -> tuple[str, ...]:
+    """Modules the workspace asks workers to import, none without the file."""
+    try:
+        with open(os.path.join(abs_working_directory, PYTHON_WORKER_PRELOAD_FILE)) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return ()
+    modules = (line.split("#", 1)[0].strip() for line in lines)
+    return tuple(module for module in modules if module)
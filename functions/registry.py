@@ -0,0 +1,79 @@
+from importlib.metadata import entry_points
+import sys
+
+from google.genai import types
+
+from config import WORKSPACE_DIR
+from functions.edit_file import EditFileFunction
+from functions.function_interface import CodingToolFunctionInterface
+from functions.get_file_content import GetFileContentFunction
+from functions.get_files_info import GetFilesInfoFunction
+from functions.get_workspace_changes import GetWorkspaceChangesFunction
+from functions.run_python_file import RunPythonFunction
+from functions.run_tests import RunTestsFunction
+from functions.search_code import SearchCodeFunction
+from functions.write_file import WriteFileFunction
+
+TOOL_ENTRY_POINT_GROUP = "aiagent.tools"
+
+
+class ToolRegistry:
+    """Long-lived tool instances by name, plus the `types.Tool` declaring them.
+
+    Tools are instantiated once on `register` and must therefore be safe to
+    call from several threads. The `types.Tool` is built on first use and
+    rebuilt only when a new tool is registered.
+    """
+
+    def __init__(self, working_directory: str) -> None:
+        self.working_directory = working_directory
+        self.functions: dict[str, CodingToolFunctionInterface] = {}
+        self._tool: types.Tool | None = None
+
+    def register(self, function_class: type[CodingToolFunctionInterface]) -> None:
+        self.functions[function_class.name()] = function_class(
+            working_directory=self.working_directory
+        )
+        self._tool = None
+
+    def get(self, name: str | None) -> CodingToolFunctionInterface | None:
+        if name is None:
+            return None
+        return self.functions.get(name)
+
+    def tool(self) -> types.Tool:
+        if self._tool is None:
+            self._tool = types.Tool(
+                function_declarations=[
+                    coding_tool_function.schema()
+                    for coding_tool_function in self.functions.values()
+                ]
+            )
+        return self._tool
+
+    def load_entry_points(self, group: str = TOOL_ENTRY_POINT_GROUP) -> None:
+        """Registers `CodingToolFunctionInterface` subclasses in entry point `group`."""
+        for entry_point in entry_points(group=group):
+            try:
+                function_class = entry_point.load()
+                self.register(function_class)
+            except Exception as e:
+                print(
+                    f"Warning: skipping tool entry point '{entry_point.name}' ==> {e}",
+                    file=sys.stderr,
+                )
+
+
+tool_registry = ToolRegistry(working_directory=WORKSPACE_DIR)
+for builtin_function in (
+    GetFileContentFunction,
+    GetFilesInfoFunction,
+    WriteFileFunction,
+    EditFileFunction,
+    RunPythonFunction,
+    RunTestsFunction,
+    SearchCodeFunction,
+    GetWorkspaceChangesFunction,
+):
+    tool_registry.register(builtin_function)
+tool_registry.load_entry_points()
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+import os
+import threading
+
+from config import TOOL_RESULT_CACHE_MAX_ENTRIES
+
+CacheKey = tuple[str, str, tuple[Hashable, ...]]
+
+
+class ToolResultCache:
+    """LRU cache for results of read-only tools, shared by every tool instance.
+
+    Entries are keyed by function name, absolute path and extra arguments and
+    are only served while the path's mtime and size are unchanged. Tools
+    that modify the workspace call `invalidate` for what they touched.
+    """
+
+    def __init__(self, max_entries: int = TOOL_RESULT_CACHE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[CacheKey, tuple[tuple[int, int], str]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, function_name: str, abs_path: str, *extra: Hashable) -> str | None:
+        key = (function_name, abs_path, extra)
+        signature = _stat_signature(abs_path)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != signature:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(
+        self, function_name: str, abs_path: str, result: str, *extra: Hashable
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+
+        signature = _stat_signature(abs_path)
+        if signature is None:
+            return
+
+        with self.lock:
+            key = (function_name, abs_path, extra)
+            self.entries[key] = (signature, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, abs_path: str) -> None:
+        """Drops entries of `abs_path`, anything under it and its parents' listings."""
+        with self.lock:
+            for key in list(self.entries):
+                entry_path = key[1]
+                if (
+                    entry_path == abs_path
+                    or entry_path.startswith(abs_path + os.sep)
+                    or abs_path.startswith(entry_path + os.sep)
+                ):
+                    del self.entries[key]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+            }
+
+
+def _stat_signature(abs_path: str) -> tuple[int, int] | None:
+    try:
+        stat_result = os.stat(abs_path)
+    except OSError:
+        return None
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+tool_result_cache = ToolResultCache()
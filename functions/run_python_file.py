@@ -1,10 +1,23 @@
 import os
-import subprocess
-from typing import Optional, override
+import signal
+import threading
+from typing import override
 
 from google.genai import types
 
+from config import (
+    PYTHON_WORKER_POOL_SIZE,
+    RUN_PYTHON_ECHO_OUTPUT,
+    RUN_PYTHON_MAX_STDERR_BYTES,
+    RUN_PYTHON_MAX_STDOUT_BYTES,
+    RUN_PYTHON_TIMEOUT_SECONDS,
+)
 from functions.function_interface import CodingToolFunctionInterface
+from functions.output_capture import run_captured
+from functions.python_worker_pool import PythonWorkerPool
+from functions.result_cache import tool_result_cache
+from functions.sandbox import ResourceLimits, script_slots
+from tracing import tracer
 from utils import generate_fault_message, generate_success_message
 
 
@@ -12,6 +25,12 @@ class RunPythonFunction(CodingToolFunctionInterface):
     python_file_path_key = "python_file_path"
     args_key = "args"
 
+    def __init__(self, working_directory: str) -> None:
+        super().__init__(working_directory=working_directory)
+        self.worker_pool: PythonWorkerPool | None = None
+        self.worker_pool_lock = threading.Lock()
+        self.limits = ResourceLimits()
+
     @override
     @classmethod
     def name(cls) -> str:
@@ -40,7 +59,21 @@ class RunPythonFunction(CodingToolFunctionInterface):
         )
 
     @override
-    def handle_function_call(self, args: Optional[dict]) -> types.Content:
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        # a script may import any module of the workspace, so it has to wait for
+        # every earlier write of the same turn
+        return ["."]
+
+    @override
+    @classmethod
+    def is_mutating(cls) -> bool:
+        # a script may also write anywhere in the workspace, so later calls of
+        # the same turn wait for it
+        return True
+
+    @override
+    def handle_function_call(self, args: dict | None) -> types.Content:
         if not args:
             return generate_fault_message(
                 function_name=self.name(),
@@ -65,7 +98,7 @@ class RunPythonFunction(CodingToolFunctionInterface):
         self,
         working_directory: str,
         python_file_path: str,
-        args: Optional[list[str]] = None,
+        args: list[str] | None = None,
     ) -> str:
         abs_working_directory = os.path.abspath(working_directory)
         abs_file_path = os.path.abspath(
@@ -73,7 +106,10 @@ class RunPythonFunction(CodingToolFunctionInterface):
         )
 
         if not abs_file_path.startswith(abs_working_directory):
-            return f"Error: Oops, requested file is not inside the working directory and you can't access files outside working directory."
+            return (
+                "Error: Oops, requested file is not inside the working directory and "
+                "you can't access files outside working directory."
+            )
 
         if not os.path.isfile(abs_file_path):
             return f"Error: can't find file '{python_file_path}' in working directory"
@@ -82,25 +118,74 @@ class RunPythonFunction(CodingToolFunctionInterface):
             return f"Error: {python_file_path} is not a Python file"
 
         try:
-            args = [python_file_path] if args is None else [python_file_path] + args
-            output = subprocess.run(
-                ["python3"] + args,
-                cwd=abs_working_directory,
-                timeout=30,
-                capture_output=True,
-            )
+            worker_pool = self._worker_pool()
+            with tracer.span("subprocess", script=python_file_path) as subprocess_span:
+                with script_slots.slot() as slot_wait_seconds:
+                    if worker_pool is not None:
+                        output = worker_pool.run(
+                            python_file_path,
+                            args or [],
+                            RUN_PYTHON_TIMEOUT_SECONDS,
+                            stdout_limit=RUN_PYTHON_MAX_STDOUT_BYTES,
+                            stderr_limit=RUN_PYTHON_MAX_STDERR_BYTES,
+                        )
+                    else:
+                        args = (
+                            [python_file_path]
+                            if args is None
+                            else [python_file_path] + args
+                        )
+                        output = run_captured(
+                            ["python3"] + args,
+                            cwd=abs_working_directory,
+                            timeout=RUN_PYTHON_TIMEOUT_SECONDS,
+                            stdout_limit=RUN_PYTHON_MAX_STDOUT_BYTES,
+                            stderr_limit=RUN_PYTHON_MAX_STDERR_BYTES,
+                            echo=RUN_PYTHON_ECHO_OUTPUT,
+                            limits=self.limits,
+                        )
+                subprocess_span.update(
+                    returncode=output.returncode,
+                    stdout_bytes=output.stdout.total_bytes,
+                    stderr_bytes=output.stderr.total_bytes,
+                    slot_wait_seconds=round(slot_wait_seconds, 6),
+                )
+                if output.usage is not None:
+                    subprocess_span.update(
+                        cpu_seconds=round(output.usage.cpu_seconds, 6),
+                        max_rss_bytes=output.usage.max_rss_bytes,
+                    )
         except Exception as e:
             return f"Error: executing Python file {e}"
+        finally:
+            # the script may have changed anything in the workspace
+            tool_result_cache.invalidate(abs_working_directory)
 
         result = f"""
-STDOUT: {output.stdout}
-STDERR: {output.stderr}\n
+STDOUT: {output.stdout.text()}
+STDERR: {output.stderr.text()}
 """.strip()
 
-        if not output.stdout and not output.stderr:
-            result = "No output produced.\n"
+        if not output.stdout.total_bytes and not output.stderr.total_bytes:
+            result = "No output produced."
 
         if output.returncode != 0:
-            result += f"Process exited with code {output.returncode}"
+            result += f"\nProcess exited with code {output.returncode}"
+        if output.returncode == -signal.SIGXCPU:
+            result += f" (CPU time limit of {self.limits.cpu_seconds}s exceeded)"
+        if output.usage is not None:
+            result += f"\nResources: {output.usage.describe()}"
 
         return result
+
+    def _worker_pool(self) -> PythonWorkerPool | None:
+        """Warm worker pool if PYTHON_WORKER_POOL_SIZE enables it, made on first use."""
+        if PYTHON_WORKER_POOL_SIZE <= 0:
+            return None
+
+        with self.worker_pool_lock:
+            if self.worker_pool is None:
+                self.worker_pool = PythonWorkerPool(
+                    working_directory=self.working_directory, limits=self.limits
+                )
+            return self.worker_pool
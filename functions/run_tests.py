@@ -0,0 +1,321 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import json
+import math
+import os
+import subprocess
+import tempfile
+import time
+from typing import override
+
+from google.genai import types
+
+from config import (
+    RUN_PYTHON_MAX_STDERR_BYTES,
+    RUN_PYTHON_MAX_STDOUT_BYTES,
+    RUN_PYTHON_TIMEOUT_SECONDS,
+    RUN_TESTS_MAX_SHARDS,
+    RUN_TESTS_MAX_TRACEBACK_LINES,
+    RUN_TESTS_MIN_TESTS_PER_SHARD,
+    RUN_TESTS_PATTERN,
+)
+from functions.function_interface import CodingToolFunctionInterface
+from functions.import_graph import affected_modules
+from functions.output_capture import run_captured
+from functions.result_cache import tool_result_cache
+from functions.sandbox import ResourceLimits, script_slots
+from functions.session_state import current_session
+from functions.workspace_manifest import WorkspaceManifest, session_manifest_for
+from tracing import tracer
+from utils import generate_fault_message, generate_success_message
+
+SHARD_SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "unittest_shard.py")
+SELECT_ALL = "all"
+SELECT_FAILED = "failed"
+SELECT_AFFECTED = "affected"
+
+
+class RunTestsFunction(CodingToolFunctionInterface):
+    select_key: str = "select"
+    pattern_key: str = "pattern"
+    shards_key: str = "shards"
+
+    def __init__(self, working_directory: str) -> None:
+        super().__init__(working_directory=working_directory)
+        # sessions start from this manifest, see _TestRunState
+        self.session_manifest = session_manifest_for(working_directory)
+        self.limits = ResourceLimits()
+
+    @override
+    @classmethod
+    def name(cls) -> str:
+        return "run_tests"
+
+    @override
+    @classmethod
+    def schema(cls) -> types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=cls.name(),
+            description=(
+                "Discovers the unittest tests of the working directory, runs them "
+                "split across several processes and returns one line per test "
+                "(PASS/FAIL/ERROR/SKIP, duration) with a short traceback for each "
+                "failure. Prefer it over running test files with run_python_file. "
+                "After a fix, re-run only the failed tests or the tests affected by "
+                "the files changed since the last run."
+            ),
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    cls.select_key: types.Schema(
+                        type=types.Type.STRING,
+                        enum=[SELECT_ALL, SELECT_FAILED, SELECT_AFFECTED],
+                        description=(
+                            f"Optional, '{SELECT_ALL}' (default), '{SELECT_FAILED}' to "
+                            "re-run the tests that failed in the previous run, or "
+                            f"'{SELECT_AFFECTED}' for tests whose modules changed or "
+                            "import a changed module since the previous run."
+                        ),
+                    ),
+                    cls.pattern_key: types.Schema(
+                        type=types.Type.STRING,
+                        description=(
+                            "Optional, file name pattern of test modules, defaults to "
+                            f"'{RUN_TESTS_PATTERN}'."
+                        ),
+                    ),
+                    cls.shards_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional, maximum number of test processes, defaults to "
+                            f"{RUN_TESTS_MAX_SHARDS}."
+                        ),
+                    ),
+                },
+            ),
+        )
+
+    @override
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        return ["."]
+
+    @override
+    @classmethod
+    def is_mutating(cls) -> bool:
+        # tests may write fixtures and output files anywhere in the workspace
+        return True
+
+    @override
+    def handle_function_call(self, args: dict | None) -> types.Content:
+        args = args or {}
+        select = args.get(self.select_key) or SELECT_ALL
+        if select not in (SELECT_ALL, SELECT_FAILED, SELECT_AFFECTED):
+            return generate_fault_message(
+                function_name=self.name(),
+                message=(
+                    f"{self.select_key} must be one of '{SELECT_ALL}', "
+                    f"'{SELECT_FAILED}' or '{SELECT_AFFECTED}'"
+                ),
+            )
+
+        try:
+            shards = int(args.get(self.shards_key) or RUN_TESTS_MAX_SHARDS)
+        except (TypeError, ValueError):
+            return generate_fault_message(
+                function_name=self.name(),
+                message=f"{self.shards_key} must be an integer",
+            )
+
+        response = self._handle(
+            select=select,
+            pattern=args.get(self.pattern_key) or RUN_TESTS_PATTERN,
+            max_shards=max(shards, 1),
+        )
+
+        return generate_success_message(function_name=self.name(), message=response)
+
+    def _handle(self, select: str, pattern: str, max_shards: int) -> str:
+        started_at = time.perf_counter()
+        abs_working_directory = os.path.abspath(self.working_directory)
+        state: _TestRunState = current_session().get(
+            (self, "state"),
+            lambda: _TestRunState(self.session_manifest.detached_copy()),
+        )
+        # refreshed to the workspace these tests see, the baseline of
+        # "affected" once the run covered the changes
+        manifest = state.manifest.detached_copy()
+        covers_changes = select != SELECT_FAILED and pattern == RUN_TESTS_PATTERN
+        try:
+            records: list[dict] = []
+
+            if select == SELECT_FAILED:
+                test_ids = list(state.failed_test_ids)
+                if not test_ids:
+                    return "No failed tests recorded from a previous run_tests call."
+            else:
+                changes = manifest.refresh()
+                discovered = self._run_shard(["discover", pattern])
+                if "error" in discovered:
+                    return f"Error: test discovery failed ==> {discovered['error']}"
+                test_ids = discovered["tests"]
+                records.extend(discovered["errors"])
+
+                if select == SELECT_AFFECTED:
+                    modules = affected_modules(
+                        self.working_directory,
+                        changes.added + changes.modified + changes.removed,
+                    )
+                    test_ids = [
+                        test_id
+                        for test_id in test_ids
+                        if _test_module(test_id) in modules
+                    ]
+
+            shards = _split(test_ids, max_shards)
+            with ThreadPoolExecutor(max_workers=max(len(shards), 1)) as executor:
+                for shard_ids, output in zip(
+                    shards,
+                    executor.map(lambda ids: self._run_shard(["run", *ids]), shards),
+                    strict=True,
+                ):
+                    if "error" in output:
+                        records.extend(
+                            {
+                                "id": test_id,
+                                "status": "error",
+                                "duration": 0.0,
+                                "traceback": output["error"],
+                            }
+                            for test_id in shard_ids
+                        )
+                    else:
+                        records.extend(output["results"])
+        except Exception as e:
+            return f"Error: running tests {e}"
+        finally:
+            # tests may have written to the workspace
+            tool_result_cache.invalidate(abs_working_directory)
+
+        # a test with several failed subtests is re-run once
+        state.failed_test_ids = list(
+            dict.fromkeys(
+                record["id"]
+                for record in records
+                if record["status"] in ("fail", "error")
+            )
+        )
+        if covers_changes:
+            state.manifest = manifest
+
+        if not records:
+            if select == SELECT_AFFECTED:
+                return (
+                    "No tests are affected by the files changed since the previous run."
+                )
+            return f"No tests found matching '{pattern}'"
+        return _format_results(records, len(shards), time.perf_counter() - started_at)
+
+    def _run_shard(self, args: list[str]) -> dict:
+        """Output of a unittest_shard.py process, {"error": ...} if it produced none."""
+        file_descriptor, result_path = tempfile.mkstemp(suffix=".json")
+        os.close(file_descriptor)
+        try:
+            with tracer.span(
+                "subprocess", script="run_tests", command=args[0]
+            ) as subprocess_span:
+                # shards are scripts too, with the cap and limits of run_python_file
+                with script_slots.slot() as slot_wait_seconds:
+                    try:
+                        output = run_captured(
+                            ["python3", SHARD_SCRIPT_PATH, result_path, *args],
+                            cwd=os.path.abspath(self.working_directory),
+                            timeout=RUN_PYTHON_TIMEOUT_SECONDS,
+                            stdout_limit=RUN_PYTHON_MAX_STDOUT_BYTES,
+                            stderr_limit=RUN_PYTHON_MAX_STDERR_BYTES,
+                            limits=self.limits,
+                        )
+                    except subprocess.TimeoutExpired:
+                        return {
+                            "error": f"timed out after {RUN_PYTHON_TIMEOUT_SECONDS}s"
+                        }
+                subprocess_span.update(
+                    returncode=output.returncode,
+                    slot_wait_seconds=round(slot_wait_seconds, 6),
+                )
+
+            try:
+                with open(result_path) as f:
+                    return json.load(f)
+            except ValueError:
+                return {
+                    "error": (
+                        f"test process exited with code {output.returncode}: "
+                        f"{output.stderr.text()[-500:]}"
+                    )
+                }
+        finally:
+            os.remove(result_path)
+
+
+@dataclass
+class _TestRunState:
+    """What run_tests remembers between the calls of one session.
+
+    `manifest` is the workspace as of the last run that covered every
+    change, "affected" selects the tests of the files changed since then.
+    A "failed" run or one with a custom pattern leaves it alone, so the
+    changes it didn't test are picked up later.
+    """
+
+    manifest: WorkspaceManifest
+    failed_test_ids: list[str] = field(default_factory=list)
+
+
+def _test_module(test_id: str) -> str:
+    # module.Class.method
+    return test_id.rsplit(".", 2)[0]
+
+
+def _split(test_ids: list[str], max_shards: int) -> list[list[str]]:
+    """Contiguous chunks, tests of one class mostly share a process and its fixtures."""
+    if not test_ids:
+        return []
+    shard_count = min(
+        max_shards, math.ceil(len(test_ids) / RUN_TESTS_MIN_TESTS_PER_SHARD)
+    )
+    return [
+        test_ids[
+            index * len(test_ids) // shard_count : (index + 1)
+            * len(test_ids)
+            // shard_count
+        ]
+        for index in range(shard_count)
+    ]
+
+
+def _format_results(records: list[dict], shard_count: int, elapsed: float) -> str:
+    counts = dict.fromkeys(("pass", "fail", "error", "skip"), 0)
+    for record in records:
+        counts[record["status"]] += 1
+
+    lines = [
+        f"Ran {len(records)} tests in {shard_count} process(es) in {elapsed:.2f}s: "
+        f"{counts['pass']} passed, {counts['fail']} failed, {counts['error']} errors, "
+        f"{counts['skip']} skipped"
+    ]
+    for record in records:
+        lines.append(
+            f"{record['status'].upper()} {record['id']}"
+            + (f" {record['subtest']}" if "subtest" in record else "")
+            + f" ({record['duration']:.3f}s)"
+        )
+        if record["status"] in ("fail", "error") and record["traceback"]:
+            traceback_lines = record["traceback"].strip().splitlines()
+            lines.extend(
+                f"    {line}"
+                for line in traceback_lines[-RUN_TESTS_MAX_TRACEBACK_LINES:]
+            )
+        elif record["status"] == "skip" and record["traceback"]:
+            lines.append(f"    {record['traceback']}")
+    return "\n".join(lines)
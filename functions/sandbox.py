@@ -0,0 +1,103 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+import resource
+import threading
+import time
+
+from config import (
+    RUN_PYTHON_CPU_SECONDS,
+    RUN_PYTHON_MAX_CONCURRENT,
+    RUN_PYTHON_MAX_MEMORY_BYTES,
+    RUN_PYTHON_MAX_OPEN_FILES,
+)
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """Per-run `resource` limits, `None` leaves a limit as inherited."""
+
+    cpu_seconds: int | None = RUN_PYTHON_CPU_SECONDS
+    memory_bytes: int | None = RUN_PYTHON_MAX_MEMORY_BYTES
+    open_files: int | None = RUN_PYTHON_MAX_OPEN_FILES
+
+    def apply_to(self, pid: int, cpu: bool = True) -> None:
+        """Sets the limits of the process `pid`, hard limits included.
+
+        Called right after spawning the process: a `preexec_fn` isn't safe
+        in a process running threads. The CPU limit ends the process with
+        SIGXCPU (the hard limit is one second later, SIGKILL), the memory
+        limit makes allocations fail (`MemoryError` in Python). Without
+        `prlimit` (not Linux) the process runs unlimited.
+        """
+        if not hasattr(resource, "prlimit"):
+            return
+        if cpu and self.cpu_seconds is not None:
+            _set_limit(pid, resource.RLIMIT_CPU, self.cpu_seconds, headroom=1)
+        if self.memory_bytes is not None:
+            _set_limit(pid, resource.RLIMIT_AS, self.memory_bytes)
+        if self.open_files is not None:
+            _set_limit(pid, resource.RLIMIT_NOFILE, self.open_files)
+
+
+class ScriptSlots:
+    """Caps how many scripts run at once, shared by every session of the process.
+
+    `slot()` blocks until one of the `slots` is free. Waits are counted so
+    `stats` shows whether the cap is what slows sessions down.
+    """
+
+    def __init__(self, slots: int = RUN_PYTHON_MAX_CONCURRENT) -> None:
+        self.slots = max(slots, 1)
+        self.semaphore = threading.BoundedSemaphore(self.slots)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak_running = 0
+        self.runs = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    @contextmanager
+    def slot(self) -> Iterator[float]:
+        """Holds a slot for the duration of the block, yields the seconds waited."""
+        started_at = time.perf_counter()
+        waited = not self.semaphore.acquire(blocking=False)
+        if waited:
+            self.semaphore.acquire()
+        wait_seconds = time.perf_counter() - started_at
+
+        with self.lock:
+            self.running += 1
+            self.peak_running = max(self.peak_running, self.running)
+            self.runs += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += wait_seconds
+        try:
+            yield wait_seconds
+        finally:
+            with self.lock:
+                self.running -= 1
+            self.semaphore.release()
+
+    def stats(self) -> dict[str, float]:
+        with self.lock:
+            return {
+                "slots": self.slots,
+                "runs": self.runs,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "peak_running": self.peak_running,
+            }
+
+
+def _set_limit(pid: int, limit: int, value: int, headroom: int = 0) -> None:
+    soft, hard = value, value + headroom
+    _, current_hard = resource.prlimit(pid, limit)
+    if current_hard != resource.RLIM_INFINITY:
+        # an unprivileged process can't raise its hard limit
+        soft, hard = min(soft, current_hard), min(hard, current_hard)
+    resource.prlimit(pid, limit, (soft, hard))
+
+
+script_slots = ScriptSlots()
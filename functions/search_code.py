@@ -0,0 +1,147 @@
+import re
+import threading
+from typing import override
+
+from google.genai import types
+
+from config import SEARCH_CODE_MAX_RESULTS
+from functions.code_index import CodeIndex
+from functions.function_interface import CodingToolFunctionInterface
+from utils import generate_fault_message, generate_success_message
+
+MAX_SNIPPET_CHARS = 200
+
+
+class SearchCodeFunction(CodingToolFunctionInterface):
+    query_key: str = "query"
+    regex_key: str = "regex"
+    case_sensitive_key: str = "case_sensitive"
+    max_results_key: str = "max_results"
+
+    def __init__(self, working_directory: str) -> None:
+        super().__init__(working_directory=working_directory)
+        self.code_index: CodeIndex | None = None
+        self.code_index_lock = threading.Lock()
+
+    @override
+    @classmethod
+    def name(cls) -> str:
+        return "search_code"
+
+    @override
+    @classmethod
+    def schema(cls) -> types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=cls.name(),
+            description=(
+                "Searches every text file in the working directory for a literal "
+                "string or a regular expression and returns matching lines as "
+                "'path:line: text'. Use it to find where something is defined or used "
+                "instead of reading files one by one."
+            ),
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    cls.query_key: types.Schema(
+                        type=types.Type.STRING,
+                        description=(
+                            "The text (or regular expression when regex is true) to "
+                            "search for."
+                        ),
+                    ),
+                    cls.regex_key: types.Schema(
+                        type=types.Type.BOOLEAN,
+                        description=(
+                            "Optional, treat the query as a Python regular expression. "
+                            "Defaults to false."
+                        ),
+                    ),
+                    cls.case_sensitive_key: types.Schema(
+                        type=types.Type.BOOLEAN,
+                        description="Optional, defaults to true.",
+                    ),
+                    cls.max_results_key: types.Schema(
+                        type=types.Type.INTEGER,
+                        description=(
+                            "Optional, maximum number of matching lines, defaults to "
+                            f"{SEARCH_CODE_MAX_RESULTS}."
+                        ),
+                    ),
+                },
+            ),
+        )
+
+    @override
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        return ["."]
+
+    @override
+    def handle_function_call(self, args: dict | None) -> types.Content:
+        if not args:
+            return generate_fault_message(
+                function_name=self.name(),
+                message=(
+                    "args are empty for the functional call, but this function "
+                    "requires arguments"
+                ),
+            )
+
+        if not args.get(self.query_key):
+            return generate_fault_message(
+                function_name=self.name(),
+                message=(
+                    f"{self.query_key} is a required arguemnt for this function call"
+                ),
+            )
+
+        try:
+            max_results = int(args.get(self.max_results_key) or SEARCH_CODE_MAX_RESULTS)
+        except (TypeError, ValueError):
+            return generate_fault_message(
+                function_name=self.name(),
+                message=f"{self.max_results_key} must be an integer",
+            )
+
+        response = self._handle(
+            query=args[self.query_key],
+            regex=bool(args.get(self.regex_key, False)),
+            case_sensitive=args.get(self.case_sensitive_key, True) is not False,
+            max_results=max(max_results, 1),
+        )
+
+        return generate_success_message(function_name=self.name(), message=response)
+
+    def _handle(
+        self, query: str, regex: bool, case_sensitive: bool, max_results: int
+    ) -> str:
+        try:
+            matches, truncated = self._code_index().search(
+                query,
+                regex=regex,
+                case_sensitive=case_sensitive,
+                max_results=max_results,
+            )
+        except re.error as e:
+            return f"Error: invalid regular expression '{query}' ==> {e}"
+
+        if not matches:
+            return f"No matches found for '{query}'"
+
+        lines = [
+            f"{rel_path}:{line_number}: {line.strip()[:MAX_SNIPPET_CHARS]}\n"
+            for rel_path, line_number, line in matches
+        ]
+        if truncated:
+            lines.append(
+                f"[stopped after {max_results} matches, narrow the query to see the "
+                "rest]\n"
+            )
+        return "".join(lines)
+
+    def _code_index(self) -> CodeIndex:
+        """Working directory index, built by the first search, refreshed by each."""
+        with self.code_index_lock:
+            if self.code_index is None:
+                self.code_index = CodeIndex(self.working_directory)
+            return self.code_index
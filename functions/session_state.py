@@ -0,0 +1,50 @@
+from collections.abc import Callable, Hashable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+from typing import Any
+
+
+class SessionState:
+    """What tools remember between the calls of one agent session.
+
+    Tool instances are shared by every session of the process (see
+    `tool_registry`), so anything a tool keeps from one call to the next,
+    e.g. the workspace state it reports changes against, is stored here
+    under a key of the tool's choosing instead of on the tool.
+    """
+
+    def __init__(self) -> None:
+        self.values: dict[Hashable, Any] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        """The value stored under `key`, made with `create` on first use."""
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = create()
+            return self.values[key]
+
+
+# state of the session being run, follows asyncio tasks and threads started
+# through contextvars.copy_context / asyncio.to_thread like the tracing spans
+_current_session: ContextVar[SessionState | None] = ContextVar(
+    "current_session", default=None
+)
+# used by tool calls made outside of `session_scope`, e.g. from scripts
+_default_session = SessionState()
+
+
+@contextmanager
+def session_scope() -> Iterator[SessionState]:
+    """Runs the block as a new session, tool calls in it start from fresh state."""
+    session = SessionState()
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+def current_session() -> SessionState:
+    return _current_session.get() or _default_session
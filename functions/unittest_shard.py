@@ -0,0 +1,157 @@
+"""Test shard runner used by `RunTestsFunction`, not meant to be imported.
+
+Usage:
+    python3 unittest_shard.py <result_path> discover <pattern>
+    python3 unittest_shard.py <result_path> run <test_id> ...
+
+Runs from the workspace directory. `discover` writes the ids of the tests
+found by unittest discovery (plus an error record per module that failed
+to import), `run` writes one record per test with its status, duration and
+traceback (one per failed subtest, with its parameters as `subtest`).
+Output is JSON written to `result_path`, test output is swallowed so it
+can't get mixed into the results.
+"""
+
+import json
+import os
+import sys
+import time
+from traceback import format_exception
+from typing import override
+import unittest
+
+
+class _RecordingResult(unittest.TestResult):
+    def __init__(self) -> None:
+        super().__init__()
+        self.buffer = True
+        self.records: list[dict] = []
+        self.started_at = 0.0
+
+    @override
+    def startTest(self, test: unittest.TestCase) -> None:
+        super().startTest(test)
+        self.started_at = time.perf_counter()
+
+    @override
+    def addSuccess(self, test: unittest.TestCase) -> None:
+        super().addSuccess(test)
+        self._record(test, "pass")
+
+    @override
+    def addFailure(self, test: unittest.TestCase, err) -> None:
+        super().addFailure(test, err)
+        self._record(test, "fail", _format_error(err))
+
+    @override
+    def addError(self, test: unittest.TestCase, err) -> None:
+        super().addError(test, err)
+        self._record(test, "error", _format_error(err))
+
+    @override
+    def addSkip(self, test: unittest.TestCase, reason: str) -> None:
+        super().addSkip(test, reason)
+        self._record(test, "skip", reason)
+
+    @override
+    def addExpectedFailure(self, test: unittest.TestCase, err) -> None:
+        super().addExpectedFailure(test, err)
+        self._record(test, "pass")
+
+    @override
+    def addUnexpectedSuccess(self, test: unittest.TestCase) -> None:
+        super().addUnexpectedSuccess(test)
+        self._record(test, "fail", "unexpected success")
+
+    @override
+    def addSubTest(self, test, subtest, err) -> None:
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            exception_type = err[0]
+            status = (
+                "fail"
+                if exception_type is not None
+                and issubclass(exception_type, test.failureException)
+                else "error"
+            )
+            # under the id of the test, so select="failed" can load it again
+            description = str(subtest).removeprefix(str(test)).strip()
+            self._record(test, status, _format_error(err), subtest=description)
+
+    def _record(
+        self, test, status: str, traceback: str = "", subtest: str = ""
+    ) -> None:
+        record = {
+            "id": test.id(),
+            "status": status,
+            "duration": round(time.perf_counter() - self.started_at, 6),
+            "traceback": traceback,
+        }
+        if subtest:
+            record["subtest"] = subtest
+        self.records.append(record)
+
+
+def main() -> None:
+    result_path, command = sys.argv[1], sys.argv[2]
+    sys.path.insert(0, os.getcwd())
+    loader = unittest.TestLoader()
+
+    if command == "discover":
+        suite = loader.discover(".", pattern=sys.argv[3], top_level_dir=".")
+        output = {"tests": [], "errors": []}
+        for test in _iter_tests(suite):
+            failed_import = getattr(test, "_exception", None)
+            if failed_import is not None:
+                # the module name, so re-running it retries the import
+                output["errors"].append(
+                    {
+                        "id": test._testMethodName,
+                        "status": "error",
+                        "duration": 0.0,
+                        "traceback": str(failed_import),
+                    }
+                )
+            else:
+                output["tests"].append(test.id())
+    else:
+        result = _RecordingResult()
+        # one suite, so class and module fixtures run once per shard
+        suite = unittest.TestSuite()
+        for test_id in sys.argv[3:]:
+            try:
+                suite.addTest(loader.loadTestsFromName(test_id))
+            except Exception as e:
+                result.records.append(
+                    {
+                        "id": test_id,
+                        "status": "error",
+                        "duration": 0.0,
+                        "traceback": repr(e),
+                    }
+                )
+        suite.run(result)
+        output = {"results": result.records}
+
+    with open(result_path, "w") as f:
+        json.dump(output, f)
+
+
+def _format_error(err) -> str:
+    exception_type, exception, traceback = err
+    # skip the frames of unittest itself, like its own result classes do
+    while traceback is not None and "__unittest" in traceback.tb_frame.f_globals:
+        traceback = traceback.tb_next
+    return "".join(format_exception(exception_type, exception, traceback))
+
+
+def _iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iter_tests(test)
+        else:
+            yield test
+
+
+if __name__ == "__main__":
+    main()
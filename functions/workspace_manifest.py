@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import threading
+
+from config import (
+    WORKSPACE_DIR,
+    WORKSPACE_MANIFEST_PATH,
+    WORKSPACE_MAP_MAX_ENTRIES,
+)
+from functions.code_index import walk_files
+from utils import write_atomically
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class WorkspaceChanges:
+    added: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    def describe(self) -> str:
+        if not self:
+            return "No files changed."
+        lines = []
+        for label, paths in (
+            ("added", self.added),
+            ("modified", self.modified),
+            ("removed", self.removed),
+        ):
+            lines.extend(f"{label}: {path}" for path in paths)
+        return "\n".join(lines)
+
+
+class WorkspaceManifest:
+    """Persistent (size, mtime, content hash) record of every file in a workspace.
+
+    `refresh` re-stats the tree and only hashes files whose size or mtime
+    changed since the manifest was last saved, a file that was touched but
+    kept its content is not reported as modified. Paths are resolved on
+    every refresh so the manifest follows the current working directory,
+    and the manifest file is re-read when another instance saved it.
+    Without `persist` the manifest lives in memory only.
+    """
+
+    def __init__(
+        self, root_directory: str, manifest_path: str, persist: bool = True
+    ) -> None:
+        self.root_directory = root_directory
+        self.manifest_path = manifest_path
+        self.persist = persist
+        # rel_path -> (size, mtime_ns, hash)
+        self.files: dict[str, tuple[int, int, str]] = {}
+        # (path, mtime_ns, size) of the manifest file `files` was last loaded or saved
+        self.loaded_signature: tuple[str, int, int] = ("", 0, 0)
+        self.lock = threading.Lock()
+
+    def refresh(self) -> WorkspaceChanges:
+        """Updates and saves the manifest, returns the changes since the last save."""
+        with self.lock:
+            self._load()
+
+            abs_root_directory = os.path.abspath(self.root_directory)
+            abs_manifest_path = os.path.abspath(self.manifest_path)
+            changes = WorkspaceChanges()
+            files: dict[str, tuple[int, int, str]] = {}
+            for rel_path, stat_result in walk_files(abs_root_directory):
+                if os.path.join(abs_root_directory, rel_path) == abs_manifest_path:
+                    continue
+                signature = (stat_result.st_size, stat_result.st_mtime_ns)
+                previous = self.files.get(rel_path)
+                if previous is not None and previous[:2] == signature:
+                    files[rel_path] = previous
+                    continue
+
+                content_hash = _hash_file(os.path.join(self.root_directory, rel_path))
+                files[rel_path] = (*signature, content_hash)
+                if previous is None:
+                    changes.added.append(rel_path)
+                elif previous[2] != content_hash:
+                    changes.modified.append(rel_path)
+
+            changes.removed = [path for path in self.files if path not in files]
+            for paths in (changes.added, changes.modified, changes.removed):
+                paths.sort()
+
+            self.files = files
+            self._save()
+            return changes
+
+    def detached_copy(self) -> "WorkspaceManifest":
+        """The manifest as last saved, in memory: its refreshes leave the file alone."""
+        with self.lock:
+            self._load()
+            copy = WorkspaceManifest(
+                self.root_directory, self.manifest_path, persist=False
+            )
+            copy.files = dict(self.files)
+        return copy
+
+    def project_map(self, max_entries: int = WORKSPACE_MAP_MAX_ENTRIES) -> str:
+        """A `path (size bytes)` line per file, sorted, as of the last refresh."""
+        with self.lock:
+            paths = sorted(self.files)
+            lines = [
+                f"{path} ({self.files[path][0]} bytes)" for path in paths[:max_entries]
+            ]
+        if len(paths) > max_entries:
+            lines.append(f"[... {len(paths) - max_entries} more files ...]")
+        return "\n".join(lines)
+
+    def session_context(self) -> str:
+        """Project map and the changes since the last session, for the first message."""
+        is_first_session = not os.path.isfile(self.manifest_path)
+        changes = self.refresh()
+        context = f"Workspace files:\n{self.project_map()}"
+        if not is_first_session:
+            context += f"\n\nChanged since the last session:\n{changes.describe()}"
+        return context
+
+    def _load(self) -> None:
+        if not self.persist:
+            return
+        abs_manifest_path = os.path.abspath(self.manifest_path)
+        if self.loaded_signature == _file_signature(abs_manifest_path):
+            return
+
+        self.files = {}
+        self.loaded_signature = _file_signature(abs_manifest_path)
+        try:
+            with open(abs_manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get(
+            "root"
+        ) != os.path.abspath(self.root_directory):
+            return
+        self.files = {
+            rel_path: (size, mtime_ns, content_hash)
+            for rel_path, (size, mtime_ns, content_hash) in manifest["files"].items()
+        }
+
+    def _save(self) -> None:
+        if not self.persist:
+            return
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "root": os.path.abspath(self.root_directory),
+            "files": self.files,
+        }
+        abs_manifest_path = os.path.abspath(self.manifest_path)
+        os.makedirs(os.path.dirname(abs_manifest_path), exist_ok=True)
+        write_atomically(abs_manifest_path, json.dumps(manifest, separators=(",", ":")))
+        self.loaded_signature = _file_signature(abs_manifest_path)
+
+
+def _file_signature(file_path: str) -> tuple[str, int, int]:
+    try:
+        stat_result = os.stat(file_path)
+    except OSError:
+        return (file_path, 0, 0)
+    return (file_path, stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def _hash_file(file_path: str) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+    try:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+    except OSError:
+        return ""
+    return digest.hexdigest()
+
+
+workspace_manifest = WorkspaceManifest(WORKSPACE_DIR, WORKSPACE_MANIFEST_PATH)
+
+
+def session_manifest_for(working_directory: str) -> WorkspaceManifest:
+    """The manifest sessions start from, the shared one for `WORKSPACE_DIR`."""
+    if os.path.abspath(working_directory) == os.path.abspath(
+        workspace_manifest.root_directory
+    ):
+        return workspace_manifest
+    return WorkspaceManifest(working_directory, WORKSPACE_MANIFEST_PATH)
@@ -1,9 +1,10 @@
 import os
-from typing import Optional, override
+from typing import override
 
 from google.genai import types
 
 from functions.function_interface import CodingToolFunctionInterface
+from functions.result_cache import tool_result_cache
 from utils import generate_fault_message, generate_success_message
 
 
@@ -38,7 +39,19 @@ class WriteFileFunction(CodingToolFunctionInterface):
         )
 
     @override
-    def handle_function_call(self, args: Optional[dict]) -> types.Content:
+    @classmethod
+    def accessed_paths(cls, args: dict | None) -> list[str]:
+        if not args or not args.get(cls.file_path_key):
+            return []
+        return [args[cls.file_path_key]]
+
+    @override
+    @classmethod
+    def is_mutating(cls) -> bool:
+        return True
+
+    @override
+    def handle_function_call(self, args: dict | None) -> types.Content:
         if not args:
             return generate_fault_message(
                 function_name=self.name(),
@@ -70,7 +83,12 @@ class WriteFileFunction(CodingToolFunctionInterface):
         abs_file_path = os.path.abspath(os.path.join(working_directory, file_path))
 
         if not abs_file_path.startswith(abs_working_directory):
-            return f"Error: Oops, requested file is not inside the working directory and you can't access files outside working directory."
+            return (
+                "Error: Oops, requested file is not inside the working directory and "
+                "you can't access files outside working directory."
+            )
+
+        tool_result_cache.invalidate(abs_file_path)
 
         parent_dir = os.path.dirname(abs_file_path)
         try:
@@ -94,7 +112,10 @@ def write_file(working_directory: str, file_path: str, content: str) -> str:
     abs_file_path = os.path.abspath(os.path.join(working_directory, file_path))
 
     if not abs_file_path.startswith(abs_working_directory):
-        return f"Error: Oops, requested file is not inside the working directory and you can't access files outside working directory."
+        return (
+            "Error: Oops, requested file is not inside the working directory and you "
+            "can't access files outside working directory."
+        )
 
     parent_dir = os.path.dirname(abs_file_path)
     try:
@@ -0,0 +1,203 @@
+import json
+import os
+
+from google.genai import types
+
+from config import (
+    HISTORY_COMPACTED_RESULT_CHARS,
+    HISTORY_KEEP_RECENT_TURNS,
+    HISTORY_TOKEN_BUDGET,
+)
+from response_encoding import ToolResponseEncoder
+from utils import write_atomically
+
+# rough size of a token, only used to estimate how much a compaction saves
+CHARS_PER_TOKEN = 4
+CHECKPOINT_VERSION = 1
+
+
+class ConversationHistory:
+    """Conversation sent to the model, compacted once it outgrows a token budget.
+
+    The user prompt (first message, followed by the optional `context`
+    part) and the last `keep_recent_turns` model
+    turns are never touched, the system prompt is sent separately as the
+    system instruction. When the prompt of a request goes over `token_budget`
+    the oldest tool results are shrunk to their first few characters until
+    the estimated overflow is gone. Tool results are encoded by a
+    `ToolResponseEncoder` (byte caps, references to repeated results) when
+    they are appended; a result that later ones refer to is not compacted.
+    """
+
+    def __init__(
+        self,
+        prompt: str,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        keep_recent_turns: int = HISTORY_KEEP_RECENT_TURNS,
+        context: str | None = None,
+    ) -> None:
+        parts = [types.Part(text=prompt.strip())]
+        if context:
+            parts.append(types.Part(text=context))
+        self.messages: list[types.Content] = [types.Content(role="user", parts=parts)]
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.tokens_saved = 0
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.last_prompt_token_count = 0
+        self.response_encoder = ToolResponseEncoder()
+
+    def append(self, content: types.Content) -> None:
+        self.messages.append(content)
+
+    def append_tool_response(
+        self,
+        content: types.Content,
+        function_call_part: types.FunctionCall | None = None,
+    ) -> None:
+        """Appends the result of `function_call_part` as the model will see it."""
+        self.messages.append(self.response_encoder.encode(content, function_call_part))
+
+    def record_usage(
+        self, usage_metadata: types.GenerateContentResponseUsageMetadata
+    ) -> None:
+        self.turns += 1
+        self.last_prompt_token_count = usage_metadata.prompt_token_count or 0
+        self.prompt_tokens += self.last_prompt_token_count
+        self.response_tokens += usage_metadata.candidates_token_count or 0
+
+    def save(self, checkpoint_path: str) -> None:
+        """Writes messages (with tool results) and usage counters to `checkpoint_path`.
+
+        The file is replaced atomically, a crash while saving leaves the
+        previous checkpoint in place.
+        """
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "messages": [
+                message.model_dump(mode="json", exclude_none=True)
+                for message in self.messages
+            ],
+            "keep_recent_turns": self.keep_recent_turns,
+            "tokens_saved": self.tokens_saved,
+            "turns": self.turns,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "last_prompt_token_count": self.last_prompt_token_count,
+            "response_encoder": self.response_encoder.state(),
+        }
+
+        parent_dir = os.path.dirname(checkpoint_path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        write_atomically(checkpoint_path, json.dumps(checkpoint, separators=(",", ":")))
+
+    @classmethod
+    def load(
+        cls, checkpoint_path: str, token_budget: int = HISTORY_TOKEN_BUDGET
+    ) -> "ConversationHistory":
+        """Rebuilds the history saved by `save`, ready for the next turn."""
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            error_message = (
+                f"unsupported session checkpoint version in '{checkpoint_path}'"
+            )
+            raise Exception(error_message)
+
+        history = cls(
+            "",
+            token_budget=token_budget,
+            keep_recent_turns=checkpoint["keep_recent_turns"],
+        )
+        history.messages = [
+            types.Content.model_validate(message) for message in checkpoint["messages"]
+        ]
+        history.tokens_saved = checkpoint["tokens_saved"]
+        history.turns = checkpoint["turns"]
+        history.prompt_tokens = checkpoint["prompt_tokens"]
+        history.response_tokens = checkpoint["response_tokens"]
+        history.last_prompt_token_count = checkpoint["last_prompt_token_count"]
+        if "response_encoder" in checkpoint:
+            history.response_encoder.restore(checkpoint["response_encoder"])
+        return history
+
+    def final_text(self) -> str:
+        """Text of the last model message, the agent's answer once the loop is over."""
+        for message in reversed(self.messages):
+            if message.role == "model":
+                return "".join(part.text for part in message.parts or [] if part.text)
+        return ""
+
+    def compact(self, prompt_token_count: int | None) -> int:
+        """Compacts old tool results, returns the estimated number of tokens saved."""
+        if prompt_token_count is None or prompt_token_count <= self.token_budget:
+            return 0
+
+        overflow = prompt_token_count - self.token_budget
+        saved = 0
+        for index in range(1, self._recent_turns_start()):
+            if saved >= overflow:
+                break
+            if self.messages[index].role != "tool":
+                continue
+            saved += self._compact_tool_message(index)
+
+        self.tokens_saved += saved
+        return saved
+
+    def _recent_turns_start(self) -> int:
+        model_indexes = [
+            index
+            for index, message in enumerate(self.messages)
+            if message.role == "model"
+        ]
+        if self.keep_recent_turns <= 0:
+            return len(self.messages)
+        if len(model_indexes) < self.keep_recent_turns:
+            return 1
+        return model_indexes[-self.keep_recent_turns]
+
+    def _compact_tool_message(self, index: int) -> int:
+        saved_chars = 0
+        parts: list[types.Part] = []
+        for part in self.messages[index].parts or []:
+            function_response = part.function_response
+            result = (
+                function_response.response.get("result")
+                if function_response and function_response.response
+                else None
+            )
+            if function_response is None or not isinstance(result, str):
+                parts.append(part)
+                continue
+            if self.response_encoder.is_referenced(
+                function_response.name or "", result
+            ):
+                # later responses say "see that response", it has to stay whole
+                parts.append(part)
+                continue
+
+            compacted = (
+                result[:HISTORY_COMPACTED_RESULT_CHARS]
+                + f"\n[compacted: {len(result) - HISTORY_COMPACTED_RESULT_CHARS} chars "
+                "omitted, call the function again if you need them]"
+            )
+            if len(compacted) >= len(result):
+                parts.append(part)
+                continue
+
+            saved_chars += len(result) - len(compacted)
+            self.response_encoder.forget(function_response.name or "", result)
+            parts.append(
+                types.Part.from_function_response(
+                    name=function_response.name or "", response={"result": compacted}
+                )
+            )
+
+        if saved_chars:
+            self.messages[index] = types.Content(role="tool", parts=parts)
+        return saved_chars // CHARS_PER_TOKEN
@@ -1,15 +1,31 @@
-import os
-import sys
+import argparse
 
-from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 
-from call_function import call_function
-from functions.get_files_info import GetFilesInfoFunction
-from functions.get_file_content import GetFileContentFunction
-from functions.write_file import WriteFileFunction
-from functions.run_python_file import RunPythonFunction
+from call_function import call_functions
+from config import (
+    HISTORY_TOKEN_BUDGET,
+    MAX_FUNCTION_CALL_WORKERS,
+    MODEL_CALL_TIMEOUT_SECONDS,
+    MODEL_HEDGE_REQUESTS,
+    MODEL_NAME,
+    WORKSPACE_SNAPSHOT_IN_PROMPT,
+)
+from functions.registry import tool_registry
+from functions.result_cache import tool_result_cache
+from functions.sandbox import script_slots
+from functions.session_state import session_scope
+from functions.workspace_manifest import workspace_manifest
+from history import ConversationHistory
+from model_backend import (
+    GenaiBackend,
+    ModelBackend,
+    RecordingBackend,
+    ReplayBackend,
+    RequestPolicyBackend,
+    create_client,
+)
+from tracing import tracer
 
 MAX_ITERS = 10
 
@@ -21,41 +37,100 @@ When a user asks a question or makes a request, make a function call plan. You c
 - List files and directories
 - Read the content of a file
 - Write to a file (create or overwrite)
+- Edit part of an existing file (search and replace, or a unified diff)
 - Run a Python file with optional arguments
+- Run the unittest tests (all of them, the last failures, or those affected by changes)
+- Search the code of the working directory for a string or regular expression
+- List the files changed since the session started or since you last checked
+
+When the first message lists the files of the working directory and what changed since
+the last session, use it instead of listing directories again.
 
 All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
 """.strip()
 
-working_directory_tool = types.Tool(
-    function_declarations=[
-        GetFileContentFunction.schema(),
-        GetFilesInfoFunction.schema(),
-        WriteFileFunction.schema(),
-        RunPythonFunction.schema(),
-    ]
-)
 
+def main(
+    prompt: str,
+    verbose_flag: bool,
+    max_workers: int = MAX_FUNCTION_CALL_WORKERS,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    backend: ModelBackend | None = None,
+    checkpoint_path: str | None = None,
+    resume: bool = False,
+    workspace_snapshot: bool = WORKSPACE_SNAPSHOT_IN_PROMPT,
+) -> None:
+    """Runs the agent loop, saving the history to `checkpoint_path` after every turn.
 
-def main(prompt: str, verbose_flag: bool) -> None:
-    load_dotenv()
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        error_message = "API KEY 'GEMINI_API_KEY' is missing"
-        raise Exception(error_message)
+    With `resume` the history is loaded from `checkpoint_path` instead and
+    `prompt`, when not empty, is added as a follow-up user message. New
+    sessions start with a map of the workspace and the files changed since
+    the last session unless `workspace_snapshot` is False.
+    """
+    if backend is None:
+        backend = RequestPolicyBackend(GenaiBackend(client=create_client()))
 
-    client = genai.Client(api_key=api_key)
-
-    messages = [types.Content(role="user", parts=[types.Part(text=prompt.strip())])]
+    if resume and checkpoint_path:
+        history = ConversationHistory.load(checkpoint_path, token_budget=token_budget)
+        if prompt.strip():
+            history.append(
+                types.Content(role="user", parts=[types.Part(text=prompt.strip())])
+            )
+        if verbose_flag:
+            print(
+                f"Resumed session from {checkpoint_path}: {len(history.messages)} "
+                f"messages, {history.turns} turns"
+            )
+    else:
+        history = ConversationHistory(
+            prompt,
+            token_budget=token_budget,
+            context=(
+                workspace_manifest.session_context() if workspace_snapshot else None
+            ),
+        )
 
     if verbose_flag:
         print(f"User prompt: {prompt}")
 
-    for _ in range(MAX_ITERS):
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=messages,
+    with tracer.span("session") as session_span, session_scope():
+        for turn in range(MAX_ITERS):
+            with tracer.span("turn", turn=turn):
+                has_more_turns = _run_turn(backend, history, verbose_flag, max_workers)
+            if checkpoint_path:
+                history.save(checkpoint_path)
+            if not has_more_turns:
+                break
+
+        session_span.update(
+            turns=history.turns,
+            prompt_tokens=history.prompt_tokens,
+            response_tokens=history.response_tokens,
+            tool_response_bytes_saved=history.response_encoder.bytes_saved,
+        )
+
+    if verbose_flag:
+        print(f"Tool result cache: {tool_result_cache.stats()}")
+        print(f"Script slots: {script_slots.stats()}")
+        print(f"Tool responses: {history.response_encoder.stats()}")
+        model_stats = backend.stats()
+        if model_stats:
+            print(f"Model requests: {model_stats}")
+
+
+def _run_turn(
+    backend: ModelBackend,
+    history: ConversationHistory,
+    verbose_flag: bool,
+    max_workers: int,
+) -> bool:
+    """One model request and its function calls, False once the model is done."""
+    with tracer.span("model_call", model=MODEL_NAME) as model_span:
+        response = backend.generate_content(
+            model=MODEL_NAME,
+            contents=history.messages,
             config=types.GenerateContentConfig(
-                tools=[working_directory_tool],
+                tools=[tool_registry.tool()],
                 system_instruction=system_prompt,
             ),
         )
@@ -64,41 +139,142 @@ def main(prompt: str, verbose_flag: bool) -> None:
             error_message = "reponse is malformed, not able to view usage metadata"
             raise Exception(error_message)
 
-        if verbose_flag:
-            print(f"Prompt token: {response.usage_metadata.prompt_token_count}")
-            print(f"Response token: {response.usage_metadata.candidates_token_count}")
+        model_span.update(
+            prompt_tokens=response.usage_metadata.prompt_token_count,
+            response_tokens=response.usage_metadata.candidates_token_count,
+        )
+
+    if verbose_flag:
+        print(f"Prompt token: {response.usage_metadata.prompt_token_count}")
+        print(f"Response token: {response.usage_metadata.candidates_token_count}")
+
+    history.record_usage(response.usage_metadata)
+    saved_tokens = history.compact(response.usage_metadata.prompt_token_count)
+    if verbose_flag and saved_tokens:
+        print(
+            f"History compacted: ~{saved_tokens} tokens saved (session total "
+            f"~{history.tokens_saved})"
+        )
 
-        for candidate in response.candidates or []:
-            if not candidate.content:
+    for candidate in response.candidates or []:
+        if not candidate.content:
+            continue
+        for part in candidate.content.parts or []:
+            if not part or not part.text:
                 continue
-            for part in candidate.content.parts or []:
-                if not part or not part.text:
-                    continue
-                print(f"AI: {part.text}\n")
+            print(f"AI: {part.text}\n")
+
+        history.append(candidate.content)
+
+    if not response.function_calls:
+        return False
 
-            messages.append(candidate.content)
+    for function_call_part in response.function_calls:
+        print(
+            f"Calling function: {function_call_part.name}({function_call_part.args})\n"
+        )
 
-        if response.function_calls:
-            for function_call_part in response.function_calls:
-                print(
-                    f"Calling function: {function_call_part.name}({function_call_part.args})\n"
-                )
+    function_responses = call_functions(
+        response.function_calls, max_workers=max_workers
+    )
+    for function_call_part, function_response in zip(
+        response.function_calls, function_responses, strict=True
+    ):
+        print(f"Tool: {function_response}\n")
+        history.append_tool_response(function_response, function_call_part)
 
-                response = call_function(function_call_part=function_call_part)
-                print(f"Tool: {response}\n")
-                messages.append(response)
-        else:
-            return
+    return True
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        error_message = "Prompt required"
-        raise Exception(error_message)
+    parser = argparse.ArgumentParser(description="AI coding agent")
+    parser.add_argument(
+        "prompt",
+        nargs="?",
+        default="",
+        help="prompt for the agent, or a follow-up message with --resume",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=MAX_FUNCTION_CALL_WORKERS,
+        help="max concurrent function calls of one turn (1 runs them in order)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=HISTORY_TOKEN_BUDGET,
+        help="prompt tokens above which old tool results are compacted",
+    )
+    backend_group = parser.add_mutually_exclusive_group()
+    backend_group.add_argument(
+        "--record", metavar="SESSION_FILE", help="save model requests/responses"
+    )
+    backend_group.add_argument(
+        "--replay", metavar="SESSION_FILE", help="serve a recorded session offline"
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        default=0.0,
+        help="seconds to wait before each replayed response",
+    )
+    parser.add_argument(
+        "--model-timeout",
+        type=float,
+        default=MODEL_CALL_TIMEOUT_SECONDS,
+        help="seconds a model request may take before it is retried",
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        default=MODEL_HEDGE_REQUESTS,
+        help="send a second model request if the first is slower than the p95 latency",
+    )
+    parser.add_argument(
+        "--base-url",
+        help="API endpoint to use instead of Google's, e.g. fake_model_server.py",
+    )
+    parser.add_argument("--trace", metavar="TRACE_FILE", help="append JSONL spans")
+    session_group = parser.add_mutually_exclusive_group()
+    session_group.add_argument(
+        "--checkpoint",
+        metavar="SESSION_FILE",
+        help="save the conversation and usage counters after every turn",
+    )
+    session_group.add_argument(
+        "--resume",
+        metavar="SESSION_FILE",
+        help=(
+            "continue from the last checkpoint saved in SESSION_FILE (and keep saving "
+            "to it)"
+        ),
+    )
+    cli_args = parser.parse_args()
+    if not cli_args.prompt and not cli_args.resume:
+        parser.error("a prompt is required unless --resume is given")
+
+    tracer.configure(cli_args.trace)
 
-    verbose_flag = False
-    if len(sys.argv) == 3 and sys.argv[2] == "--verbose":
-        verbose_flag = True
+    backend: ModelBackend
+    if cli_args.replay:
+        backend = ReplayBackend(cli_args.replay, latency=cli_args.replay_latency)
+    else:
+        backend = RequestPolicyBackend(
+            GenaiBackend(client=create_client(base_url=cli_args.base_url)),
+            timeout=cli_args.model_timeout,
+            hedge=cli_args.hedge,
+        )
+        if cli_args.record:
+            backend = RecordingBackend(backend, session_path=cli_args.record)
 
-    prompt = sys.argv[1]
-    main(prompt, verbose_flag)
+    main(
+        cli_args.prompt,
+        cli_args.verbose,
+        max_workers=cli_args.max_workers,
+        token_budget=cli_args.token_budget,
+        backend=backend,
+        checkpoint_path=cli_args.resume or cli_args.checkpoint,
+        resume=cli_args.resume is not None,
+    )
@@ -0,0 +1,342 @@
+from abc import ABC, abstractmethod
+from collections import deque
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import override
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import errors, types
+import httpx
+
+from config import (
+    MODEL_BACKOFF_BASE_SECONDS,
+    MODEL_BACKOFF_MAX_SECONDS,
+    MODEL_CALL_TIMEOUT_SECONDS,
+    MODEL_HEDGE_MIN_SAMPLES,
+    MODEL_HEDGE_PERCENTILE,
+    MODEL_HEDGE_REQUESTS,
+    MODEL_MAX_RETRIES,
+)
+from utils import percentile
+
+# HTTP status codes of API errors worth retrying: timeout, rate limit, server side
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+# successful latencies kept for the hedging percentile
+LATENCY_WINDOW = 200
+
+
+def create_client(base_url: str | None = None) -> genai.Client:
+    load_dotenv()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        error_message = "API KEY 'GEMINI_API_KEY' is missing"
+        raise Exception(error_message)
+
+    http_options = types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+class ModelBackend(ABC):
+    """Where the agent loop sends its `generate_content` requests."""
+
+    @abstractmethod
+    def generate_content(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> types.GenerateContentResponse:
+        raise NotImplementedError()
+
+    def stats(self) -> dict[str, int]:
+        """Counters worth reporting at the end of a session, empty by default."""
+        return {}
+
+
+class GenaiBackend(ModelBackend):
+    def __init__(self, client: genai.Client) -> None:
+        self.client = client
+
+    @override
+    def generate_content(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> types.GenerateContentResponse:
+        return self.client.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+
+
+class RequestPolicyBackend(ModelBackend):
+    """Deadlines, retries with backoff and optional hedging around another backend.
+
+    Every request to `backend` runs in its own thread and gets `timeout`
+    seconds to answer. Timeouts, connection errors and API errors with a
+    `RETRYABLE_STATUS_CODES` status are retried up to `max_retries` times
+    after an exponential backoff with full jitter. With `hedge`, a second
+    request is sent when the first has not answered by the
+    `hedge_percentile` latency of earlier successful requests (once there
+    are `hedge_min_samples` of them) and the first answer wins. Requests
+    that are given up on are left to finish in the background.
+    """
+
+    def __init__(
+        self,
+        backend: ModelBackend,
+        timeout: float = MODEL_CALL_TIMEOUT_SECONDS,
+        max_retries: int = MODEL_MAX_RETRIES,
+        backoff_base: float = MODEL_BACKOFF_BASE_SECONDS,
+        backoff_max: float = MODEL_BACKOFF_MAX_SECONDS,
+        hedge: bool = MODEL_HEDGE_REQUESTS,
+        hedge_percentile: float = MODEL_HEDGE_PERCENTILE,
+        hedge_min_samples: int = MODEL_HEDGE_MIN_SAMPLES,
+    ) -> None:
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "requests": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "failures": 0,
+        }
+
+    @override
+    def generate_content(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> types.GenerateContentResponse:
+        self._count("calls")
+        retries = 0
+        while True:
+            try:
+                return self._attempt(model, contents, config)
+            except Exception as e:
+                if retries >= self.max_retries or not is_retryable(e):
+                    self._count("failures")
+                    raise
+            retries += 1
+            self._count("retries")
+            time.sleep(self.backoff_delay(retries))
+
+    def backoff_delay(self, retry: int) -> float:
+        """Full jitter: uniform in [0, `backoff_base * 2 ** (retry - 1)`], capped."""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1))
+        )
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which a hedged request is sent, None while hedging is off."""
+        with self.lock:
+            if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+                return None
+            return percentile(list(self.latencies), self.hedge_percentile)
+
+    @override
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+    def _attempt(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> types.GenerateContentResponse:
+        """One deadline: the request, plus its hedge when the request is slow."""
+        results: queue.Queue = queue.Queue()
+        started_at = time.perf_counter()
+        deadline = started_at + self.timeout
+        hedge_at = self.hedge_delay()
+        if hedge_at is not None:
+            hedge_at += started_at
+
+        self._send(results, model, contents, config, hedged=False)
+        pending = 1
+        last_error: Exception | None = None
+        while pending:
+            wait_until = deadline if hedge_at is None else min(hedge_at, deadline)
+            try:
+                hedged, response, error = results.get(
+                    timeout=max(wait_until - time.perf_counter(), 0)
+                )
+            except queue.Empty:
+                if hedge_at is not None and time.perf_counter() < deadline:
+                    hedge_at = None
+                    self._count("hedges")
+                    self._send(results, model, contents, config, hedged=True)
+                    pending += 1
+                    continue
+                self._count("timeouts")
+                raise TimeoutError(
+                    f"model request got no response within {self.timeout}s"
+                ) from None
+
+            pending -= 1
+            if error is None:
+                if hedged:
+                    self._count("hedge_wins")
+                return response
+            self._count("errors")
+            # a failed request doesn't need a hedge, a retry comes sooner
+            hedge_at = None
+            last_error = error
+
+        assert last_error is not None
+        raise last_error
+
+    def _send(
+        self,
+        results: queue.Queue,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+        hedged: bool,
+    ) -> None:
+        self._count("requests")
+
+        def request() -> None:
+            started_at = time.perf_counter()
+            try:
+                response = self.backend.generate_content(
+                    model=model, contents=contents, config=config
+                )
+            except Exception as e:
+                results.put((hedged, None, e))
+                return
+            with self.lock:
+                self.latencies.append(time.perf_counter() - started_at)
+            results.put((hedged, response, None))
+
+        threading.Thread(target=request, daemon=True).start()
+
+    def _count(self, counter: str) -> None:
+        with self.lock:
+            self.counters[counter] += 1
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError))
+
+
+class RecordingBackend(ModelBackend):
+    """Forwards requests to `backend`, logs each request/response pair to JSONL."""
+
+    def __init__(self, backend: ModelBackend, session_path: str) -> None:
+        self.backend = backend
+        self.session_path = session_path
+        self.lock = threading.Lock()
+
+        parent_dir = os.path.dirname(session_path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+
+    @override
+    def generate_content(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> types.GenerateContentResponse:
+        response = self.backend.generate_content(
+            model=model, contents=contents, config=config
+        )
+
+        record = {
+            "request": {
+                "model": model,
+                "contents": [
+                    content.model_dump(mode="json", exclude_none=True)
+                    for content in contents
+                ],
+            },
+            "response": response.model_dump(mode="json", exclude_none=True),
+        }
+        with self.lock, open(self.session_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        return response
+
+    @override
+    def stats(self) -> dict[str, int]:
+        return self.backend.stats()
+
+
+class ReplayBackend(ModelBackend):
+    """Serves the responses of a recorded session in order, without any network.
+
+    `latency` seconds are slept before every response to stand in for the
+    model. `agent_latencies` collects the time the agent spent between a
+    response and its next request, i.e. tool dispatch plus loop overhead.
+    """
+
+    def __init__(self, session_path: str, latency: float = 0.0) -> None:
+        with open(session_path) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+
+        self.responses = [
+            types.GenerateContentResponse.model_validate(record["response"])
+            for record in records
+        ]
+        self.prompt = ""
+        if records:
+            first_message = types.Content.model_validate(
+                records[0]["request"]["contents"][0]
+            )
+            self.prompt = (first_message.parts or [types.Part(text="")])[0].text or ""
+        self.session_path = session_path
+        self.latency = latency
+        self.next_response = 0
+        self.agent_latencies: list[float] = []
+        self.last_response_at: float | None = None
+
+    def reset(self) -> None:
+        self.next_response = 0
+        self.last_response_at = None
+
+    @override
+    def generate_content(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> types.GenerateContentResponse:
+        if self.last_response_at is not None:
+            self.agent_latencies.append(time.perf_counter() - self.last_response_at)
+
+        if self.next_response >= len(self.responses):
+            error_message = (
+                f"recorded session '{self.session_path}' has no response left for "
+                f"request {self.next_response + 1}"
+            )
+            raise Exception(error_message)
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        response = self.responses[self.next_response]
+        self.next_response += 1
+        self.last_response_at = time.perf_counter()
+        return response
@@ -0,0 +1,57 @@
+import asyncio
+from collections import deque
+import time
+
+
+class RateLimiter:
+    """Sliding-window requests and tokens per minute limiter for asyncio sessions.
+
+    `acquire` reserves a slot for one request using an estimate of its
+    tokens and `settle` replaces the estimate with the real count once the
+    response's usage metadata is known. A limit of None disables that check.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None,
+        tokens_per_minute: int | None,
+        window: float = 60.0,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.reservations: deque[list[float]] = deque()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, estimated_tokens: int = 0) -> list[float]:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                while (
+                    self.reservations and self.reservations[0][0] <= now - self.window
+                ):
+                    self.reservations.popleft()
+
+                if not self.reservations or self._has_capacity(estimated_tokens):
+                    reservation = [now, float(estimated_tokens)]
+                    self.reservations.append(reservation)
+                    return reservation
+
+                await asyncio.sleep(self.reservations[0][0] + self.window - now)
+
+    def settle(self, reservation: list[float], tokens: int) -> None:
+        reservation[1] = float(tokens)
+
+    def _has_capacity(self, estimated_tokens: int) -> bool:
+        if (
+            self.requests_per_minute is not None
+            and len(self.reservations) >= self.requests_per_minute
+        ):
+            return False
+
+        if self.tokens_per_minute is not None:
+            used_tokens = sum(reservation[1] for reservation in self.reservations)
+            if used_tokens + estimated_tokens > self.tokens_per_minute:
+                return False
+
+        return True
@@ -0,0 +1,156 @@
+import hashlib
+import json
+
+from google.genai import types
+
+from config import (
+    TOOL_RESPONSE_DEDUPE_MIN_BYTES,
+    TOOL_RESPONSE_MAX_BYTES,
+    TOOL_RESPONSE_MAX_BYTES_PER_TOOL,
+)
+from functions.output_capture import BoundedOutput
+
+# longest arguments quoted when a repeated result refers to its earlier call
+REFERENCE_MAX_ARGS_CHARS = 200
+
+
+class ToolResponseEncoder:
+    """Shrinks tool results before they join the conversation of one session.
+
+    A result over its tool's byte cap (`max_bytes_per_tool`, else
+    `max_bytes`) keeps its head and tail with the number of dropped bytes
+    in between. A result of at least `dedupe_min_bytes` that is identical to
+    one already sent in the session is replaced by a reference to the call
+    that returned it first. Errors are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = TOOL_RESPONSE_MAX_BYTES,
+        max_bytes_per_tool: dict[str, int] | None = None,
+        dedupe_min_bytes: int = TOOL_RESPONSE_DEDUPE_MIN_BYTES,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_bytes_per_tool = (
+            TOOL_RESPONSE_MAX_BYTES_PER_TOOL
+            if max_bytes_per_tool is None
+            else max_bytes_per_tool
+        )
+        self.dedupe_min_bytes = dedupe_min_bytes
+        # result digest -> first call returning it, e.g. "edit_file call with {...}"
+        self.seen: dict[str, str] = {}
+        # result digest -> how many later responses refer to it
+        self.referenced: dict[str, int] = {}
+        self.bytes_saved = 0
+        self.references = 0
+        self.truncations = 0
+
+    def encode(
+        self,
+        content: types.Content,
+        function_call_part: types.FunctionCall | None = None,
+    ) -> types.Content:
+        """`content` with every `result` encoded, the same object if nothing changed."""
+        parts: list[types.Part] = []
+        changed = False
+        for part in content.parts or []:
+            function_response = part.function_response
+            result = (
+                function_response.response.get("result")
+                if function_response and function_response.response
+                else None
+            )
+            if function_response is None or not isinstance(result, str):
+                parts.append(part)
+                continue
+
+            encoded = self.encode_result(
+                function_response.name or "", result, function_call_part
+            )
+            if encoded is result:
+                parts.append(part)
+                continue
+
+            changed = True
+            parts.append(
+                types.Part.from_function_response(
+                    name=function_response.name or "", response={"result": encoded}
+                )
+            )
+
+        return types.Content(role=content.role, parts=parts) if changed else content
+
+    def encode_result(
+        self,
+        function_name: str,
+        result: str,
+        function_call_part: types.FunctionCall | None = None,
+    ) -> str:
+        result_bytes = result.encode()
+        encoded = result
+        max_bytes = self.max_bytes_per_tool.get(function_name, self.max_bytes)
+        if len(result_bytes) > max_bytes:
+            truncated = BoundedOutput(max_bytes)
+            truncated.write(result_bytes)
+            encoded = truncated.text()
+            self.truncations += 1
+
+        if len(encoded) >= self.dedupe_min_bytes:
+            digest = _digest(function_name, encoded)
+            earlier_call = self.seen.get(digest)
+            if earlier_call is None:
+                self.seen[digest] = _describe_call(function_name, function_call_part)
+            else:
+                encoded = (
+                    f"[same result as the earlier {earlier_call}, see that response]"
+                )
+                self.references += 1
+                self.referenced[digest] = self.referenced.get(digest, 0) + 1
+
+        if encoded is not result:
+            self.bytes_saved += len(result_bytes) - len(encoded.encode())
+        return encoded
+
+    def is_referenced(self, function_name: str, result: str) -> bool:
+        """Whether a later response refers to `result` instead of repeating it."""
+        return _digest(function_name, result) in self.referenced
+
+    def forget(self, function_name: str, result: str) -> None:
+        """Drops `result` once it left the conversation, so a repeat is sent in full."""
+        self.seen.pop(_digest(function_name, result), None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "bytes_saved": self.bytes_saved,
+            "references": self.references,
+            "truncations": self.truncations,
+        }
+
+    def state(self) -> dict:
+        """JSON-serializable state, for session checkpoints."""
+        return {"seen": self.seen, "referenced": self.referenced, **self.stats()}
+
+    def restore(self, state: dict) -> None:
+        self.seen = dict(state["seen"])
+        self.referenced = dict(state.get("referenced", {}))
+        self.bytes_saved = state["bytes_saved"]
+        self.references = state["references"]
+        self.truncations = state["truncations"]
+
+
+def _digest(function_name: str, result: str) -> str:
+    return hashlib.blake2b(
+        f"{function_name}\0{result}".encode(), digest_size=16
+    ).hexdigest()
+
+
+def _describe_call(
+    function_name: str, function_call_part: types.FunctionCall | None
+) -> str:
+    if function_call_part is None or not function_call_part.args:
+        return f"{function_name} call"
+
+    args = json.dumps(function_call_part.args, sort_keys=True)
+    if len(args) > REFERENCE_MAX_ARGS_CHARS:
+        args = args[:REFERENCE_MAX_ARGS_CHARS] + "...}"
+    return f"{function_name} call with {args}"
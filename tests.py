@@ -1,13 +1,58 @@
-from ntpath import isdir
+import asyncio
+import contextlib
+import io
+import json
 import os
 import shutil
+import signal
+import tempfile
+import threading
+import time
+from typing import cast, override
+from unittest import mock
 
-from google.genai import types
+from google import genai
+from google.genai import errors, types
 
+from async_main import run_session
+from batch import run_batch
+from benchmark_suite import bench_calculator, bench_dispatch, compare_to_baseline
+from call_function import call_functions, schedule_function_calls
+from config import MODEL_NAME
+from fake_model_server import FakeModelServer, Fault
+from functions.edit_file import EditFileFunction
 from functions.get_file_content import GetFileContentFunction
 from functions.get_files_info import GetFilesInfoFunction
+from functions.get_workspace_changes import GetWorkspaceChangesFunction
+from functions.python_worker_pool import PythonWorkerPool
+from functions.registry import ToolRegistry
+from functions.result_cache import tool_result_cache
 from functions.run_python_file import RunPythonFunction
+from functions.run_tests import RunTestsFunction
+from functions.sandbox import ResourceLimits, ScriptSlots
+from functions.search_code import SearchCodeFunction
+from functions.session_state import session_scope
+from functions.workspace_manifest import WorkspaceManifest
 from functions.write_file import WriteFileFunction
+from history import ConversationHistory
+from main import main
+from model_backend import (
+    GenaiBackend,
+    ModelBackend,
+    RecordingBackend,
+    ReplayBackend,
+    RequestPolicyBackend,
+)
+from rate_limiter import RateLimiter
+from trace_summary import summarize_traces
+from tracing import tracer
+from utils import generate_success_message
+
+
+def tool_response(content: types.Content) -> dict:
+    """The response of the first function response part of `content`."""
+    assert content.parts and content.parts[0].function_response
+    return content.parts[0].function_response.response or {}
 
 
 def test_get_files_info():
@@ -18,31 +63,61 @@ def test_get_files_info():
     content: types.Content = function.handle_function_call(
         args={GetFilesInfoFunction.directory_key: ""}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 2
     content: types.Content = function.handle_function_call(
         args={GetFilesInfoFunction.directory_key: "pkg"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 3
     content: types.Content = function.handle_function_call(
         args={GetFilesInfoFunction.directory_key: "/bin"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 4
     content: types.Content = function.handle_function_call(
         args={GetFilesInfoFunction.directory_key: "not_exists"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 5
     content: types.Content = function.handle_function_call(
         args={GetFilesInfoFunction.directory_key: "../"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
+
+    # case 6: recursive listing filtered by glob
+    content: types.Content = function.handle_function_call(
+        args={
+            GetFilesInfoFunction.recursive_key: True,
+            GetFilesInfoFunction.include_key: ["*.py"],
+            GetFilesInfoFunction.exclude_key: ["__pycache__"],
+        }
+    )
+    result = tool_response(content)["result"]
+    print(result)
+    assert " - pkg/calculator.py:" in result and "is_dir=True" not in result
+
+    # case 7: an entry longer than the page budget is cut short, the cursor moves
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in ("a" * 80, "b" * 80):
+            open(os.path.join(temp_dir, name), "w").close()
+        function = GetFilesInfoFunction(working_directory=temp_dir)
+        with mock.patch("functions.get_files_info.GET_FILES_INFO_MAX_CHARS", 50):
+            results = [
+                tool_response(
+                    function.handle_function_call(
+                        args={GetFilesInfoFunction.cursor_key: cursor}
+                    )
+                )["result"]
+                for cursor in (0, 1)
+            ]
+    print(results)
+    assert "[truncated]" in results[0] and "cursor=1" in results[0]
+    assert "bbbb" in results[1] and "cursor=" not in results[1]
 
 
 def test_get_file_content():
@@ -53,25 +128,69 @@ def test_get_file_content():
     content: types.Content = function.handle_function_call(
         args={GetFileContentFunction.file_path_key: "main.py"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 2
     content: types.Content = function.handle_function_call(
         args={GetFileContentFunction.file_path_key: "pkg/calculator.py"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 3
     content: types.Content = function.handle_function_call(
         args={GetFileContentFunction.file_path_key: "pkg/not_exists.py"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 4
     content: types.Content = function.handle_function_call(
         args={GetFileContentFunction.file_path_key: "/bin/cat"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
+
+    # case 5: byte range with a continuation cursor
+    content: types.Content = function.handle_function_call(
+        args={
+            GetFileContentFunction.file_path_key: "pkg/calculator.py",
+            GetFileContentFunction.offset_key: 100,
+            GetFileContentFunction.length_key: 50,
+        }
+    )
+    result = tool_response(content)["result"]
+    print(result)
+    assert "continue with offset=150" in result
+
+    # case 6: line range
+    content: types.Content = function.handle_function_call(
+        args={
+            GetFileContentFunction.file_path_key: "tests.py",
+            GetFileContentFunction.start_line_key: 1,
+            GetFileContentFunction.end_line_key: 1,
+        }
+    )
+    result = tool_response(content)["result"]
+    print(result)
+    assert result.startswith("# calculator/tests.py") and "start_line=2" in result
+
+    # case 7: ranges that select nothing are errors
+    content = function.handle_function_call(
+        args={
+            GetFileContentFunction.file_path_key: "main.py",
+            GetFileContentFunction.offset_key: 999999,
+        }
+    )
+    result = tool_response(content)["result"]
+    print(result)
+    assert result.startswith("Error: offset 999999 is at or past the end")
+    content = function.handle_function_call(
+        args={
+            GetFileContentFunction.file_path_key: "main.py",
+            GetFileContentFunction.start_line_key: 5,
+            GetFileContentFunction.end_line_key: 2,
+        }
+    )
+    print(tool_response(content))
+    assert tool_response(content) == {"error": "start_line (5) is after end_line (2)"}
 
 
 def test_write_file():
@@ -85,7 +204,7 @@ def test_write_file():
             WriteFileFunction.content_key: "lorem text",
         }
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 2
     if os.path.isdir(os.path.join(working_dir, "non_existing")):
@@ -96,7 +215,7 @@ def test_write_file():
             WriteFileFunction.content_key: "lorem text",
         }
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 3
     existing_dir = os.path.join(working_dir, "existing")
@@ -107,7 +226,7 @@ def test_write_file():
             WriteFileFunction.content_key: "lorem text",
         }
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 4
     existing_dir = os.path.join(working_dir, "existing")
@@ -118,7 +237,126 @@ def test_write_file():
             WriteFileFunction.content_key: "lorem text",
         }
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
+
+    os.remove(os.path.join(working_dir, "lorem.txt"))
+    shutil.rmtree(os.path.join(working_dir, "non_existing"))
+    shutil.rmtree(existing_dir)
+
+
+def test_edit_file():
+    working_dir = "calculator"
+    function = EditFileFunction(working_directory=working_dir)
+    os.makedirs(os.path.join(working_dir, "existing"), exist_ok=True)
+    file_path = os.path.join(working_dir, "existing", "edit_me.py")
+    with open(file_path, "w") as f:
+        f.write(
+            "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a + b\n"
+        )
+
+    def edit(args: dict) -> str:
+        content: types.Content = function.handle_function_call(
+            args={EditFileFunction.file_path_key: "existing/edit_me.py", **args}
+        )
+        result = tool_response(content)["result"]
+        print(result)
+        return result
+
+    def read() -> str:
+        with open(file_path) as f:
+            return f.read()
+
+    try:
+        # case 1: unique search/replace
+        result = edit(
+            {
+                EditFileFunction.search_key: "def sub(a, b):\n    return a + b",
+                EditFileFunction.replace_key: "def sub(a, b):\n    return a - b",
+            }
+        )
+        assert result.startswith("Successfully edited") and "+1 -1" in result
+        assert "return a - b" in read()
+
+        # case 2: ambiguous search is a conflict and leaves the file unchanged
+        before = read()
+        result = edit(
+            {
+                EditFileFunction.search_key: "(a, b)",
+                EditFileFunction.replace_key: "(x, y)",
+            }
+        )
+        assert result.startswith("Error:") and "2 times" in result
+        assert read() == before
+
+        # case 3: unified diff whose hunk sits two lines lower than stated
+        result = edit(
+            {
+                EditFileFunction.diff_key: (
+                    "--- a/edit_me.py\n+++ b/edit_me.py\n@@ -3,2 +3,2 @@\n def sub(a, "
+                    "b):\n-    return a - b\n+    return b - a\n"
+                )
+            }
+        )
+        assert result.startswith("Successfully edited")
+        assert read().endswith("def sub(a, b):\n    return b - a\n")
+
+        # case 4: diff context that is not in the file
+        before = read()
+        result = edit(
+            {
+                EditFileFunction.diff_key: (
+                    "@@ -1,2 +1,2 @@\n def mul(a, b):\n-    return a * b\n+    return "
+                    "b * a\n"
+                )
+            }
+        )
+        assert result.startswith("Error:") and "hunk 1" in result
+        assert read() == before
+        assert not [
+            name
+            for name in os.listdir(os.path.dirname(file_path))
+            if name.endswith(".tmp")
+        ]
+
+        # case 5: "\ No newline at end of file" only applies to the line before it
+        with open(file_path, "w") as f:
+            f.write("a\nfoo")
+        result = edit(
+            {
+                EditFileFunction.diff_key: (
+                    "@@ -1,2 +1,3 @@\n a\n-foo\n\\ No newline at end of file\n+foo\n"
+                    "+bar\n"
+                )
+            }
+        )
+        assert result.startswith("Successfully edited")
+        assert read() == "a\nfoo\nbar\n"
+
+        # case 6: hunk lines that start like file headers ("-- c" removed, "++ d" added)
+        with open(file_path, "w") as f:
+            f.write("x\n-- c\ny\n")
+        result = edit(
+            {
+                EditFileFunction.diff_key: (
+                    "--- a/edit_me.py\n+++ b/edit_me.py\n@@ -1,3 +1,3 @@\n x\n--- c\n"
+                    "+++ d\n y\n"
+                )
+            }
+        )
+        assert result.startswith("Successfully edited")
+        assert read() == "x\n++ d\ny\n"
+
+        # case 7: outside the working directory
+        content: types.Content = function.handle_function_call(
+            args={
+                EditFileFunction.file_path_key: "../main.py",
+                EditFileFunction.search_key: "x",
+                EditFileFunction.replace_key: "y",
+            }
+        )
+        print(tool_response(content)["result"])
+    finally:
+        shutil.rmtree(os.path.join(working_dir, "existing"))
 
 
 def test_run_python_file():
@@ -132,34 +370,954 @@ def test_run_python_file():
             RunPythonFunction.args_key: ["3 + 5"],
         }
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 2
     content: types.Content = function.handle_function_call(
         args={RunPythonFunction.python_file_path_key: "tests.py"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 3
     content: types.Content = function.handle_function_call(
         args={RunPythonFunction.python_file_path_key: "../main.py"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 4
     content: types.Content = function.handle_function_call(
         args={RunPythonFunction.python_file_path_key: "/main.py"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
 
     # case 5
     content: types.Content = function.handle_function_call(
         args={RunPythonFunction.python_file_path_key: "nonexistent.py"}
     )
-    print(content.parts[0].function_response.response["result"])
+    print(tool_response(content)["result"])
+
+    # case 6: chatty output keeps its head and tail only
+    with open(os.path.join(working_dir, "chatty.py"), "w") as f:
+        f.write("print('x' * 1_000_000)\nprint('done')\n")
+    try:
+        content: types.Content = function.handle_function_call(
+            args={RunPythonFunction.python_file_path_key: "chatty.py"}
+        )
+    finally:
+        os.remove(os.path.join(working_dir, "chatty.py"))
+    result = tool_response(content)["result"]
+    print(len(result), result[-80:])
+    assert "bytes dropped" in result and "done" in result and len(result) < 20_000
+
+    # case 7: runaway scripts hit the CPU and memory limits, usage is reported
+    function.limits = ResourceLimits(cpu_seconds=1, memory_bytes=256 * 1024 * 1024)
+    scripts = {
+        "spin.py": "while True:\n    pass\n",
+        "hog.py": "data = bytearray(512 * 1024 * 1024)\n",
+    }
+    for script_name, script in scripts.items():
+        with open(os.path.join(working_dir, script_name), "w") as f:
+            f.write(script)
+    try:
+        results = [
+            tool_response(
+                function.handle_function_call(
+                    args={RunPythonFunction.python_file_path_key: script_name}
+                )
+            )["result"]
+            for script_name in scripts
+        ]
+    finally:
+        for script_name in scripts:
+            os.remove(os.path.join(working_dir, script_name))
+    print(results)
+    assert "CPU time limit of 1s exceeded" in results[0]
+    assert "MemoryError" in results[1]
+    assert all("\nResources: wall " in result for result in results)
+
+
+def test_script_slots():
+    slots = ScriptSlots(slots=1)
+    release = threading.Event()
+
+    def hold_slot():
+        with slots.slot():
+            release.wait()
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    while slots.stats()["runs"] == 0:
+        time.sleep(0.001)
+    threading.Timer(0.05, release.set).start()
+    with slots.slot() as wait_seconds:
+        pass
+    holder.join()
+    print(slots.stats())
+    assert wait_seconds >= 0.04
+    assert slots.stats()["waits"] == 1 and slots.stats()["peak_running"] == 1
+
+
+def test_run_tests():
+    with tempfile.TemporaryDirectory() as workspace_dir:
+        os.makedirs(os.path.join(workspace_dir, "pkg"))
+        files = {
+            "pkg/__init__.py": "",
+            "pkg/mathops.py": "def add(a, b):\n    return a - b\n",
+            "pkg/text.py": "def shout(text):\n    return text.upper()\n",
+            "test_mathops.py": (
+                "import unittest\nfrom pkg.mathops import add\n\n\nclass "
+                "TestAdd(unittest.TestCase):\n    def test_add(self):\n        "
+                "self.assertEqual(add(2, 2), 4)\n\n    def test_zero(self):\n        "
+                "self.assertEqual(add(0, 0), 0)\n"
+            ),
+            "test_text.py": (
+                "import unittest\nfrom pkg import text\n\n\nclass "
+                "TestText(unittest.TestCase):\n    def test_shout(self):\n        "
+                "print('noise')\n        self.assertEqual(text.shout('a'), 'A')\n"
+            ),
+            "test_broken.py": "import missing_module\n",
+        }
+        for rel_path, content in files.items():
+            with open(os.path.join(workspace_dir, rel_path), "w") as f:
+                f.write(content)
+
+        function = RunTestsFunction(working_directory=workspace_dir)
+        function.session_manifest = WorkspaceManifest(
+            workspace_dir, os.path.join(workspace_dir, ".aiagent", "manifest.json")
+        )
+
+        def run_tests(args: dict) -> str:
+            content: types.Content = function.handle_function_call(args=args)
+            result = tool_response(content)["result"]
+            print(result)
+            return result
+
+        # case 1: every test, one line each, a failure and an import error
+        result = run_tests({RunTestsFunction.shards_key: 2})
+        assert result.startswith("Ran 4 tests")
+        assert "FAIL test_mathops.TestAdd.test_add" in result
+        assert "PASS test_mathops.TestAdd.test_zero" in result
+        assert "PASS test_text.TestText.test_shout" in result
+        assert "ERROR test_broken" in result and "AssertionError: 0 != 4" in result
+        assert "noise" not in result
+
+        # case 2: fix the module, re-run only what failed
+        with open(os.path.join(workspace_dir, "pkg", "mathops.py"), "w") as f:
+            f.write("def add(a, b):\n    return a + b\n")
+        os.remove(os.path.join(workspace_dir, "test_broken.py"))
+        result = run_tests({RunTestsFunction.select_key: "failed"})
+        assert result.startswith("Ran 2 tests") and "1 passed" in result
+
+        # case 3: only the tests importing the changed modules, including
+        # the change made before the "failed" run
+        with open(os.path.join(workspace_dir, "pkg", "text.py"), "a") as f:
+            f.write("\n")
+        result = run_tests({RunTestsFunction.select_key: "affected"})
+        assert result.startswith("Ran 3 tests") and "3 passed" in result
+        with open(os.path.join(workspace_dir, "pkg", "text.py"), "a") as f:
+            f.write("\n")
+        result = run_tests({RunTestsFunction.select_key: "affected"})
+        assert (
+            result.startswith("Ran 1 tests")
+            and "test_text.TestText.test_shout" in result
+        )
+
+        # case 4: a failed subtest is reported and re-run under its test's id
+        with open(os.path.join(workspace_dir, "test_params.py"), "w") as f:
+            f.write(
+                "import unittest\n\n\nclass TestParams(unittest.TestCase):\n    def "
+                "test_double(self):\n        for x in (1, 2):\n            with "
+                "self.subTest(x=x):\n                self.assertEqual(x * 2, 2)\n"
+            )
+        result = run_tests({RunTestsFunction.pattern_key: "test_params.py"})
+        assert "FAIL test_params.TestParams.test_double (x=2)" in result
+        result = run_tests({RunTestsFunction.select_key: "failed"})
+        assert result.startswith("Ran 1 tests") and "1 failed" in result
+        assert "FAIL test_params.TestParams.test_double (x=2)" in result
+
+        # case 5: failures are remembered per session
+        with session_scope():
+            result = run_tests({})
+            assert "FAIL test_params.TestParams.test_double (x=2)" in result
+        with session_scope():
+            result = run_tests({RunTestsFunction.select_key: "failed"})
+            assert result == "No failed tests recorded from a previous run_tests call."
+
+
+def test_search_code():
+    working_dir = "calculator"
+    function = SearchCodeFunction(working_directory=working_dir)
+
+    # case 1: literal query
+    content: types.Content = function.handle_function_call(
+        args={SearchCodeFunction.query_key: "def _evaluate_infix"}
+    )
+    result = tool_response(content)["result"]
+    print(result)
+    assert result.startswith("pkg/calculator.py:")
+
+    # case 2: regex query
+    content: types.Content = function.handle_function_call(
+        args={
+            SearchCodeFunction.query_key: r"class \w+\(unittest\.TestCase\)",
+            SearchCodeFunction.regex_key: True,
+        }
+    )
+    result = tool_response(content)["result"]
+    print(result)
+    assert result.startswith("tests.py:")
+
+    # case 3: the index picks up new files
+    with open(os.path.join(working_dir, "lorem.txt"), "w") as f:
+        f.write("needle in a haystack")
+    try:
+        content: types.Content = function.handle_function_call(
+            args={SearchCodeFunction.query_key: "needle"}
+        )
+    finally:
+        os.remove(os.path.join(working_dir, "lorem.txt"))
+    print(tool_response(content)["result"])
+
+    # case 4: invalid regex
+    content: types.Content = function.handle_function_call(
+        args={SearchCodeFunction.query_key: "(", SearchCodeFunction.regex_key: True}
+    )
+    print(tool_response(content)["result"])
+
+
+def test_python_worker_pool():
+    pool = PythonWorkerPool(working_directory="calculator", size=1)
+    try:
+        # case 1: same stdout and exit code as a fresh python3 process
+        output = pool.run("main.py", ["3 + 5"], timeout=30)
+        print(output.returncode, output.stdout.text(), output.stderr.text())
+        assert output.returncode == 0 and '"result": 8' in output.stdout.text()
+
+        # case 2: unittest output stays on stderr
+        output = pool.run("tests.py", [], timeout=30)
+        print(output.returncode, output.stdout.text(), output.stderr.text())
+        assert output.stdout.total_bytes == 0 and "OK" in output.stderr.text()
+        print(output.usage)
+        assert output.usage is not None
+        assert output.usage.max_rss_bytes > 0 and output.usage.wall_seconds > 0
+    finally:
+        pool.close()
+
+    # case 3: the CPU limit ends the job, the pool replaces the worker
+    pool = PythonWorkerPool(
+        working_directory="calculator", size=1, limits=ResourceLimits(cpu_seconds=1)
+    )
+    with open(os.path.join("calculator", "spin.py"), "w") as f:
+        f.write("while True:\n    pass\n")
+    try:
+        output = pool.run("spin.py", [], timeout=30)
+        print(output.returncode, output.usage)
+        assert output.returncode == -signal.SIGXCPU
+        output = pool.run("main.py", ["1 + 1"], timeout=30)
+        assert output.returncode == 0 and '"result": 2' in output.stdout.text()
+    finally:
+        os.remove(os.path.join("calculator", "spin.py"))
+        pool.close()
+
+    # case 4: the workspace opts in to its preloads, scripts read an empty
+    # stdin instead of the job pipe and the next job still runs
+    pool = PythonWorkerPool(
+        working_directory="calculator", size=1, max_runs_per_worker=2
+    )
+    with open(os.path.join("calculator", "read_stdin.py"), "w") as f:
+        f.write("import sys\nprint(repr(sys.stdin.read()))\n")
+    try:
+        print(pool.preload_modules)
+        assert pool.preload_modules == (
+            "unittest",
+            "json",
+            "pkg.calculator",
+            "pkg.render",
+        )
+        output = pool.run("read_stdin.py", [], timeout=30)
+        print(output.returncode, output.stdout.text(), output.stderr.text())
+        assert output.returncode == 0 and output.stdout.text() == "''\n"
+        output = pool.run("main.py", ["2 + 2"], timeout=30)
+        assert output.returncode == 0 and '"result": 4' in output.stdout.text()
+    finally:
+        os.remove(os.path.join("calculator", "read_stdin.py"))
+        pool.close()
+
+
+def test_workspace_manifest():
+    with tempfile.TemporaryDirectory() as workspace_dir:
+        manifest_path = os.path.join(workspace_dir, ".aiagent", "manifest.json")
+        os.makedirs(os.path.join(workspace_dir, "pkg"))
+        for rel_path in ("main.py", "pkg/calc.py", "pkg/old.py"):
+            with open(os.path.join(workspace_dir, rel_path), "w") as f:
+                f.write(f"# {rel_path}\n")
+
+        # case 1: first session, everything is new and the map lists every file
+        manifest = WorkspaceManifest(workspace_dir, manifest_path)
+        context = manifest.session_context()
+        print(context)
+        assert "pkg/calc.py (" in context and "Changed since" not in context
+
+        # case 2: a new session only reports real changes, a touch is not one
+        with open(os.path.join(workspace_dir, "pkg", "calc.py"), "a") as f:
+            f.write("x = 1\n")
+        os.remove(os.path.join(workspace_dir, "pkg", "old.py"))
+        os.utime(os.path.join(workspace_dir, "main.py"), ns=(1, 1))
+        context = WorkspaceManifest(workspace_dir, manifest_path).session_context()
+        print(context)
+        assert context.endswith(
+            "Changed since the last session:\nmodified: pkg/calc.py\nremoved: "
+            "pkg/old.py"
+        )
+
+        # case 3: the tool reports changes since its previous call
+        function = GetWorkspaceChangesFunction(working_directory=workspace_dir)
+        function.session_manifest = WorkspaceManifest(workspace_dir, manifest_path)
+        with open(os.path.join(workspace_dir, "new.txt"), "w") as f:
+            f.write("new")
+        content: types.Content = function.handle_function_call(args={})
+        result = tool_response(content)["result"]
+        print(result)
+        assert result == "added: new.txt"
+        content = function.handle_function_call(args={})
+        assert tool_response(content)["result"] == "No files changed."
+
+        # case 4: tool calls leave the baseline of the next session alone
+        context = WorkspaceManifest(workspace_dir, manifest_path).session_context()
+        print(context)
+        assert context.endswith("Changed since the last session:\nadded: new.txt")
+
+        # case 5: each session reports changes since its own start
+        def changes() -> str:
+            content: types.Content = function.handle_function_call(args={})
+            return tool_response(content)["result"]
+
+        function.session_manifest = WorkspaceManifest(workspace_dir, manifest_path)
+        with session_scope():
+            function.session_manifest.session_context()
+            with open(os.path.join(workspace_dir, "first.txt"), "w") as f:
+                f.write("first")
+            assert changes() == "added: first.txt"
+        with open(os.path.join(workspace_dir, "between.txt"), "w") as f:
+            f.write("between")
+        with session_scope():
+            function.session_manifest.session_context()
+            with open(os.path.join(workspace_dir, "second.txt"), "w") as f:
+                f.write("second")
+            result = changes()
+            print(result)
+            assert result == "added: second.txt"
+
+
+def test_call_functions():
+    function_calls = [
+        types.FunctionCall(
+            name=WriteFileFunction.name(),
+            args={
+                WriteFileFunction.file_path_key: "lorem.txt",
+                WriteFileFunction.content_key: "lorem text",
+            },
+        ),
+        types.FunctionCall(
+            name=GetFileContentFunction.name(),
+            args={GetFileContentFunction.file_path_key: "lorem.txt"},
+        ),
+        types.FunctionCall(
+            name=GetFileContentFunction.name(),
+            args={GetFileContentFunction.file_path_key: "main.py"},
+        ),
+        types.FunctionCall(
+            name=RunPythonFunction.name(),
+            args={RunPythonFunction.python_file_path_key: "tests.py"},
+        ),
+    ]
+
+    # case 1: the read of lorem.txt waits for the write, the script for both reads
+    waves = schedule_function_calls(function_calls)
+    print(waves)
+    assert waves == [[0, 2], [1], [3]]
+
+    # case 2: scripts and test runs may write anywhere, later calls wait for them
+    script_calls = [
+        types.FunctionCall(
+            name=RunPythonFunction.name(),
+            args={RunPythonFunction.python_file_path_key: "gen.py"},
+        ),
+        types.FunctionCall(
+            name=GetFileContentFunction.name(),
+            args={GetFileContentFunction.file_path_key: "out.txt"},
+        ),
+        types.FunctionCall(name=RunTestsFunction.name(), args={}),
+        types.FunctionCall(name=GetFilesInfoFunction.name(), args={}),
+    ]
+    waves = schedule_function_calls(script_calls)
+    print(waves)
+    assert waves == [[0], [1], [2], [3]]
+
+    # case 3: results come back in call order
+    try:
+        contents = call_functions(function_calls, max_workers=4)
+    finally:
+        os.remove(os.path.join("calculator", "lorem.txt"))
+    for content in contents:
+        print(tool_response(content)["result"])
+    assert tool_response(contents[1])["result"] == "lorem text"
+
+
+def test_tool_registry():
+    registry = ToolRegistry(working_directory="calculator")
+    registry.register(GetFileContentFunction)
+
+    # case 1: the tool declaration is built once
+    tool = registry.tool()
+    print([declaration.name for declaration in tool.function_declarations or []])
+    assert registry.tool() is tool
+
+    # case 2: registering invalidates it, dispatch reuses the same instance
+    registry.register(GetFilesInfoFunction)
+    declarations = registry.tool().function_declarations or []
+    print([declaration.name for declaration in declarations])
+    assert registry.tool() is not tool
+    assert registry.get(GetFilesInfoFunction.name()) is registry.get(
+        GetFilesInfoFunction.name()
+    )
+    assert registry.get("not_a_tool") is None
+
+
+def test_conversation_history():
+    history = ConversationHistory("prompt", token_budget=1000, keep_recent_turns=1)
+    for _ in range(3):
+        history.append(types.Content(role="model", parts=[types.Part(text="reading")]))
+        history.append(
+            generate_success_message(
+                function_name=GetFileContentFunction.name(), message="x" * 4000
+            )
+        )
+
+    # case 1: under budget nothing changes
+    print(history.compact(prompt_token_count=900))
+    assert history.tokens_saved == 0
+
+    # case 2: old tool results are compacted, prompt and last turn are kept
+    saved = history.compact(prompt_token_count=3000)
+    print(saved)
+    results = [
+        tool_response(message)["result"]
+        for message in history.messages
+        if message.role == "tool"
+    ]
+    print([len(result) for result in results])
+    assert saved > 0
+    assert history.messages[0].parts and history.messages[0].parts[0].text == "prompt"
+    assert len(results[0]) < 4000 and len(results[-1]) == 4000
+
+
+def test_tool_response_encoding():
+    history = ConversationHistory("prompt", token_budget=1000, keep_recent_turns=0)
+    read_call = types.FunctionCall(
+        name=GetFileContentFunction.name(), args={"file_path": "main.py"}
+    )
+
+    def append_read(result: str) -> str:
+        history.append_tool_response(
+            generate_success_message(
+                function_name=GetFileContentFunction.name(), message=result
+            ),
+            read_call,
+        )
+        return tool_response(history.messages[-1])["result"]
+
+    # case 1: a repeated result refers to the call that returned it first
+    assert append_read("y" * 1000) == "y" * 1000
+    result = append_read("y" * 1000)
+    print(result)
+    assert result.startswith("[same result as the earlier get_file_content call with")
+    assert '"file_path": "main.py"' in result
+
+    # case 2: results over the byte cap keep their head and tail
+    history.response_encoder.max_bytes = 2000
+    result = append_read("head" + "z" * 5000 + "tail")
+    print(len(result), result[:10], result[-10:])
+    assert result.startswith("head") and result.endswith("tail")
+    assert "bytes dropped" in result and len(result) < 2100
+    print(history.response_encoder.stats())
+    assert history.response_encoder.stats()["references"] == 1
+    assert history.response_encoder.stats()["truncations"] == 1
+    assert history.response_encoder.bytes_saved > 3500
+
+    # case 3: compaction keeps a result that a later one refers to in full,
+    # once an unreferenced original is compacted its repeat is sent in full again
+    history.compact(prompt_token_count=5000)
+    results = [
+        tool_response(message)["result"]
+        for message in history.messages
+        if message.role == "tool"
+    ]
+    print([result[:40] for result in results])
+    assert results[0] == "y" * 1000 and results[1].startswith("[same result")
+    assert "[compacted:" in results[2]
+    assert append_read("y" * 1000).startswith("[same result")
+    result = append_read("head" + "z" * 5000 + "tail")
+    assert result.startswith("head") and "[compacted:" not in result
+
+    # case 4: short results are never replaced
+    assert append_read("ok") == "ok"
+    assert append_read("ok") == "ok"
+
+
+def test_session_checkpoint():
+    class CrashingBackend(ScriptedBackend):
+        @override
+        def generate_content(self, model, contents, config):
+            if any(content.role == "tool" for content in contents):
+                raise ConnectionError("network went away")
+            return super().generate_content(model, contents, config)
+
+    class CountingBackend(ScriptedBackend):
+        request_sizes: list[int] = []
+
+        @override
+        def generate_content(self, model, contents, config):
+            self.request_sizes.append(len(contents))
+            return super().generate_content(model, contents, config)
+
+    with tempfile.TemporaryDirectory() as session_dir:
+        checkpoint_path = os.path.join(session_dir, "session.json")
+
+        # case 1: the first turn is saved before the second one fails
+        with contextlib.suppress(ConnectionError):
+            main(
+                "list the files",
+                False,
+                backend=CrashingBackend(scripted_session()),
+                checkpoint_path=checkpoint_path,
+                workspace_snapshot=False,
+            )
+        history = ConversationHistory.load(checkpoint_path)
+        print([message.role for message in history.messages], history.turns)
+        assert [message.role for message in history.messages] == [
+            "user",
+            "model",
+            "tool",
+        ]
+        assert history.turns == 1 and history.prompt_tokens == 10
+
+        # case 2: resuming makes only the remaining model call
+        backend = CountingBackend(scripted_session())
+        main(
+            "",
+            False,
+            backend=backend,
+            checkpoint_path=checkpoint_path,
+            resume=True,
+            workspace_snapshot=False,
+        )
+        history = ConversationHistory.load(checkpoint_path)
+        print(backend.request_sizes, history.final_text(), history.turns)
+        assert backend.request_sizes == [3]
+        assert history.final_text() == "done" and history.turns == 2
+
+
+def test_tool_result_cache():
+    working_dir = "calculator"
+    read_function = GetFileContentFunction(working_directory=working_dir)
+    write_function = WriteFileFunction(working_directory=working_dir)
+    tool_result_cache.clear()
+
+    def read_lorem() -> str:
+        content = read_function.handle_function_call(
+            args={GetFileContentFunction.file_path_key: "lorem.txt"}
+        )
+        return tool_response(content)["result"]
+
+    write_function.handle_function_call(
+        args={
+            WriteFileFunction.file_path_key: "lorem.txt",
+            WriteFileFunction.content_key: "lorem text",
+        }
+    )
+
+    # case 1: the second read is served from the cache
+    read_lorem()
+    print(read_lorem(), tool_result_cache.stats())
+    assert tool_result_cache.stats()["hits"] == 1
+
+    # case 2: a write invalidates the cached content
+    write_function.handle_function_call(
+        args={
+            WriteFileFunction.file_path_key: "lorem.txt",
+            WriteFileFunction.content_key: "ipsum",
+        }
+    )
+    print(read_lorem(), tool_result_cache.stats())
+    assert read_lorem() == "ipsum"
+
+    # case 3: listings report current sizes, also below the listed directory
+    list_function = GetFilesInfoFunction(working_directory=working_dir)
+    sub_dir = os.path.join(working_dir, "existing", "listed")
+    os.makedirs(sub_dir, exist_ok=True)
+    try:
+
+        def list_files(args: dict) -> str:
+            content = list_function.handle_function_call(args=args)
+            return tool_response(content)["result"]
+
+        with open(os.path.join(sub_dir, "a.txt"), "w") as f:
+            f.write("x" * 5000)
+        list_files({GetFilesInfoFunction.directory_key: "existing/listed"})
+        list_files({GetFilesInfoFunction.recursive_key: True})
+        with open(os.path.join(sub_dir, "a.txt"), "a") as f:
+            f.write("x" * 4000)
+        with open(os.path.join(sub_dir, "new.txt"), "w") as f:
+            f.write("new")
+        result = list_files({GetFilesInfoFunction.directory_key: "existing/listed"})
+        print(result)
+        assert "a.txt: file_size=9000 bytes" in result
+        result = list_files({GetFilesInfoFunction.recursive_key: True})
+        assert "existing/listed/a.txt: file_size=9000 bytes" in result
+        assert "existing/listed/new.txt" in result
+    finally:
+        shutil.rmtree(os.path.join(working_dir, "existing"))
+        os.remove(os.path.join(working_dir, "lorem.txt"))
+
+
+class ScriptedBackend(ModelBackend):
+    def __init__(self, responses: list[types.GenerateContentResponse]) -> None:
+        self.responses = responses
+
+    @override
+    def generate_content(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> types.GenerateContentResponse:
+        return self.responses[sum(1 for content in contents if content.role == "model")]
+
+
+def scripted_session() -> list[types.GenerateContentResponse]:
+    usage_metadata = types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=10, candidates_token_count=5
+    )
+    return [
+        types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(
+                        role="model",
+                        parts=[
+                            types.Part(
+                                function_call=types.FunctionCall(
+                                    name=GetFilesInfoFunction.name(), args={}
+                                )
+                            )
+                        ],
+                    )
+                )
+            ],
+            usage_metadata=usage_metadata,
+        ),
+        types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(role="model", parts=[types.Part(text="done")])
+                )
+            ],
+            usage_metadata=usage_metadata,
+        ),
+    ]
+
+
+class ScriptedStreamClient:
+    """Stands in for `genai.Client`, streams one list of chunks per request."""
+
+    def __init__(self, turns: list[list[types.GenerateContentResponse]]) -> None:
+        self.turns = turns
+        self.requests: list[list[types.Content]] = []
+        self.aio = self
+        self.models = self
+
+    async def generate_content_stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ):
+        self.requests.append(list(contents))
+        chunks = self.turns[len(self.requests) - 1]
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+
+def stream_chunk(
+    *parts: types.Part, usage: bool = False
+) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(content=types.Content(role="model", parts=list(parts)))
+        ],
+        usage_metadata=(
+            types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=10, candidates_token_count=5, total_token_count=15
+            )
+            if usage
+            else None
+        ),
+    )
+
+
+def test_async_session():
+    list_call = types.FunctionCall(
+        name=GetFilesInfoFunction.name(),
+        args={GetFilesInfoFunction.recursive_key: True},
+    )
+    read_call = types.FunctionCall(
+        name=GetFileContentFunction.name(),
+        args={GetFileContentFunction.file_path_key: "main.py"},
+    )
+    client = ScriptedStreamClient(
+        [
+            [
+                stream_chunk(types.Part(text="Let me ")),
+                stream_chunk(types.Part(text="look.")),
+                stream_chunk(types.Part(function_call=list_call)),
+                stream_chunk(types.Part(function_call=read_call), usage=True),
+            ],
+            [stream_chunk(types.Part(text="Done."), usage=True)],
+        ]
+    )
+    history = asyncio.run(
+        run_session(
+            cast(genai.Client, client), "look around", False, workspace_snapshot=False
+        )
+    )
+
+    # case 1: streamed text chunks are merged into one part
+    parts = history.messages[1].parts or []
+    calls = [part.function_call for part in parts[1:] if part.function_call]
+    print([parts[0].text] + [call.name for call in calls])
+    assert parts[0].text == "Let me look." and len(calls) == len(parts) - 1
+    assert [call.name for call in calls] == [
+        GetFilesInfoFunction.name(),
+        GetFileContentFunction.name(),
+    ]
+
+    # case 2: tool responses follow in call order, the next request sees them
+    responses = [
+        part.function_response.name
+        for message in history.messages[2:4]
+        for part in message.parts or []
+        if part.function_response
+    ]
+    print(responses)
+    assert responses == [GetFilesInfoFunction.name(), GetFileContentFunction.name()]
+    assert len(client.requests) == 2 and len(client.requests[1]) == 4
+    assert history.final_text() == "Done."
+
+
+class ConcurrencyTrackingClient(ScriptedStreamClient):
+    """Echoes every prompt after a short delay, tracking overlapping streams."""
+
+    def __init__(self) -> None:
+        super().__init__([])
+        self.active = 0
+        self.peak_active = 0
+
+    @override
+    async def generate_content_stream(
+        self,
+        model: str,
+        contents: list[types.Content],
+        config: types.GenerateContentConfig,
+    ):
+        self.requests.append(list(contents))
+        prompt = (contents[0].parts or [types.Part()])[0].text
+
+        async def stream():
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            await asyncio.sleep(0.01)
+            yield stream_chunk(types.Part(text=f"echo {prompt}"), usage=True)
+            self.active -= 1
+
+        return stream()
+
+
+def test_run_batch():
+    client = ConcurrencyTrackingClient()
+    results_file = io.StringIO()
+    prompts = [f"prompt {index}" for index in range(5)]
+    asyncio.run(
+        run_batch(
+            cast(genai.Client, client),
+            prompts,
+            results_file,
+            concurrency=2,
+            requests_per_minute=None,
+            tokens_per_minute=None,
+            workspace_snapshot=False,
+        )
+    )
+    results = [json.loads(line) for line in results_file.getvalue().splitlines()]
+    print(results, client.peak_active)
+
+    # case 1: one line per prompt with its answer and usage
+    assert sorted(result["index"] for result in results) == list(range(5))
+    for result in results:
+        assert result["status"] == "ok"
+        assert result["response"] == f"echo {prompts[result['index']]}"
+        assert result["turns"] == 1 and result["prompt_tokens"] == 10
+        assert result["response_tokens"] == 5 and result["latency_s"] >= 0
+        assert "tool_response_bytes_saved" in result
+
+    # case 2: no more sessions than the cap run at once
+    assert client.peak_active == 2
+
+
+def test_record_replay_backend():
+    with tempfile.TemporaryDirectory() as record_dir:
+        session_path = os.path.join(record_dir, "session.jsonl")
+
+        # case 1: recording keeps every request/response pair
+        main(
+            "list the files",
+            False,
+            backend=RecordingBackend(ScriptedBackend(scripted_session()), session_path),
+            workspace_snapshot=False,
+        )
+        with open(session_path) as f:
+            print(len(f.readlines()))
+
+        # case 2: replay serves the recorded session offline
+        backend = ReplayBackend(session_path)
+        main(backend.prompt, False, backend=backend, workspace_snapshot=False)
+        print(backend.prompt, backend.next_response, backend.agent_latencies)
+        assert backend.prompt == "list the files"
+        assert backend.next_response == 2
+
+
+def test_request_policy():
+    contents = [types.Content(role="user", parts=[types.Part(text="hi")])]
+    config = types.GenerateContentConfig()
+
+    # case 1: an injected error and a stalled request are retried
+    with FakeModelServer(faults=(Fault(status=503), Fault(latency=2.0))) as server:
+        backend = RequestPolicyBackend(
+            GenaiBackend(client=server.client()), timeout=0.5, backoff_base=0.01
+        )
+        response = backend.generate_content(MODEL_NAME, contents, config)
+        print(response.text, backend.stats())
+        assert response.text == "Done."
+        assert backend.stats()["retries"] == 2 and backend.stats()["timeouts"] == 1
+
+    # case 2: client errors are not retried
+    with FakeModelServer(faults=(Fault(status=400),)) as server:
+        backend = RequestPolicyBackend(GenaiBackend(client=server.client()))
+        try:
+            backend.generate_content(MODEL_NAME, contents, config)
+            raise AssertionError("expected a ClientError")
+        except errors.ClientError as e:
+            print(e)
+        assert backend.stats()["requests"] == 1 and backend.stats()["failures"] == 1
+
+    # case 3: a request slower than the p95 latency is hedged, the hedge wins
+    with FakeModelServer(faults=(Fault(),) * 3 + (Fault(latency=2.0),)) as server:
+        backend = RequestPolicyBackend(
+            GenaiBackend(client=server.client()), hedge=True, hedge_min_samples=3
+        )
+        for _ in range(3):
+            backend.generate_content(MODEL_NAME, contents, config)
+        started_at = time.perf_counter()
+        backend.generate_content(MODEL_NAME, contents, config)
+        print(time.perf_counter() - started_at, backend.stats())
+        assert time.perf_counter() - started_at < 1.0
+        assert backend.stats()["hedges"] == 1 and backend.stats()["hedge_wins"] == 1
+
+        # case 4: the agent loop runs on top of the policy
+        main("say done", False, backend=backend, workspace_snapshot=False)
+        assert backend.stats()["calls"] == 5
+
+
+def test_rate_limiter():
+    async def acquire_all(rate_limiter: RateLimiter, estimated_tokens: int) -> float:
+        started_at = time.monotonic()
+        for _ in range(3):
+            await rate_limiter.acquire(estimated_tokens=estimated_tokens)
+        return time.monotonic() - started_at
+
+    # case 1: the third request waits for the first to leave the window
+    waited = asyncio.run(acquire_all(RateLimiter(2, None, window=0.2), 0))
+    print(waited)
+    assert waited >= 0.2
+
+    # case 2: token limit alone
+    waited = asyncio.run(acquire_all(RateLimiter(None, 100, window=0.2), 40))
+    print(waited)
+    assert waited >= 0.2
+
+
+def test_tracing():
+    with tempfile.TemporaryDirectory() as trace_dir:
+        trace_path = os.path.join(trace_dir, "trace.jsonl")
+        tracer.configure(trace_path)
+        try:
+            main(
+                "list the files",
+                False,
+                backend=ScriptedBackend(scripted_session()),
+                workspace_snapshot=False,
+            )
+        finally:
+            tracer.configure(None)
+
+        summary = summarize_traces([trace_path])
+        print(summary)
+        assert summary["turn"]["count"] == 2
+        assert summary["model_call"]["count"] == 2
+        assert summary["tool_call:get_files_info"]["count"] == 1
+
+
+def test_benchmark_suite():
+    # case 1: only slowdowns over the threshold are regressions
+    regressions = compare_to_baseline(
+        {"fast": 1.0, "slow": 2.0, "new": 5.0},
+        {"fast": 1.0, "slow": 1.0},
+        threshold=0.5,
+    )
+    print(regressions)
+    assert len(regressions) == 1 and regressions[0].startswith("slow:")
+
+    # case 2: benchmarks report milliseconds per operation
+    results = {**bench_dispatch(samples=1), **bench_calculator(samples=1)}
+    print(results)
+    assert set(results) >= {"dispatch.unknown_tool", "calculator.evaluate_1000"}
+    assert all(value > 0 for value in results.values())
 
 
 test_get_file_content()
 test_get_files_info()
 test_write_file()
+test_edit_file()
 test_run_python_file()
+test_run_tests()
+test_search_code()
+test_python_worker_pool()
+test_script_slots()
+test_workspace_manifest()
+test_call_functions()
+test_tool_registry()
+test_conversation_history()
+test_tool_response_encoding()
+test_session_checkpoint()
+test_tool_result_cache()
+test_async_session()
+test_run_batch()
+test_record_replay_backend()
+test_request_policy()
+test_rate_limiter()
+test_tracing()
+test_benchmark_suite()
@@ -0,0 +1,45 @@
+import argparse
+from collections import defaultdict
+import json
+
+from utils import percentile
+
+
+def summarize_traces(trace_paths: list[str]) -> dict[str, dict[str, float]]:
+    """p50/p99/mean duration per span kind, tool calls are split per tool."""
+    durations: dict[str, list[float]] = defaultdict(list)
+    for trace_path in trace_paths:
+        with open(trace_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                name = record["name"]
+                tool = record["attributes"].get("tool")
+                if tool:
+                    name = f"{name}:{tool}"
+                durations[name].append(record["duration_ms"])
+
+    return {
+        name: {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.50),
+            "p99_ms": percentile(values, 0.99),
+            "mean_ms": sum(values) / len(values),
+        }
+        for name, values in sorted(durations.items())
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize span latencies")
+    parser.add_argument("trace_files", nargs="+")
+    cli_args = parser.parse_args()
+
+    summary = summarize_traces(cli_args.trace_files)
+    print(f"{'span':<36} {'count':>7} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+    for name, stats in summary.items():
+        print(
+            f"{name:<36} {stats['count']:>7} {stats['p50_ms']:>10.2f} "
+            f"{stats['p99_ms']:>10.2f} {stats['mean_ms']:>10.2f}"
+        )
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from google.genai import types
 
 
@@ -21,3 +24,36 @@ def generate_success_message(function_name: str, message: str) -> types.Content:
             )
         ],
     )
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values`, `fraction` between 0 and 1."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def write_atomically(file_path: str, content: str) -> None:
+    """Writes to a temp file next to `file_path` and renames it over the original.
+
+    Readers see either the old or the new content, never a partial write,
+    and an existing file keeps its permissions.
+    """
+    abs_file_path = os.path.abspath(file_path)
+    directory = os.path.dirname(abs_file_path)
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(abs_file_path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(file_descriptor, "w", newline="") as f:
+            f.write(content)
+        if os.path.exists(abs_file_path):
+            os.chmod(temp_path, os.stat(abs_file_path).st_mode & 0o7777)
+        os.replace(temp_path, abs_file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise